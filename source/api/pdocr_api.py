@@ -3,6 +3,10 @@ from source.util import *
 logger.info(t2t('Creating ocr object.'))
 from source.common.timer_module import Timer
 from source.api.utils import *
+from source.ocr.cache import create_ocr_cache
+from source.ocr.models import MODEL_POOL
+from source.ocr.matcher import TextReplacer
+from source.ocr.service import OcrService, get_ocr_service
 
 pdocr_timer_performance = Timer()
 pdocr_timer_performance.reset()
@@ -29,19 +33,29 @@ logger.info(f"import pdocr time: {round(pdocr_timer_performance.get_diff_time(),
 #     globaldevice = 'cpu'
 
 
+# Fastdeploy Recognizer input height
+REC_IMAGE_HEIGHT = 48
+# Recognition-only results below this score are dropped.
+# There is no detector to reject empty areas, so noise is decoded as low score text.
+REC_ONLY_MIN_SCORE = 0.5
+
 REPLACE_DICT = {
     "惊垫": "惊蛰",
     "烟排": "烟绯",
     "花染": "椛染",
     "纳西姐": "纳西妲"
 }
+REPLACER = TextReplacer(REPLACE_DICT)
 
 
-class PaddleOcrFastDeploy():
-    def __init__(self, inference_path: str = None, lang=GLOBAL_LANG) -> None:
-        if inference_path is None:
-            inference_path = os.path.join(ROOT_PATH, f'assets\\PPOCRModels\\{lang}')
-        logger.info(f"Creating PaddleOCRFastDeploy object: {inference_path}")
+class FastDeployOcrModels:
+    """
+    Detector, recognizer and pipeline of one model folder.
+    Held by MODEL_POOL, so facades of the same folder share one set of sessions.
+    """
+
+    def __init__(self, inference_path: str):
+        logger.info(f"Loading fastdeploy OCR models: {inference_path}")
         pt = time.time()
         det_file_path = os.path.join(inference_path, "pddet\\inference.pdmodel")
         det_para_path = os.path.join(inference_path, "pddet\\inference.pdiparams")
@@ -55,22 +69,149 @@ class PaddleOcrFastDeploy():
         pt2 = time.time()
         self.model = fastdeploy.vision.ocr.PPOCRv3(self.det_model, None, self.rec_model)
         logger.info(f"created PPOCRv3. cost {round(time.time() - pt2, 2)}")
+
+
+class PaddleOcrFastDeploy():
+    def __init__(self, inference_path: str = None, lang=GLOBAL_LANG) -> None:
+        """
+        Models are not loaded here, but from MODEL_POOL on first use.
+        """
+        if inference_path is None:
+            inference_path = os.path.join(ROOT_PATH, f'assets\\PPOCRModels\\{lang}')
+        self.inference_path = inference_path
         self.lang = lang
+        self.cache = create_ocr_cache()
+        # (height, width, line_count) -> (row bounds, resized row size).
+        # Fixed-layout areas always have the same shape, so the split and resize are computed once.
+        self._rec_layout_cache = {}
+
+    @property
+    def models(self) -> FastDeployOcrModels:
+        return MODEL_POOL.get(('fastdeploy', self.inference_path),
+                              lambda: FastDeployOcrModels(self.inference_path))
+
+    @property
+    def service(self) -> OcrService:
+        """
+        Recognition service of this model folder, batches rows from all threads.
+        Rows are resized to REC_IMAGE_HEIGHT before submitting, so rows of the same width are batched together.
+        """
+        namespace = f'fastdeploy:{self.inference_path}'
+        return get_ocr_service(lang=self.lang, namespace=namespace, factory=lambda: OcrService(
+            lang=self.lang, namespace=namespace, run_batch=self._rec_batch, group_key=lambda img: img.shape[1]))
+
+    def _rec_batch(self, rows: t.List[np.ndarray]) -> list:
+        r = self.rec_model.batch_predict(rows)
+        return list(zip(r.text, r.rec_scores))
+
+    @property
+    def det_model(self):
+        return self.models.det_model
+
+    @property
+    def rec_model(self):
+        return self.models.rec_model
+
+    @property
+    def model(self):
+        return self.models.model
 
-    def analyze(self, img: np.ndarray):
+    def analyze(self, img: np.ndarray, use_cache=True):
+        """
+        Args:
+            img: Preprocessed crop.
+            use_cache: Return the cached result if the same crop was analyzed within cache TTL.
+                Results are shared between callers, do not modify them.
+        """
         if False:
             cv2.imshow("123", img)
             cv2.waitKey(0)
+        use_cache = use_cache and self.cache.enabled
+        if use_cache:
+            key = self.cache.key(img, namespace=self.lang)
+            is_hit, res = self.cache.get(key)
+            if is_hit:
+                return res
         img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
         res = self.model.predict(img)
         logger.trace(str(res).replace('\n', ''))
+        if use_cache:
+            self.cache.put(key, res)
+        return res
+
+    def _rec_layout(self, shape, line_count):
+        key = (shape[0], shape[1], line_count)
+        layout = self._rec_layout_cache.get(key)
+        if layout is None:
+            h, w = shape[:2]
+            bounds = [(h * i // line_count, h * (i + 1) // line_count) for i in range(line_count)]
+            row_h = bounds[0][1] - bounds[0][0]
+            size = (max(int(np.ceil(REC_IMAGE_HEIGHT * w / max(row_h, 1))), 1), REC_IMAGE_HEIGHT)
+            layout = (bounds, size)
+            self._rec_layout_cache[key] = layout
+        return layout
+
+    def recognize_lines(self, img: np.ndarray, line_count=1, use_cache=True) -> list:
+        """
+        Recognition-only path for areas with fixed layout, such as character names and HP.
+        Text detection is skipped, the area is split into `line_count` rows of equal height
+        and all rows are recognized in one batch.
+
+        Args:
+            img: Crop of the area, text lines should fill the full width.
+            line_count: Number of text lines in the area.
+            use_cache:
+
+        Returns:
+            list: [(text, score), ...], one per row.
+        """
+        use_cache = use_cache and self.cache.enabled
+        if use_cache:
+            key = self.cache.key(img, namespace=f'{self.lang}:rec{line_count}')
+            is_hit, res = self.cache.get(key)
+            if is_hit:
+                return res
+        if img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        elif img.shape[2] == 4:
+            img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+        img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+        bounds, size = self._rec_layout(img.shape, line_count)
+        rows = [cv2.resize(img[y1:y2], size) for y1, y2 in bounds]
+        res = self.service.recognize_lines(rows)
+        logger.trace(f"recognize_lines: {res}")
+        if use_cache:
+            self.cache.put(key, res)
+        return res
+
+    def recognize_rows(self, rows: t.List[np.ndarray]) -> list:
+        """
+        Recognition-only path for text rows which are already segmented, all rows in one batch.
+
+        Args:
+            rows: Crops of single text lines, any width.
+
+        Returns:
+            list: [(text, score), ...], one per row.
+        """
+        if not rows:
+            return []
+        images = []
+        for img in rows:
+            if img.ndim == 2:
+                img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+            elif img.shape[2] == 4:
+                img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+            img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+            h, w = img.shape[:2]
+            size = (max(int(np.ceil(REC_IMAGE_HEIGHT * w / max(h, 1))), 1), REC_IMAGE_HEIGHT)
+            images.append(cv2.resize(img, size))
+        res = [(self._replace_texts(text), score) for text, score in self.service.recognize_lines(images)]
+        logger.trace(f"recognize_rows: {res}")
         return res
 
     def _replace_texts(self, text: str):
-        for i in REPLACE_DICT:
-            if i in text:
-                text = text.replace(i, REPLACE_DICT[i])
-        return text
+        return REPLACER.replace(text)
 
     def _preprocessing_str(self, x: str):
         if self.lang == 'en_US':
@@ -174,15 +315,24 @@ class PaddleOcrFastDeploy():
 
         return ret_position
 
-    def get_all_texts(self, img, mode=0, per_monitor=False):
+    def get_all_texts(self, img, mode=0, per_monitor=False, line_count=None):
+        """
+        Args:
+            line_count: Known number of text lines in img. If set, use recognition-only path `recognize_lines`.
+                Keep it None when the layout is unknown, then the full detector runs.
+        """
         if per_monitor:
             pt = time.time()
-        res = self.analyze(img)
+        if line_count:
+            texts = [text for text, score in self.recognize_lines(img, line_count=line_count)
+                     if text != '' and score >= REC_ONLY_MIN_SCORE]
+        else:
+            texts = self.analyze(img).text
         if per_monitor:
             logger.info(f"ocr performance: {round(time.time() - pt, 2)}")
         if mode == 1:
-            return ','.join(str(self._replace_texts(i)) for i in res.text).replace(',', '')
-        return [self._replace_texts(i) for i in res.text]
+            return ','.join(str(self._replace_texts(i)) for i in texts).replace(',', '')
+        return [self._replace_texts(i) for i in texts]
 
     def is_img_num(self, im_src):
         pdocr_timer_performance.reset()
@@ -210,6 +360,20 @@ class PaddleOcrFastDeploy():
         return ret1, ret2
 
 
+if __name__ == '__main__':
+    # Latency of full detector vs recognition-only path on a single line area.
+    from source.ocr.cache import CACHE_OFF
+    ocr = PaddleOcrFastDeploy()
+    ocr.cache.mode = CACHE_OFF
+    image = cv2.imread(fr'{ROOT_PATH}/assets/pytest/AreaBigmapSidebarCommissionName.jpg')
+    for name, kwargs in [('detector', {}), ('rec-only', {'line_count': 1})]:
+        ocr.get_all_texts(image, **kwargs)
+        pt = time.perf_counter()
+        for _ in range(50):
+            res = ocr.get_all_texts(image, **kwargs)
+        logger.info(f'{name}: {res}; avg {round((time.perf_counter() - pt) / 50 * 1000, 2)}ms')
+
+
 # if __name__ == '__main__':
 #     ocr = PaddleOcrFastDeploy()
 #     # imsrc = cv2.imread("D:\\test2.jpg")
@@ -1,547 +1,178 @@
-#!/usr/bin/env python3
-# -*- coding:utf-8 -*-
-# Copyright (c) Megvii, Inc. and its affiliates.
-from source.util import *
-
-logger.info(t2t('Creating yolox obj. It may takes a few second.'))
-
-import sys, os
+"""
+Tree detector of the domain flow.
+
+Nothing is loaded at import. `yolo_tree` is created on first access:
+    onnx: `source.api.yolox_onnx`, onnxruntime on CPU. Needs the exported model.
+    torch: `source.api.yolox_torch`, the original predictor.
+    auto: onnx if the exported model exists, else torch.
+
+The onnx backend runs with an inference profile from Dev config, see YOLOX_PROFILES.
+The ley line tree is always in the upper half of the screen, so tree profiles only detect in that area,
+with a smaller input size. INT8 profiles need a quantized model which passed the accuracy gate,
+otherwise the FP32 model is used.
+
+Examples:
+    from source.api import yolox_api
+    addition_info, image = yolox_api.yolo_tree.predicte(cap)
+
+    # One-time export of the checkpoint
+    python -m source.api.yolox_api export
+    # Quantize with recorded 1080p domain frames, then run the accuracy gate
+    python -m source.api.yolox_api quantize <frames_dir> [profile]
+    python -m source.api.yolox_api gate <frames_dir> [profile]
+    # Compare backends and profiles
+    python -m source.api.yolox_api benchmark <image>
+"""
+import threading
 
-ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-sys.path.insert(0, ROOT_PATH)
-import argparse
-import datetime
-import time
-# from source.loguru import logger
-
-import cv2
+from source.util import *
 
-try:
-    import torch
-except Exception as error:
-    logger.critical(t2t("导入torch时错误; err code: 002"))
-    logger.exception(error)
-from yolox.data.data_augment import ValTransform
-from yolox.data.datasets import COCO_CLASSES
-# from source.yolox.data.datasets import VOC_CLASSES
-from yolox.exp import get_exp
-from yolox.utils import fuse_model, get_model_info, postprocess, vis
+YOLOX_CKPT = "assets/YoloxModels/best_ckpt.pth"
+YOLOX_ONNX = "assets/YoloxModels/best_ckpt.onnx"
+YOLOX_ONNX_INT8 = "assets/YoloxModels/best_ckpt.int8.onnx"
 
-IMAGE_EXT = [".jpg", ".jpeg", ".webp", ".bmp", ".png"]
-globaldevice = GIAconfig.General_DeviceTorch
-if globaldevice == 'auto':
-    if torch.cuda.is_available():
-        globaldevice = 'gpu'
-    else:
-        globaldevice = 'cpu'
+BACKEND_AUTO = 'auto'
+BACKEND_TORCH = 'torch'
+BACKEND_ONNX = 'onnx'
 
 
-class Sim_Args:
-    def __init__(self, demo, experiment_name, name, path, camid, save_result, exp_file, device, conf, nms, tsize,
-                 fp16=False, legacy=False,
-                 fuse=False, trt=False, ckpt=None):
-        self.demo = demo
-        self.experiment_name = experiment_name
+class YoloxProfile:
+    def __init__(self, name, roi=None, test_size=None, int8=False):
+        """
+        Args:
+            name:
+            roi: [x1, y1, x2, y2] in 1080p frame. None for full frame.
+            test_size: (height, width), multiple of 32. None for the input size of exported model.
+            int8: Use the INT8 model if it passed accuracy gate.
+        """
         self.name = name
-        self.path = path
-        self.camid = camid
-        self.save_result = save_result
-        self.exp_file = exp_file
-        self.device = device
-        self.conf = conf
-        self.nms = nms
-        self.tsize = tsize
-        self.fp16 = fp16
-        self.legacy = legacy
-        self.fuse = fuse
-        self.trt = trt
-        self.ckpt = ckpt
-
-
-def make_parser():
-    parser = argparse.ArgumentParser("YOLOX Demo!")
-    parser.add_argument(
-        "demo", default="image", help="demo type, eg. image, video and webcam"
-    )
-    parser.add_argument("-expn", "--experiment-name", type=str, default=None)
-    parser.add_argument("-n", "--name", type=str, default=None, help="model name")
-
-    parser.add_argument(
-        "--path", default="./assets/dog.jpg", help="path to images or video"
-    )
-    parser.add_argument("--camid", type=int, default=0, help="webcam demo camera id")
-    parser.add_argument(
-        "--save_result",
-        action="store_true",
-        help="whether to save the inference result of image/video",
-    )
-
-    # exp file
-    parser.add_argument(
-        "-f",
-        "--exp_file",
-        default=None,
-        type=str,
-        help="please input your experiment description file",
-    )
-    parser.add_argument("-c", "--ckpt", default=None, type=str, help="ckpt for eval")
-    parser.add_argument(
-        "--device",
-        default="cpu",
-        type=str,
-        help="device to run our model, can either be cpu or gpu",
-    )
-    parser.add_argument("--conf", default=0.3, type=float, help="test conf")
-    parser.add_argument("--nms", default=0.3, type=float, help="test nms threshold")
-    parser.add_argument("--tsize", default=None, type=int, help="test img size")
-    parser.add_argument(
-        "--fp16",
-        dest="fp16",
-        default=False,
-        action="store_true",
-        help="Adopting mix precision evaluating.",
-    )
-    parser.add_argument(
-        "--legacy",
-        dest="legacy",
-        default=False,
-        action="store_true",
-        help="To be compatible with older versions",
-    )
-    parser.add_argument(
-        "--fuse",
-        dest="fuse",
-        default=False,
-        action="store_true",
-        help="Fuse conv and bn for testing.",
-    )
-    parser.add_argument(
-        "--trt",
-        dest="trt",
-        default=False,
-        action="store_true",
-        help="Using TensorRT model for testing.",
-    )
-    return parser
-
-
-def make_parser_2(
-        demo="image",
-        experiment_name=None,
-        name='yolox-s',
-        path='D:\\Program Data\\IDEA\\yolo3_test1\\YOLOX\\assets\\head2.jpg',
-        camid=0,
-        save_result=True,
-        exp_file=None,
-        device=globaldevice,
-        conf=0.3,
-        nms=0.5,
-        tsize=640,
-        fp16=True,
-        legacy=False,
-        trt=False,
-        ckpt="D:\\Program Data\\vscode\\yolox_test4\\YOLOX_outputs\\tree_exp\\best_ckpt.pth"
-
-):
-    path1 = "D:\\Program Data\\IDEA\\yolo3_test1\\yoloxmodel\\yolox_ss.pth"
-    path2 = "D:\\Program Data\\IDEA\\yolo3_test1\\YOLOX\\YOLOX_outputs\\yolox_voc_s\\best_ckpt.pth"
-    args = Sim_Args(demo=demo,
-                    experiment_name=experiment_name,
-                    name=name,
-                    path=path,
-                    camid=camid,
-                    save_result=save_result,
-                    exp_file=exp_file,
-                    device=device,
-                    conf=conf,
-                    nms=nms,
-                    tsize=tsize,
-                    fp16=fp16,
-                    legacy=legacy,
-                    trt=trt,
-                    ckpt=ckpt)
-    return args
-
-
-def get_image_list(path):
-    image_names = []
-    for maindir, subdir, file_name_list in os.walk(path):
-        for filename in file_name_list:
-            apath = os.path.join(maindir, filename)
-            ext = os.path.splitext(apath)[1]
-            if ext in IMAGE_EXT:
-                image_names.append(apath)
-    return image_names
-
-
-class Predictor(object):
-    def __init__(
-            self,
-            model,
-            exp,
-            cls_names=COCO_CLASSES,
-            trt_file=None,
-            decoder=None,
-            device="cpu",
-            fp16=True,
-            legacy=False,
-    ):
-        self.model = model
-        self.cls_names = cls_names
-        self.decoder = decoder
-        self.num_classes = exp.num_classes
-        self.confthre = exp.test_conf
-        self.nmsthre = exp.nmsthre
-        self.test_size = exp.test_size
-        self.device = device
-        self.fp16 = fp16
-        self.preproc = ValTransform(legacy=legacy)
-        if trt_file is not None:
-            # torch2trt=None
-            # from source.torch2trt import TRTModule
-
-            # model_trt = TRTModule()
-            # model_trt.load_state_dict(torch.load(trt_file))
-
-            # x = torch.ones(1, 3, exp.test_size[0], exp.test_size[1]).cuda()
-            # self.model(x)
-            # self.model = model_trt
-            pass
-
-    def inference(self, img):
-        img_info = {"id": 0}
-        if isinstance(img, str):
-            img_info["file_name"] = os.path.basename(img)
-            img = cv2.imread(img)
-        else:
-            img_info["file_name"] = None
-
-        height, width = img.shape[:2]
-        img_info["height"] = height
-        img_info["width"] = width
-        img_info["raw_img"] = img
-
-        ratio = min(self.test_size[0] / img.shape[0], self.test_size[1] / img.shape[1])
-        img_info["ratio"] = ratio
-
-        img, _ = self.preproc(img, None, self.test_size)
-        img = torch.from_numpy(img).unsqueeze(0)
-        img = img.float()
-        if self.device == "gpu":
-            img = img.cuda()
-            if self.fp16:
-                img = img.half()  # to FP16
-
-        with torch.no_grad():
-            t0 = time.time()
-            outputs = self.model(img)
-            if self.decoder is not None:
-                outputs = self.decoder(outputs, dtype=outputs.type())
-            outputs = postprocess(
-                outputs, self.num_classes, self.confthre,
-                self.nmsthre, class_agnostic=True
-            )
-
-            logger.debug("Infer time: {:.4f}s".format(time.time() - t0))
-        return outputs, img_info
-
-    def visual(self, output, img_info, cls_conf=0.35):
-        ratio = img_info["ratio"]
-        img = img_info["raw_img"]
-        if output is None:
-            return img
-        output = output.cpu()
-
-        bboxes = output[:, 0:4]
-
-        # preprocessing: resize
-        bboxes /= ratio
-
-        cls = output[:, 6]
-        scores = output[:, 4] * output[:, 5]
-
-        vis_res = vis(img, bboxes, scores, cls, cls_conf, self.cls_names)
-        return vis_res, [bboxes, scores, cls, cls_conf, self.cls_names]
-
-
-def image_demo(predictor: Predictor, vis_folder, path, current_time, save_result, img_id=-1):
-    # if os.path.isdir(path):
-    #     files = get_image_list(path)
-    # else:
-    files = [path]  # path is a list in this time
-    files.sort()
-    addition_info = []
-
-    for image_name in files:
-        if isinstance(image_name, str):
-            # img_info["file_name"] = os.path.basename(image_name)
-            img = cv2.imread(image_name)
-        else:
-            img = image_name
-            if img_id != -1:
-                image_name = datetime.datetime.now().strftime('%Y_%m_%d_%H_%M_%S_%f') + str(img_id) + '.jpg'
-                # image_name = time.strftime("%Y_%m_%d_%H_%M_%S_%F", current_time)+'.jpg'+str(img_id)
-            else:
-                image_name = datetime.datetime.now().strftime('%Y_%m_%d_%H_%M_%S_%f') + '.jpg'
-                # image_name = time.strftime("%Y_%m_%d_%H_%M_%S_%F", current_time)+'.jpg'
-
-        # img = cv2.imread(image_name)
-        outputs, img_info = predictor.inference(img)
-        if outputs[0] is not None:
-            result_image, adi = predictor.visual(outputs[0], img_info, predictor.confthre)
+        self.roi = roi
+        self.test_size = test_size
+        self.int8 = int8
+
+    def __repr__(self):
+        return f'YoloxProfile({self.name}, roi={self.roi}, test_size={self.test_size}, int8={self.int8})'
+
+
+# Upper half of screen is 1920x540, resized by 1/3 to 640x180, padded to 640x192.
+YOLOX_PROFILES = {
+    'full': YoloxProfile('full'),
+    'tree_roi': YoloxProfile('tree_roi', roi=[0, 0, 1920, 540], test_size=(192, 640)),
+    'tree_roi_int8': YoloxProfile('tree_roi_int8', roi=[0, 0, 1920, 540], test_size=(192, 640), int8=True),
+}
+
+
+def create_onnx_predictor(profile: YoloxProfile):
+    from source.api.yolox_onnx import YoloxOnnxPredictor, is_gate_passed
+    model_path = os.path.join(ROOT_PATH, YOLOX_ONNX)
+    if profile.int8:
+        int8_path = os.path.join(ROOT_PATH, YOLOX_ONNX_INT8)
+        if not os.path.exists(int8_path):
+            logger.warning(f'yolox int8 model not found, use fp32 model')
+        elif not is_gate_passed(int8_path):
+            logger.warning(f'yolox int8 model did not pass accuracy gate, use fp32 model')
         else:
-            return None, None
-        addition_info.append(adi)
-        if save_result:
-            save_folder = os.path.join(
-                vis_folder  # , "visimg"   # time.strftime("%Y_%m_%d_%H_%M_%S", current_time)
-            )
-            # os.makedirs(save_folder, exist_ok=True)
-            save_file_name = os.path.join(save_folder, os.path.basename(image_name))
-
-            logger.debug("Saving detection result in {}".format(save_file_name))
-            cv2.imwrite(save_file_name, result_image)
-        # ch = cv2.waitKey(0)
-        # if ch == 27 or ch == ord("q") or ch == ord("Q"):
-        #     break
-        return addition_info, result_image
-
-
-def imageflow_demo(predictor, vis_folder, current_time, args):
-    cap = cv2.VideoCapture(args.path if args.demo == "video" else args.camid)
-    width = cap.get(cv2.CAP_PROP_FRAME_WIDTH)  # float
-    height = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)  # float
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    if args.save_result:
-        save_folder = os.path.join(
-            vis_folder, time.strftime("%Y_%m_%d_%H_%M_%S", current_time)
-        )
-        os.makedirs(save_folder, exist_ok=True)
-        if args.demo == "video":
-            save_path = os.path.join(save_folder, os.path.basename(args.path))
-        else:
-            save_path = os.path.join(save_folder, "camera.mp4")
-
-            logger.debug(f"video save_path is {save_path}")
-        vid_writer = cv2.VideoWriter(
-            save_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (int(width), int(height))
-        )
-    while True:
-        ret_val, frame = cap.read()
-        if ret_val:
-            outputs, img_info = predictor.inference(frame)
-            result_frame = predictor.visual(outputs[0], img_info, predictor.confthre)
-            if args.save_result:
-                vid_writer.write(result_frame)
-            else:
-                cv2.namedWindow("yolox", cv2.WINDOW_NORMAL)
-                cv2.imshow("yolox", result_frame)
-            ch = cv2.waitKey(1)
-            if ch == 27 or ch == ord("q") or ch == ord("Q"):
-                break
-        else:
-            break
-
-
-def main(exp, args):
-    if not args.experiment_name:
-        args.experiment_name = exp.exp_name
-
-    file_name = os.path.join(exp.output_dir, args.experiment_name)
-    os.makedirs(file_name, exist_ok=True)
-
-    vis_folder = None
-    if args.save_result:
-        vis_folder = os.path.join(file_name, "vis_res")
-        os.makedirs(vis_folder, exist_ok=True)
-
-    if args.trt:
-        args.device = "gpu"
-
-        logger.debug("Args: {}".format(args))
-
-    if args.conf is not None:
-        exp.test_conf = args.conf
-    if args.nms is not None:
-        exp.nmsthre = args.nms
-    if args.tsize is not None:
-        exp.test_size = (args.tsize, args.tsize)
-
-    model = exp.get_model()
-
-    logger.debug("Model Summary: {}".format(get_model_info(model, exp.test_size)))
-
-    if args.device == "gpu":
-        model.cuda()
-        if args.fp16:
-            model.half()  # to FP16
-    model.eval()
-
-    if not args.trt:
-        if args.ckpt is None:
-            ckpt_file = os.path.join(file_name, "best_ckpt.pth")
-        else:
-            ckpt_file = args.ckpt
-
-            logger.debug("loading checkpoint")
-        ckpt = torch.load(ckpt_file, map_location="cpu")
-        # load the model state dict
-        model.load_state_dict(ckpt["model"])
-
-        logger.debug("loaded checkpoint done.")
-
-    if args.fuse:
-        logger.debug("\tFusing model...")
-        model = fuse_model(model)
-
-    if args.trt:
-        assert not args.fuse, "TensorRT model is not support model fusing!"
-        trt_file = os.path.join(file_name, "model_trt.pth")
-        assert os.path.exists(
-            trt_file
-        ), "TensorRT model is not found!\n Run python3 tools/trt.py first!"
-        model.head.decode_in_inference = False
-        decoder = model.head.decode_outputs
-
-        logger.debug("Using TensorRT to inference")
+            model_path = int8_path
+    return YoloxOnnxPredictor(model_path, test_size=profile.test_size, roi=profile.roi)
+
+
+def create_yolo_tree(backend=None, profile=None):
+    """
+    Args:
+        backend: BACKEND_AUTO, BACKEND_TORCH or BACKEND_ONNX. If None, use Dev config.
+        profile: Name in YOLOX_PROFILES, onnx backend only. If None, use Dev config.
+    """
+    if backend is None:
+        backend = GIAconfig.Dev_YoloxBackend
+    if profile is None:
+        profile = GIAconfig.Dev_YoloxProfile
+    if backend == BACKEND_AUTO:
+        backend = BACKEND_ONNX if os.path.exists(os.path.join(ROOT_PATH, YOLOX_ONNX)) else BACKEND_TORCH
+    logger.info(t2t('Creating yolox obj. It may takes a few second.'))
+    pt = time.time()
+    if backend == BACKEND_ONNX:
+        profile = YOLOX_PROFILES[profile]
+        predictor = create_onnx_predictor(profile)
     else:
-        trt_file = None
-        decoder = None
-
-    predictor = Predictor(
-        model, exp, COCO_CLASSES, trt_file, decoder,
-        args.device, args.fp16, args.legacy,
-    )
-    current_time = time.localtime()
-    if args.demo == "image":
-        return image_demo(predictor, vis_folder, args.path, current_time, args.save_result)
-    elif args.demo == "video" or args.demo == "webcam":
-        imageflow_demo(predictor, vis_folder, current_time, args)
-
-
-class Yolox_Api:
-    def __init__(self, vis_folder=None,
-                 save_result=False,
-                 ckpt="assets/YoloxModels/best_ckpt.pth"
-                 ):
-
-        self.args = make_parser_2(save_result=save_result,
-                                  ckpt=ckpt
-                                  )
-        logger.debug("yolox device: " + self.args.device)
-        self.exp = get_exp(self.args.exp_file, self.args.name)
-        if not self.args.experiment_name:
-            self.args.experiment_name = self.exp.exp_name
-
-        file_name = os.path.join(self.exp.output_dir, self.args.experiment_name)
-        os.makedirs(file_name, exist_ok=True)
-
-        self.vis_folder = os.path.join(file_name, "vis_res")
-        os.makedirs(self.vis_folder, exist_ok=True)
-        if self.args.save_result:
-            if vis_folder is not None:
-                self.vis_folder = vis_folder
-
-        if self.args.trt:
-            self.args.device = "gpu"
+        from source.api.yolox_torch import Yolox_Api
+        predictor = Yolox_Api(ckpt=YOLOX_CKPT)
+        profile = None
+    logger.info(t2t('Created yolox obj.') + f' backend: {backend}, profile: {profile}, cost {round(time.time() - pt, 2)}s')
+    return predictor
+
+
+_yolo_tree = None
+_yolo_tree_lock = threading.Lock()
+
+
+def get_yolo_tree():
+    global _yolo_tree
+    if _yolo_tree is None:
+        with _yolo_tree_lock:
+            if _yolo_tree is None:
+                _yolo_tree = create_yolo_tree()
+    return _yolo_tree
+
+
+def __getattr__(name):
+    # `yolox_api.yolo_tree` is created on first access.
+    if name == 'yolo_tree':
+        return get_yolo_tree()
+    raise AttributeError(f"module {__name__} has no attribute {name}")
+
+
+def benchmark(image_path, n=50):
+    image = cv2.imread(image_path)
+    candidates = [(BACKEND_ONNX, name) for name in YOLOX_PROFILES] + [(BACKEND_TORCH, None)]
+    for backend, profile in candidates:
+        pt = time.time()
+        try:
+            predictor = create_yolo_tree(backend, profile=profile)
+        except Exception as e:
+            logger.warning(f'{backend} {profile}: unavailable, {e}')
+            continue
+        create_time = time.time() - pt
+        predictor.predicte(image)
+        costs = []
+        for _ in range(n):
+            pt = time.perf_counter()
+            addition_info, _ = predictor.predicte(image)
+            costs.append(time.perf_counter() - pt)
+        center = predictor.get_center(addition_info) if addition_info is not None else None
+        logger.info(f'{backend} {profile}: import and load {round(create_time, 2)}s, '
+                    f'p50 {round(float(np.percentile(costs, 50)) * 1000, 1)}ms, '
+                    f'p90 {round(float(np.percentile(costs, 90)) * 1000, 1)}ms, center {center}')
+
+
+def run_gate(frames_dir, profile='tree_roi_int8'):
+    """
+    Check the profile against FP32 full frame on recorded frames.
+    For INT8 profiles the quantized model is checked and the report is saved next to it.
+    """
+    from source.api.yolox_onnx import YoloxOnnxPredictor, accuracy_gate, save_gate_report
+    profile = YOLOX_PROFILES[profile]
+    reference = YoloxOnnxPredictor(os.path.join(ROOT_PATH, YOLOX_ONNX))
+    model_path = os.path.join(ROOT_PATH, YOLOX_ONNX_INT8 if profile.int8 else YOLOX_ONNX)
+    predictor = YoloxOnnxPredictor(model_path, test_size=profile.test_size, roi=profile.roi)
+    report = accuracy_gate(predictor, reference, frames_dir)
+    report['profile'] = profile.name
+    if profile.int8:
+        save_gate_report(model_path, report)
+    logger.info(f'yolox accuracy gate: {report}')
+    return report
 
-        logger.debug("Args: {}".format(self.args))
 
-        if self.args.conf is not None:
-            self.exp.test_conf = self.args.conf
-        if self.args.nms is not None:
-            self.exp.nmsthre = self.args.nms
-        if self.args.tsize is not None:
-            self.exp.test_size = (self.args.tsize, self.args.tsize)
-
-        model = self.exp.get_model()
-
-        logger.debug("Model Summary: {}".format(get_model_info(model, self.exp.test_size)))
-
-        if self.args.device == "gpu":
-            model.cuda()
-            if self.args.fp16:
-                model.half()  # to FP16
-        model.eval()
-
-        if not self.args.trt:
-            if self.args.ckpt is None:
-                ckpt_file = os.path.join(file_name, "best_ckpt.pth")
-            else:
-                ckpt_file = self.args.ckpt
-
-            logger.debug("loading checkpoint")
-            ckpt = torch.load(ckpt_file, map_location="cpu")
-            # load the model state dict
-            # may should ###
-            model.load_state_dict(ckpt["model"])
-
-            logger.debug("loaded checkpoint done.")
-
-        if self.args.fuse:
-            logger.debug("\tFusing model...")
-            model = fuse_model(model)
-
-        if self.args.trt:
-            assert not self.args.fuse, "TensorRT model is not support model fusing!"
-            trt_file = os.path.join(file_name, "model_trt.pth")
-            assert os.path.exists(
-                trt_file
-            ), "TensorRT model is not found!\n Run python3 tools/trt.py first!"
-            model.head.decode_in_inference = False
-            decoder = model.head.decode_outputs
-
-            logger.debug("Using TensorRT to inference")
-        else:
-            trt_file = None
-            decoder = None
-
-        self.predictor = Predictor(
-            model, self.exp, COCO_CLASSES, trt_file, decoder,
-            self.args.device, self.args.fp16, self.args.legacy,
-        )
-
-        logger.debug("predictor has been created")
-
-    def predicte(self, imgsrc, img_id=-1):
-
-        logger.debug("predicte img")
-        self.current_time = time.localtime()
-        if self.args.demo == "image":
-            if True:
-                return image_demo(self.predictor, self.vis_folder, imgsrc, self.current_time, self.args.save_result,
-                                  img_id=img_id)
-
-            # else:
-            #    return image_demo(self.predictor, self.vis_folder, self.args.path, self.current_time,
-            #                      self.args.save_result)  # just backup
-
-        elif self.args.demo == "video" or self.args.demo == "webcam":
-            imageflow_demo(self.predictor, self.vis_folder, self.current_time, self.args)
-        pass
-
-    @staticmethod
-    def get_maxap_pic_bbox(addinfo):
-        return addinfo[0][0][0].numpy()
-
-    @staticmethod
-    def get_center(addinfo):
-        a = addinfo[0][0][0].numpy()
-        return a[0] + (a[2] - a[0]) / 2, a[1] + (a[3] - a[1]) / 2
-
-
-yolo_tree = Yolox_Api()
-logger.info(t2t('Created yolox obj.'))
 if __name__ == "__main__":
-    # yolox=yolox_api_custom()
-    # yolox.predicte(cv2.imread("D:\\Program Data\\IDEA\\yolo3_test1\\YOLOX\\assets\\head.jpg",1))
-    # yolox.predicte(cv2.imread("D:\\Program Data\\IDEA\\yolo3_test1\\YOLOX\\assets\\head2.jpg",1))
-    # yolox.predicte(cv2.imread("D:\\Program Data\\IDEA\\yolo3_test1\\YOLOX\\assets\\head3.jpg",1))
-    # args = make_parser()#.parse_args()
-    # print(args)
-    # exp = get_exp(args.exp_file, args.name)
-
-    # main(exp, args)
-    # ya = Yolox_Api()
-    a = yolo_tree.predicte(cv2.imread("D:\\Program Data\\vscode\\yolox_test4\\assets\\84.jpg"))
-    # print()
+    if sys.argv[1] == 'export':
+        from source.api.yolox_torch import export_onnx
+        export_onnx(ckpt=YOLOX_CKPT, output=os.path.join(ROOT_PATH, YOLOX_ONNX))
+    elif sys.argv[1] == 'quantize':
+        from source.api.yolox_onnx import quantize_int8
+        _profile = YOLOX_PROFILES[sys.argv[3] if len(sys.argv) > 3 else 'tree_roi_int8']
+        quantize_int8(os.path.join(ROOT_PATH, YOLOX_ONNX), os.path.join(ROOT_PATH, YOLOX_ONNX_INT8), sys.argv[2],
+                      test_size=_profile.test_size, roi=_profile.roi)
+        run_gate(sys.argv[2], profile=_profile.name)
+    elif sys.argv[1] == 'gate':
+        run_gate(sys.argv[2], profile=sys.argv[3] if len(sys.argv) > 3 else 'tree_roi_int8')
+    elif sys.argv[1] == 'benchmark':
+        benchmark(sys.argv[2])
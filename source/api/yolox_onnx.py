@@ -0,0 +1,257 @@
+"""
+onnxruntime CPU backend of the tree detector.
+
+Same `predicte` / `get_center` API as `source.api.yolox_torch.Yolox_Api`, but without torch.
+The model is exported once by `source.api.yolox_torch.export_onnx`.
+
+An INT8 model can be made from the exported one by `quantize_int8`, calibrated on recorded frames.
+`accuracy_gate` compares a predictor against the FP32 full frame predictor on recorded frames,
+its report is saved next to the INT8 model and checked before the INT8 model is used.
+"""
+import json
+
+from source.util import *
+
+DEFAULT_TEST_SIZE = (640, 640)
+
+
+class YoloxOnnxPredictor:
+    def __init__(self, model_path, test_size=None, roi=None, conf=0.3, nms=0.5, num_threads=0):
+        """
+        Args:
+            model_path: Exported ONNX model.
+            test_size: (height, width), multiple of 32. If None, use the input shape of model.
+            roi: [x1, y1, x2, y2] area of frame to detect in. If None, use full frame.
+            conf: Score threshold.
+            nms: NMS IoU threshold.
+            num_threads: onnxruntime intra op threads. 0 for default.
+        """
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        model_size = tuple(model_input.shape[2:4])
+        is_static = all(isinstance(i, int) for i in model_size)
+        if test_size is None:
+            test_size = model_size if is_static else DEFAULT_TEST_SIZE
+        elif is_static and tuple(test_size) != model_size:
+            logger.warning(f"yolox onnx model has static input {model_size}, test size {test_size} is ignored. "
+                           f"Export again to use dynamic input.")
+            test_size = model_size
+        self.test_size = tuple(test_size)
+        self.roi = roi
+        self.confthre = conf
+        self.nmsthre = nms
+        logger.debug(f"yolox onnx predictor: {model_path}, test size {self.test_size}, roi {self.roi}")
+
+        # Buffers are reused between frames.
+        # Frames always have the same shape, so the padding of canvas is filled only when shape changes.
+        h, w = self.test_size
+        self._canvas = np.full((h, w, 3), 114, dtype=np.uint8)
+        self._input = np.empty((1, 3, h, w), dtype=np.float32)
+        self._resized_shape = None
+
+    def preprocess(self, img: np.ndarray) -> float:
+        """
+        Same as yolox ValTransform(legacy=False): resize keeping aspect ratio, pad with 114 at right bottom,
+        HWC to CHW, float32. Result is written into self._input.
+
+        Returns:
+            float: Resize ratio.
+        """
+        ratio = min(self.test_size[0] / img.shape[0], self.test_size[1] / img.shape[1])
+        nh, nw = int(img.shape[0] * ratio), int(img.shape[1] * ratio)
+        if self._resized_shape != (nh, nw):
+            self._canvas.fill(114)
+            self._resized_shape = (nh, nw)
+        self._canvas[:nh, :nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+        np.copyto(self._input[0], self._canvas.transpose(2, 0, 1), casting='unsafe')
+        return ratio
+
+    def postprocess(self, prediction: np.ndarray):
+        """
+        Args:
+            prediction: Shape (n_anchors, 5 + num_classes), boxes in (cx, cy, w, h).
+
+        Returns:
+            np.ndarray: Shape (n, 7), rows of (x1, y1, x2, y2, obj_conf, class_conf, class_pred)
+                sorted by score. None if nothing detected.
+        """
+        class_conf = prediction[:, 5:].max(axis=1)
+        class_pred = prediction[:, 5:].argmax(axis=1)
+        scores = prediction[:, 4] * class_conf
+        keep = scores >= self.confthre
+        if not keep.any():
+            return None
+        prediction, class_conf, class_pred, scores = prediction[keep], class_conf[keep], class_pred[keep], scores[keep]
+        boxes_xywh = np.stack([prediction[:, 0] - prediction[:, 2] / 2, prediction[:, 1] - prediction[:, 3] / 2,
+                               prediction[:, 2], prediction[:, 3]], axis=1)
+        # class agnostic, same as yolox postprocess(class_agnostic=True)
+        indexes = cv2.dnn.NMSBoxes(boxes_xywh.tolist(), scores.tolist(), self.confthre, self.nmsthre)
+        indexes = np.array(indexes, dtype=np.int64).flatten()
+        if len(indexes) == 0:
+            return None
+        indexes = indexes[np.argsort(-scores[indexes])]
+        boxes = boxes_xywh[indexes].copy()
+        boxes[:, 2:] += boxes[:, :2]
+        return np.concatenate([boxes, prediction[indexes, 4:5], class_conf[indexes, None],
+                               class_pred[indexes, None].astype(np.float32)], axis=1)
+
+    def inference(self, img: np.ndarray):
+        """
+        Returns:
+            tuple: (output, ratio), output is the same as `postprocess`.
+        """
+        t0 = time.time()
+        ratio = self.preprocess(img)
+        prediction = self.session.run(None, {self.input_name: self._input})[0][0]
+        output = self.postprocess(prediction)
+        logger.debug("Infer time: {:.4f}s".format(time.time() - t0))
+        return output, ratio
+
+    @staticmethod
+    def visual(img, bboxes, scores):
+        img = img.copy()
+        for box, score in zip(bboxes.astype(int), scores):
+            cv2.rectangle(img, (box[0], box[1]), (box[2], box[3]), (0, 255, 0), 2)
+            cv2.putText(img, f'{score:.2f}', (box[0], box[1] - 4), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 1)
+        return img
+
+    def predicte(self, imgsrc, img_id=-1):
+        """
+        Returns:
+            tuple: (addition_info, result_image), same layout as Yolox_Api.predicte.
+                addition_info is [[bboxes, scores, cls, cls_conf, cls_names]] in numpy. (None, None) if nothing detected.
+        """
+        logger.debug("predicte img")
+        if self.roi is not None:
+            x1, y1, x2, y2 = self.roi
+            output, ratio = self.inference(imgsrc[y1:y2, x1:x2])
+        else:
+            output, ratio = self.inference(imgsrc)
+        if output is None:
+            return None, None
+        bboxes = output[:, 0:4] / ratio
+        if self.roi is not None:
+            bboxes[:, [0, 2]] += self.roi[0]
+            bboxes[:, [1, 3]] += self.roi[1]
+        scores = output[:, 4] * output[:, 5]
+        cls = output[:, 6]
+        return [[bboxes, scores, cls, self.confthre, None]], self.visual(imgsrc, bboxes, scores)
+
+    @staticmethod
+    def get_maxap_pic_bbox(addinfo):
+        return np.asarray(addinfo[0][0][0])
+
+    @staticmethod
+    def get_center(addinfo):
+        a = np.asarray(addinfo[0][0][0])
+        return a[0] + (a[2] - a[0]) / 2, a[1] + (a[3] - a[1]) / 2
+
+
+def iter_frames(frames_dir):
+    """
+    Yields:
+        tuple[str, np.ndarray]: file name and BGR frame.
+    """
+    for name in sorted(os.listdir(frames_dir)):
+        if os.path.splitext(name)[1].lower() not in ['.jpg', '.jpeg', '.png', '.bmp']:
+            continue
+        frame = cv2.imdecode(np.fromfile(os.path.join(frames_dir, name), dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is not None:
+            yield name, frame
+
+
+def gate_report_path(model_path) -> str:
+    return os.path.splitext(model_path)[0] + '.gate.json'
+
+
+def quantize_int8(fp32_path, int8_path, frames_dir, test_size=None, roi=None, max_frames=200):
+    """
+    Post-training static quantization, calibrated on recorded frames.
+    Frames go through the same ROI crop and preprocessing as inference, so the profile used for
+    calibration should be the one the INT8 model runs with.
+    """
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    predictor = YoloxOnnxPredictor(fp32_path, test_size=test_size, roi=roi)
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self.frames = iter_frames(frames_dir)
+            self.count = 0
+
+        def get_next(self):
+            if self.count >= max_frames:
+                return None
+            for name, frame in self.frames:
+                if roi is not None:
+                    frame = frame[roi[1]:roi[3], roi[0]:roi[2]]
+                predictor.preprocess(frame)
+                self.count += 1
+                return {predictor.input_name: predictor._input.copy()}
+            return None
+
+    reader = FrameReader()
+    quantize_static(fp32_path, int8_path, reader,
+                    quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    logger.info(f'yolox int8 model saved: {int8_path}, calibrated on {reader.count} frames')
+    return int8_path
+
+
+def accuracy_gate(predictor, reference, frames_dir, center_tolerance=20, min_agreement=0.95):
+    """
+    Compare predictor with reference predictor (FP32, full frame) on recorded frames.
+
+    A frame agrees if both find nothing, or both find the target with top-1 centers
+    within center_tolerance pixels.
+
+    Returns:
+        dict: Report, 'passed' is True if agreement rate >= min_agreement.
+    """
+    agree = 0
+    total = 0
+    center_errors = []
+    for name, frame in iter_frames(frames_dir):
+        total += 1
+        ref_info, _ = reference.predicte(frame)
+        info, _ = predictor.predicte(frame)
+        if ref_info is None or info is None:
+            if ref_info is None and info is None:
+                agree += 1
+            continue
+        ref_center = np.array(reference.get_center(ref_info))
+        center = np.array(predictor.get_center(info))
+        error = float(np.linalg.norm(ref_center - center))
+        center_errors.append(error)
+        if error <= center_tolerance:
+            agree += 1
+    agreement = agree / total if total else 0.
+    report = {
+        'frames': total,
+        'agreement': round(agreement, 4),
+        'mean_center_error': round(float(np.mean(center_errors)), 2) if center_errors else 0.,
+        'max_center_error': round(float(np.max(center_errors)), 2) if center_errors else 0.,
+        'center_tolerance': center_tolerance,
+        'min_agreement': min_agreement,
+        'passed': total > 0 and agreement >= min_agreement,
+    }
+    return report
+
+
+def save_gate_report(model_path, report: dict):
+    with open(gate_report_path(model_path), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+
+def is_gate_passed(model_path) -> bool:
+    path = gate_report_path(model_path)
+    if not os.path.exists(path):
+        return False
+    with open(path, 'r', encoding='utf-8') as f:
+        return bool(json.load(f).get('passed', False))
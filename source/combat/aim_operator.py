@@ -43,6 +43,7 @@ class AimOperator(BaseThreading):
         self.aim_timeout_retry_timer = AdvanceTimer(6).start()
         self.corr_rate = 0.8
         self.sco_blocking_request = ThreadBlockingRequest()
+        self.while_sleep = 0.1
 
     def pause_threading(self):
         if self.pause_threading_flag != True:
@@ -52,8 +53,15 @@ class AimOperator(BaseThreading):
             self.itt.key_up('d')
     
     def run(self):
+        loop_pt = None
         while 1:
-            time.sleep(0.1)
+            # Loops end with `continue` anywhere, record the last working loop here
+            if loop_pt is not None:
+                self._record_loop(time.perf_counter() - loop_pt, sleep)
+                loop_pt = None
+            pt = time.perf_counter()
+            time.sleep(self.while_sleep)
+            sleep = time.perf_counter() - pt
             # t = self.loop_timer.loop_time() # 设置最大检查时间
             # if t <= self.fps:
             #     time.sleep(self.fps - t)
@@ -67,7 +75,7 @@ class AimOperator(BaseThreading):
             if self.pause_threading_flag:
                 if self.working_flag:
                     self.working_flag = False
-                time.sleep(1)
+                self.wait_until_continue()
 
                 continue
 
@@ -79,7 +87,8 @@ class AimOperator(BaseThreading):
             if self.checkup_stop_func():
                 self.pause_threading_flag = True
                 continue
-            
+
+            loop_pt = time.perf_counter()
             if self.enemy_flag == False:
                 if combat_lib.CSDL.get_combat_state():
                     self.enemy_flag = True
@@ -381,20 +390,15 @@ class AimOperator(BaseThreading):
         Returns:
             _type_: _description_
         """
-        cap = self.itt.capture(jpgmode=FOUR_CHANNELS)
-        orsrc = cap.copy()
-        imsrc = combat_lib.get_enemy_blood_bar_img(cap)
-        _, imsrc2 = cv2.threshold(imsrc, 1, 255, cv2.THRESH_BINARY)
-        # cv2.imshow('123',retimg)
-        # cv2.waitKey(100)
+        state = combat_lib.get_combat_frame_state(max_age=combat_lib.COMBAT_STATE_MAX_AGE)
+        bars = state.blood_bars[combat_lib.ENEMY_BAR]
         if ret_mode == 1: # 返回点坐标
-            ret_point = img_manager.get_rect(imsrc2, orsrc, ret_mode=2)
-            return ret_point
+            return bars.centers
         elif ret_mode == 2: # 返回高度差
-            ret_rect = img_manager.get_rect(imsrc2, orsrc, ret_mode=0)
-            if ret_rect is None:
+            if not bars.rects:
                 return None
-            return ret_rect[2] - ret_rect[0]
+            x1, y1, x2, y2 = bars.rects[0]
+            return y2 - y1
 
     # def auto_aim(self):
         # # time.sleep(0.1)
@@ -47,10 +47,18 @@ class SwitchCharacterOperator(BaseThreading):
         self.reborn_timer = Timer(diff_start_time=150)  # 鸡蛋复活计时器
         self.position_check_timer = AdvanceTimer(0.3).start()  # position级别角色检查计时器
         self.mode = "Normal"
+        self.while_sleep = 0.1
 
     def run(self):
+        loop_pt = None
         while 1:
-            time.sleep(0.1)
+            # Loops end with `continue` anywhere, record the last working loop here
+            if loop_pt is not None:
+                self._record_loop(time.perf_counter() - loop_pt, sleep)
+                loop_pt = None
+            pt = time.perf_counter()
+            time.sleep(self.while_sleep)
+            sleep = time.perf_counter() - pt
             if self.stop_threading_flag:
                 self.tactic_operator.stop_threading()
                 return
@@ -58,7 +66,7 @@ class SwitchCharacterOperator(BaseThreading):
             if self.pause_threading_flag:
                 if self.working_flag:
                     self.working_flag = False
-                time.sleep(1)
+                self.wait_until_continue()
                 continue
 
             if not self.working_flag:  # tactic operator no working
@@ -66,16 +74,17 @@ class SwitchCharacterOperator(BaseThreading):
             if self.checkup_stop_func():
                 self.pause_threading_flag = True
                 continue
+            loop_pt = time.perf_counter()
             if self.mode == 'Shield':
                 self.aim_operator.pause_threading()
                 self.switch_character(switch_type="SHIELD")
-                time.sleep(1)
+                self._loop_sleep(1)
             else:
                 if self.aim_operator.sco_blocking_request.is_blocking():
                     self.aim_operator.sco_blocking_request.reply_request()
                     logger.debug("sco_blocking_request")
                     self.switch_character(switch_type="AFK")
-                    time.sleep(0.2)
+                    self._loop_sleep(0.2)
                     continue
                 if self.tactic_operator.get_working_statement():  # tactic operator working
                     # time.sleep(0.1)
@@ -86,7 +95,7 @@ class SwitchCharacterOperator(BaseThreading):
                     logger.debug("switch_character TRIGGER")
                     is_battled = self.switch_character(switch_type="TRIGGER")
                     if is_battled:
-                        time.sleep(0.4)
+                        self._loop_sleep(0.4)
                     else:
                         self.switch_character(switch_type="MAIN")
 
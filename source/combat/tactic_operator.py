@@ -8,6 +8,7 @@ import cv2
 from source.funclib import combat_lib
 from source.manager import posi_manager, asset
 from source.path_lib import *
+from source.combat.tactic_program import *
 
 # E_STRICT_MODE = True  # may cause more performance overhead
 
@@ -30,7 +31,6 @@ class TacticOperator(BaseThreading):
         self.hp_chara_list_position = [[283, 1698], [379, 1698], [475, 1698], [571, 1698]]
         self.chara_num = 4
         self.enter_timer = Timer()
-        self.pause_timer = Timer()
         self.itt = itt
         self.flag_tactic_executing = False # in class
         self.pause_tactic_flag = False
@@ -38,6 +38,26 @@ class TacticOperator(BaseThreading):
         self.tactic_group = None
         self.character = None
         self.tactic_exec_timer = AdvanceTimer(0.4).start()
+        self.op_handlers = {
+            OP_ATTACK: self.do_attack,
+            OP_DOWN_ATTACK: self.do_down_attack,
+            OP_Q: self.do_use_q,
+            OP_E: self.do_use_e,
+            OP_LONG_E: self.do_use_longe,
+            OP_LONG_ATTACK: self.do_long_attack,
+            OP_JUMP: self.do_jump,
+            OP_JUMP_ATTACK: self.do_jump_attack,
+            OP_SPRINT: self.do_sprint,
+            OP_AIM: self.do_aim,
+            OP_UNAIM: self.do_unaim,
+        }
+        self.condition_handlers = {
+            OP_IF_E: self.estimate_e_ready,
+            OP_IF_Q: self.estimate_q_ready,
+            OP_LOCK_E: self.estimate_lock_e_ready,
+            OP_LOCK_Q: self.estimate_lock_q_ready,
+        }
+        self.op_timing = {}  # op: [count, total seconds]
 
     def pause_threading(self):
         if self.pause_threading_flag != True:
@@ -68,18 +88,9 @@ class TacticOperator(BaseThreading):
                 return
 
             if self.pause_threading_flag:
-                if self.pause_timer.get_diff_time()<=4:
-                    time.sleep(0.02)
-                elif self.pause_timer.get_diff_time()<=8:
-                    time.sleep(0.05)
-                elif self.pause_timer.get_diff_time()<=20:
-                    time.sleep(0.1)
-                elif self.pause_timer.get_diff_time()<=60:
-                    time.sleep(0.2)
-                else:
-                    time.sleep(0.4)
+                # Woken by continue_threading at once, no backoff polling
+                self.wait_until_continue()
                 continue
-            self.pause_timer.reset()
             if self.checkup_stop_func():
                 self.pause_threading_flag = True
                 continue
@@ -91,33 +102,30 @@ class TacticOperator(BaseThreading):
                 self.pause_threading()
             if not self.pause_threading_flag:
                 logger.debug(f"exec tactic start")
+                pt = time.perf_counter()
                 self.execute_tactic(self.formered_tactic)
                 self.flag_tactic_executing = False
                 logger.debug(f"exec tactic end")
+                # No interval, woken by continue_threading. A tactic group takes as long as it takes, no overruns
+                self._record_loop(time.perf_counter() - pt, 0, period=0)
                 self.pause_threading()
 
     def set_parameter(self, tactic_group: str, character: Character):
         if tactic_group is None:
             self.tactic_group = None
             self.formered_tactic = None
+            combat_lib.q_ready_vision = None
             return
         self.tactic_group = tactic_group
         self.character = character
-        self.formered_tactic = self._tactic_group_former()
+        combat_lib.q_ready_vision = character.vision
+        self.formered_tactic = compile_tactic(tactic_group)
     
     def set_enter_timer(self, timer):
         self.enter_timer = timer
 
-    def _tactic_group_former(self):
-        tactic = self.tactic_group.split(';')
-        return tactic
-
     def is_e_available(self):  # 被击飞时不可用
-        cap = self.itt.capture(posi=posi_manager.posi_chara_smaller_e, jpgmode=2)
-        if cap.max() < 10:
-            return False
-        else:
-            return True
+        return combat_lib.get_combat_frame_state(max_age=combat_lib.COMBAT_STATE_MAX_AGE).e_available
 
     def _is_e_release(self, show_res = False):
         cap = self.itt.capture(posi=posi_manager.posi_chara_e, jpgmode=FOUR_CHANNELS)
@@ -362,177 +370,93 @@ class TacticOperator(BaseThreading):
         """Check Q-State by image recognition
 
         Args:
-            is_show (bool, optional): Whether to display recognized image. Defaults to False.
+            show_res (bool, optional): Whether to display recognized image. Defaults to False.
 
         Returns:
             bool: Whether Q-Skill can be triggered
         """
+        state = combat_lib.get_combat_frame_state(max_age=combat_lib.COMBAT_STATE_MAX_AGE)
+        if show_res or state.q_ready is None:
+            return combat_lib.is_q_ready_in(state.frame, self.character.vision, show_res=show_res)
+        return state.q_ready
 
-        cap = self.itt.capture(jpgmode=NORMAL_CHANNELS)
-        
-        imsrc = cap
-        imsrc_q_skill = crop(imsrc, posi_manager.posi_complete_chara_q)
-        mask = np.zeros_like(imsrc_q_skill[:,:,0])
-        hh, ww = imsrc_q_skill.shape[:2]
-        xc = hh // 2
-        yc = ww // 2
-        radius1 = 53
-        radius2 = 47
-        cv2.circle(mask, (xc,yc), radius1, (255,255,255), -1)
-        cv2.circle(mask, (xc,yc), radius2, (0,0,0), -1)
-        # mask = cv2.subtract(mask2, mask1)
-        res1 = cv2.bitwise_and(imsrc_q_skill,imsrc_q_skill,mask=mask)
-        # res1 = imsrc_q_skill.copy()
-        HUE_DELTA = 5
-        
-        # stone HSV=0.12538226299694,0.85490196078431,1
-        # fire 
-        
-        orhsv = Q_SKILL_COLOR[self.character.vision]
-        # orhsv = Q_SKILL_COLOR['Hydro']
-        hsv_lower = np.array([int(max(0,orhsv[0]*180-HUE_DELTA)), int(max(orhsv[1]*255-60, 50)), 200])
-        hsv_upper = np.array([int(min(179,orhsv[0]*180+HUE_DELTA)), int(min(orhsv[1]*255+60, 255)), 255])
-        hsv = cv2.cvtColor(res1.copy(), cv2.COLOR_BGR2HSV)
-        mask2 = cv2.inRange(hsv, hsv_lower, hsv_upper)
-        res = len(np.where(mask2==255)[0])
-        if show_res:
-            print(f"num: {res}")
-            # res2 = cv2.bitwise_and(hsv,hsv, mask=mask2)
-            cv2.imshow("res", mask2)
-            cv2.waitKey(100)
-        r = res>=(650*DETERMINING_WEIGHT)
-        return r
-            
-        # if is_show:
-        #     cv2.imshow("is_q_ready", cap)
-        #     cv2.waitKey(10)
-        # # cap = self.itt.png2jpg(cap, channel='bg', alpha_num=160)
-        # # img_manager.qshow(cap)
-        # # p = posi_manager.posi_chara_q_point
-        # if cap.max() > 10:
-        #     # print(cap.max())
-        #     return True
+    def _execute_branch(self, block):
+        self.unconventionality_situation_detection()
+        self._execute_block(block)
 
-        # else:
-        #     # print(cap.max())
-        #     return False
+    def estimate_e_ready(self, instruction: Instruction):  # e?
+        then_block, else_block = instruction.arg
+        self._execute_branch(then_block if self.character.is_E_ready() else else_block)
 
-    def estimate_e_ready(self, tactic):
-        is_ready = self.character.is_E_ready()
-        tas = tactic[tactic.index('?') + 1:]
-        tas = tas.split(':')
-        if is_ready:
-            self.execute_tactic([tas[0].replace('.', ',')])
-        else:
-            self.execute_tactic([tas[1].replace('.', ',')])
-
-    def estimate_q_ready(self, tactic):
-        is_ready = self.is_q_ready()
-        # print(is_ready)
-        tas = tactic[tactic.index('?') + 1:]
-        tas = tas.split(':')
-        if is_ready:
-            self.execute_tactic([tas[0].replace('.', ',')])
-        else:
-            self.execute_tactic([tas[1].replace('.', ',')])
-
-    def estimate_lock_e_ready(self, tactic):  # #@e?
-        is_ready = not self.character.is_E_pass()
-        tas = tactic[4:]
-        tas = tas.split(':')
-        if is_ready:
-            tas[0] = tas[0].replace('.', ',')
-            while (not self.character.is_E_pass()) and (not self.checkup_stop_func()):
-                if self.checkup_stop_func():
-                    return 0
-                if self.pause_tactic_flag:
-                    return 0
-                self.unconventionality_situation_detection()
-                self.execute_tactic([tas[0]])
-        else:
-            tas[1] = tas[1].replace('.', ',')
-            self.execute_tactic([tas[1]])
-
-    def estimate_lock_q_ready(self, tactic):  # #@q?
-        is_ready = not self.character.is_Q_pass()
-        tas = tactic[4:]
-        tas = tas.split(':')
-        if is_ready:
-            tas[0].replace('.', ',')
+    def estimate_q_ready(self, instruction: Instruction):  # q?
+        then_block, else_block = instruction.arg
+        self._execute_branch(then_block if self.is_q_ready() else else_block)
+
+    def estimate_lock_e_ready(self, instruction: Instruction):  # #@e?
+        then_block, else_block = instruction.arg
+        if self.character.is_E_pass():
+            self._execute_branch(else_block)
+            return
+        while not self.character.is_E_pass():
             if self.checkup_stop_func():
-                logger.debug('lock stop')
+                return 0
             if self.pause_tactic_flag:
                 return 0
-            while (not self.character.is_Q_pass()) and (not self.checkup_stop_func()):
-                if self.checkup_stop_func():
-                    return 0
-                if self.pause_tactic_flag:
-                    return 0
-                self.unconventionality_situation_detection()
-                self.execute_tactic([tas[0]])
-        else:
-            tas[1].replace('.', ',')
-            self.execute_tactic([tas[1]])
+            self.unconventionality_situation_detection()
+            self._execute_branch(then_block)
 
-    def execute_tactic(self, tactic_list):
+    def estimate_lock_q_ready(self, instruction: Instruction):  # #@q?
+        then_block, else_block = instruction.arg
+        if self.character.is_Q_pass():
+            self._execute_branch(else_block)
+            return
+        while not self.character.is_Q_pass():
+            if self.checkup_stop_func():
+                return 0
+            if self.pause_tactic_flag:
+                return 0
+            self.unconventionality_situation_detection()
+            self._execute_branch(then_block)
+
+    def _execute_block(self, block):
+        op_handlers = self.op_handlers
+        op_timing = self.op_timing
+        for instruction in block:
+            if self.pause_tactic_flag or self.checkup_stop_func():
+                break
+            op = instruction.op
+            if op == OP_BREAK:
+                break
+            pt = time.perf_counter()
+            if op == OP_DELAY:
+                self.itt.delay(instruction.arg, randtime=False)
+            elif op in op_handlers:
+                op_handlers[op]()
+            else:
+                self.condition_handlers[op](instruction)
+            record = op_timing.get(op)
+            if record is None:
+                record = op_timing[op] = [0, 0.]
+            record[0] += 1
+            record[1] += time.perf_counter() - pt
+
+    def execute_tactic(self, program: TacticProgram):
         self.flag_tactic_executing = True
         self.unconventionality_situation_detection()
 
-        for tactic in tactic_list:
+        for block in program.blocks:
             if self.checkup_stop_func():
                 return 0
             if self.pause_tactic_flag:
                 break
-            tactic = tactic.split(',')
-            for tas in tactic:
-                if self.checkup_stop_func():
-                    break
-                if self.pause_tactic_flag:
-                    break
-                if tas == 'a':
-                    self.do_attack()
-                elif tas == 'da':
-                    self.do_down_attack()
-                elif tas == 'q':
-                    self.do_use_q()
-                elif tas == 'e':
-                    self.do_use_e()
-                elif tas == 'e~':
-                    self.do_use_longe()
-                elif tas == 'a~':
-                    self.do_long_attack()
-                elif tas == 'j':
-                    self.do_jump()
-                elif tas == 'ja':
-                    self.do_jump_attack()
-                elif tas == 'sp':
-                    self.do_sprint()
-                elif tas == 'r':
-                    self.do_aim()
-                elif tas == 'rr':
-                    self.do_unaim()
-                elif is_int(tas):
-                    self.itt.delay(int(tas) / 1000, randtime=False)
-                elif tas == '>':
-                    break
-                elif tas == 'none':
-                    pass
-                elif '?' in tas:
-                    tas1 = tas[0:tas.index('?') + 1]
-                    if tas1 == 'e?':
-                        self.estimate_e_ready(tas)
-                    elif tas1 == '#@e?':
-                        self.estimate_lock_e_ready(tas)
-                    elif tas1 == 'q?':
-                        self.estimate_q_ready(tas)
-                    elif tas1 == '#@q?':
-                        self.estimate_lock_q_ready(tas)
-                    else:
-                        logger.warning(t2t("Unknown tactic key: ") + str(tas1))
-                elif tas == '':
-                    logger.debug('tactic key: null')
-                else:
-                    logger.warning(t2t("Unknown tactic key: ")+str(tas))
+            self._execute_block(block)
+
+    def get_op_timing(self) -> dict:
+        """
+        Returns:
+            dict: {op: (count, average seconds)}. Time of conditions includes their branches.
+        """
+        return {op: (count, total / count) for op, (count, total) in self.op_timing.items()}
 
 
         
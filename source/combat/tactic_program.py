@@ -0,0 +1,133 @@
+"""
+Compiled tactic programs.
+
+A tactic group such as `e?e~:none;a,a,200,#@q?q.a:none` is parsed once into a TacticProgram:
+    `;` separates blocks, `,` separates instructions in a block.
+    Conditional instructions (`e?`, `q?`, `#@e?`, `#@q?`) keep their two branches as compiled blocks,
+    where `.` separates instructions.
+    Delays are resolved to seconds, `none` and empty keys are dropped.
+Unknown keys are collected in TacticProgram.errors, so they can be reported when tactics are loaded.
+
+Programs are immutable and cached by tactic string, TacticOperator.execute_tactic runs them.
+"""
+import functools
+
+from source.util import *
+
+# Actions, executed by TacticOperator.do_*
+OP_ATTACK = 'a'
+OP_DOWN_ATTACK = 'da'
+OP_Q = 'q'
+OP_E = 'e'
+OP_LONG_E = 'e~'
+OP_LONG_ATTACK = 'a~'
+OP_JUMP = 'j'
+OP_JUMP_ATTACK = 'ja'
+OP_SPRINT = 'sp'
+OP_AIM = 'r'
+OP_UNAIM = 'rr'
+# Control
+OP_DELAY = 'delay'
+OP_BREAK = '>'
+OP_NONE = 'none'
+# Conditions, arg is (then block, else block)
+OP_IF_E = 'e?'
+OP_IF_Q = 'q?'
+OP_LOCK_E = '#@e?'
+OP_LOCK_Q = '#@q?'
+
+ACTION_OPS = [OP_ATTACK, OP_DOWN_ATTACK, OP_Q, OP_E, OP_LONG_E, OP_LONG_ATTACK, OP_JUMP, OP_JUMP_ATTACK,
+              OP_SPRINT, OP_AIM, OP_UNAIM]
+CONDITION_OPS = [OP_IF_E, OP_IF_Q, OP_LOCK_E, OP_LOCK_Q]
+
+
+class Instruction(t.NamedTuple):
+    op: str
+    arg: t.Any
+    """Seconds for OP_DELAY, (then block, else block) for conditions, None for others"""
+    source: str
+    """Original tactic key"""
+
+
+class TacticProgram:
+    def __init__(self, source: str, blocks: t.Tuple[t.Tuple[Instruction, ...], ...], errors: t.Tuple[str, ...]):
+        """
+        Args:
+            source: Tactic string.
+            blocks: Compiled blocks, executed in order.
+            errors: Unknown or malformed keys.
+        """
+        self.source = source
+        self.blocks = blocks
+        self.errors = errors
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __repr__(self):
+        return f'TacticProgram({self.source})'
+
+
+def _compile_key(key: str, errors: list, in_branch=False) -> t.Optional[Instruction]:
+    if key in ACTION_OPS or key == OP_BREAK:
+        return Instruction(key, None, key)
+    if key == OP_NONE or key == '':
+        return None
+    if is_int(key):
+        return Instruction(OP_DELAY, int(key) / 1000, key)
+    if '?' in key:
+        op = key[:key.index('?') + 1]
+        if op not in CONDITION_OPS:
+            errors.append(key)
+            return None
+        if in_branch:
+            errors.append(f'{key} (conditions can not be nested)')
+            return None
+        branches = key[len(op):].split(':')
+        if len(branches) != 2:
+            errors.append(f'{key} (expected {op}<then>:<else>)')
+            branches = (branches + [''])[:2]
+        then_block, else_block = [_compile_block(branch.split('.'), errors, in_branch=True) for branch in branches]
+        return Instruction(op, (then_block, else_block), key)
+    errors.append(key)
+    return None
+
+
+def _compile_block(keys, errors: list, in_branch=False) -> t.Tuple[Instruction, ...]:
+    block = []
+    for key in keys:
+        instruction = _compile_key(key, errors, in_branch=in_branch)
+        if instruction is not None:
+            block.append(instruction)
+    return tuple(block)
+
+
+@functools.lru_cache(maxsize=128)
+def compile_tactic(tactic_group: str) -> TacticProgram:
+    """
+    Args:
+        tactic_group: Tactic string of a character.
+
+    Returns:
+        TacticProgram: Empty blocks are dropped.
+    """
+    errors = []
+    blocks = []
+    for tactic in tactic_group.split(';'):
+        block = _compile_block(tactic.split(','), errors)
+        if block:
+            blocks.append(block)
+    return TacticProgram(tactic_group, tuple(blocks), tuple(errors))
+
+
+def validate_tactic(tactic_group: str, name='') -> bool:
+    """
+    Log unknown keys of tactic_group.
+
+    Returns:
+        bool: True if there is no unknown key.
+    """
+    program = compile_tactic(tactic_group)
+    for error in program.errors:
+        logger.warning(f'{name}: ' + t2t("Unknown tactic key: ") + error)
+    return not program.errors
@@ -127,10 +127,11 @@ class CommissionParser():
         else:
             ocr_res = ocr.get_all_texts(img_choose)
         
-        for ocr_i in ocr_res:
-            for com_i in COMMISSION_NAMES:
-                if com_i.text in ocr_i:
-                    return com_i.name
+        hit = COMMISSION_MATCHER.match_first(ocr_res, max_distance=1)
+        if hit is not None:
+            if hit.distance > 0:
+                logger.info(f"Commission type fuzzy matched: {hit.text} <- {ocr_res[hit.line]}")
+            return hit.key
         
         logger.warning(f"Unknown commission type: {ocr_res}")
         
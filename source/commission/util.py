@@ -2,6 +2,7 @@ from source.util import *
 from source.manager import asset
 from source.mission.mission_template import ERR_FAIL
 from source.commission.assets import *
+from source.ocr.matcher import TextMatcher
 COMMISSION_NAMES = [asset.ASmallStepForHilichurls,
                     asset.IncreasingDanger,
                     asset.Emergency,
@@ -18,5 +19,6 @@ COMMISSION_NAMES = [asset.ASmallStepForHilichurls,
                     CrisisOfShields,
                     GuyInTheBackground
                     ]
+COMMISSION_MATCHER = TextMatcher().add_texts({i.name: i.text for i in COMMISSION_NAMES})
 
 # ALL_COMMISSION_TYPE = ["ASmallStepForHilichurls", "IncreasingDanger"]
\ No newline at end of file
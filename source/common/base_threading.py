@@ -4,6 +4,7 @@ from source.funclib.err_code_lib import ERR_NONE
 from source.util import *
 from source.exceptions import *
 from source.cvars import THREAD_PAUSE_FORCE_TERMINATE, THREAD_PAUSE_SET_FLAG_ONLY
+from source.common.loop_metrics import LOOP_METRICS
 import multiprocessing
 
 
@@ -21,6 +22,10 @@ class BaseThreading(threading.Thread):
 
     def __init__(self, thread_name=None):
         super().__init__()
+        # 暂停、继续、停止时通知等待中的线程。暂停的线程阻塞在这里，不占用CPU。
+        self._state_condition = threading.Condition()
+        self._pause_flag = False
+        self._stop_flag = False
         self._init_succ_flag = False  # 在初始化很慢的线程中使用
         self.pause_threading_flag = False  # 暂停线程标记
         self.stop_threading_flag = False  # 线程停止标记
@@ -29,9 +34,57 @@ class BaseThreading(threading.Thread):
         self.last_err_code = ERR_NONE  # 错误码
         self.stop_func_list = []  # 停止函数列表。check_up_stop_func时循环执行里面的函数，如果有返回值为true的函数即停止。
         self.sub_threading_list = []  # 子线程列表
+        self._loop_metrics = None  # 循环耗时统计，第一次循环时创建
+        self._loop_slept = 0  # 本次循环中_loop_sleep的时间，记录时从busy移到sleep
         if thread_name != None:
             self.setName(thread_name)
 
+    @property
+    def pause_threading_flag(self):
+        return self._pause_flag
+
+    @pause_threading_flag.setter
+    def pause_threading_flag(self, value):
+        with self._state_condition:
+            self._pause_flag = value
+            self._state_condition.notify_all()
+
+    @property
+    def stop_threading_flag(self):
+        return self._stop_flag
+
+    @stop_threading_flag.setter
+    def stop_threading_flag(self, value):
+        with self._state_condition:
+            self._stop_flag = value
+            self._state_condition.notify_all()
+
+    def wait_until_continue(self, timeout=None) -> bool:
+        """
+        阻塞直到线程继续或停止。
+
+        Args:
+            timeout: 最长等待时间，None为一直等待。
+
+        Returns:
+            bool: 是否处于运行状态（未暂停且未停止）。
+        """
+        with self._state_condition:
+            self._state_condition.wait_for(lambda: not self._pause_flag or self._stop_flag, timeout=timeout)
+            return not self._pause_flag and not self._stop_flag
+
+    def sleep_unless_paused(self, seconds) -> bool:
+        """
+        等待seconds秒，暂停或停止时立即返回。用于替代循环中的time.sleep。
+
+        Returns:
+            bool: 是否等满了seconds秒。
+        """
+        if seconds <= 0:
+            return not (self._pause_flag or self._stop_flag)
+        with self._state_condition:
+            return not self._state_condition.wait_for(lambda: self._pause_flag or self._stop_flag, timeout=seconds)
+
     def set_pause_method(self, mode=THREAD_PAUSE_SET_FLAG_ONLY):
         self.pause_method = mode
 
@@ -194,7 +247,6 @@ class BaseThreading(threading.Thread):
 
     def run(self):
         while 1:
-            time.sleep(self.while_sleep)
             if self.stop_threading_flag:
                 logger.debug(f"{self.name} stop.")
                 return
@@ -203,7 +255,7 @@ class BaseThreading(threading.Thread):
                 if self.working_flag:
                     self.working_flag = False
                 self._thread_paused_flag=True
-                time.sleep(1)
+                self.wait_until_continue()
                 continue
             else:
                 self._thread_paused_flag = False
@@ -215,11 +267,52 @@ class BaseThreading(threading.Thread):
                 self.pause_threading_flag = True
                 continue
 
+            pt = time.perf_counter()
             self.loop()
+            busy = time.perf_counter() - pt
+            self.sleep_unless_paused(self.while_sleep)
+            self._record_loop(busy, time.perf_counter() - pt - busy)
 
     def get_working_statement(self):
         return not self.pause_threading_flag
 
+    def get_while_sleep(self):
+        return self.while_sleep
+
+    def _loop_sleep(self, seconds):
+        """循环中有意的等待，记录时算作sleep而不是busy。只在本线程中调用。
+
+        Args:
+            seconds: 等待时间，秒
+        """
+        pt = time.perf_counter()
+        time.sleep(seconds)
+        self._loop_slept += time.perf_counter() - pt
+
+    def _record_loop(self, busy, sleep, period=None):
+        """记录一次循环的耗时。只在本线程中调用。
+
+        Args:
+            busy: loop耗时，秒，包括_loop_sleep的时间
+            sleep: 循环间隔等待时间，秒
+            period: 预期的循环间隔，busy超过即超时。默认为get_while_sleep()，0为没有预期间隔。
+        """
+        if self._loop_metrics is None:
+            self._loop_metrics = LOOP_METRICS.create(self)
+        self._loop_metrics.while_sleep = self.get_while_sleep() if period is None else period
+        slept, self._loop_slept = self._loop_slept, 0
+        self._loop_metrics.record(busy - slept, sleep + slept)
+
+    def get_loop_metrics(self):
+        """获得循环耗时统计。
+
+        Returns:
+            dict: 见LoopMetrics.snapshot，还没有循环过时为None
+        """
+        if self._loop_metrics is None:
+            return None
+        return self._loop_metrics.snapshot()
+
     def add_stop_func(self, x):
         self.stop_func_list.append(x)
 
@@ -249,14 +342,39 @@ class AdvanceThreading(BaseThreading):
             threading_obj.stop_threading()
         threading_obj.continue_threading(ignore_warning=True)
         while 1:
-            time.sleep(threading_obj.while_sleep)
+            pt = time.perf_counter()
+            threading_obj.sleep_unless_paused(threading_obj.while_sleep)
+            sleep = time.perf_counter() - pt
             threading_obj.loop()
+            threading_obj._record_loop(time.perf_counter() - pt - sleep, sleep)
             if threading_obj.pause_threading_flag:
                 break
             if self.checkup_stop_func():
                 break
         return threading_obj.get_last_err_code()
 
+    def cooperative_startup(self, threading_objs: t.List[BaseThreading], until=lambda: False):
+        """协作启动模式。
+        与blocking_startup相同，不作为线程启动，而是在当前线程的一个CooperativeScheduler上轮流执行各对象的loop函数。
+        所有对象暂停或结束、until返回True、或本线程checkup_stop_func为True时返回。
+
+        Args:
+            threading_objs (t.List[BaseThreading]): 未作为线程启动的对象
+            until (optional): 返回True时结束.
+
+        Returns:
+            list: 各对象的错误码
+        """
+        from source.common.cooperative_scheduler import CooperativeScheduler
+        scheduler = CooperativeScheduler(name=f'{self.name}Scheduler')
+        for threading_obj in threading_objs:
+            if threading_obj.is_alive():
+                threading_obj.stop_threading()
+            threading_obj.continue_threading(ignore_warning=True)
+            scheduler.add(threading_obj)
+        scheduler.run(until=lambda: until() or scheduler.is_idle() or self.checkup_stop_func())
+        return [threading_obj.get_last_err_code() for threading_obj in threading_objs]
+
 
 class FunctionThreading(AdvanceThreading):
     """目前没啥用
@@ -523,4 +641,3 @@ if __name__ == '__main__':
     # t.join()
     while 1:
         time.sleep(1)
-
@@ -0,0 +1,309 @@
+"""
+Cooperative single-loop scheduler.
+
+Runs many loops on one OS thread instead of one thread each. A task is either:
+    a BaseThreading object: one call of its `loop()` is one step, with the same pause, stop and
+        checkup_stop_func handling as BaseThreading.run, and `get_while_sleep()` seconds between steps.
+        FlowController is driven the same way, one `enter_flow` per step.
+    a generator: each `yield` is a yield point. `yield seconds` waits before the next step,
+        `yield None` or `yield 0` runs again in the next tick.
+
+Tasks run in order of (due time, order added), so with the same clock the step order is always the same.
+A step is not interrupted, a loop that blocks inside (itt.delay, while 1) holds the scheduler until it returns.
+Use it for loops which return quickly. Tasks and missions are not run on it: their steps wait inside for
+their sub-threads (flow controllers, operators), which would never be stepped on the same thread.
+
+Examples:
+    scheduler = CooperativeScheduler()
+    scheduler.add(flow_controller)
+    scheduler.add(pickup_operator)
+    scheduler.run(until=lambda: flow_controller.pause_threading_flag)
+
+Context switch overhead and decision latency against threads:
+    python -m source.common.cooperative_scheduler
+Deterministic ordering is tested in tests/common/test_cooperative_scheduler.py.
+"""
+import heapq
+import threading
+import types
+
+from source.util import *
+from source.common.base_threading import BaseThreading
+
+# Paused tasks are checked at this interval. Pause and continue are set by other threads.
+PARKED_CHECK_INTERVAL = 0.05
+
+
+class _Parked:
+    """Yielded by a task which is paused, it is resumed when `resume()` returns True."""
+
+    def __init__(self, resume):
+        self.resume = resume
+
+
+class ScheduledTask:
+    def __init__(self, name, steps: t.Generator, seq: int, owner=None):
+        """
+        Args:
+            name:
+            steps: Generator of the task.
+            seq: Order of adding, breaks ties of due time.
+            owner: BaseThreading object of the task, None for generators.
+        """
+        self.name = name
+        self.steps = steps
+        self.seq = seq
+        self.owner = owner
+        self.due = 0.
+        self.parked: t.Optional[_Parked] = None
+        self.step_count = 0
+        self.busy_time = 0.
+        self.max_lateness = 0.
+        """Max delay between due time and the start of a step, seconds"""
+        self.done = False
+
+    def __lt__(self, other):
+        return (self.due, self.seq) < (other.due, other.seq)
+
+    def __repr__(self):
+        return f'ScheduledTask({self.name}, steps={self.step_count})'
+
+
+def threading_steps(obj: BaseThreading):
+    """
+    Steps of a BaseThreading object, same as BaseThreading.run.
+    """
+    while 1:
+        if obj.stop_threading_flag:
+            logger.debug(f"{obj.name} stop.")
+            return
+        if obj.pause_threading_flag:
+            if obj.working_flag:
+                obj.working_flag = False
+            obj._thread_paused_flag = True
+            yield _Parked(lambda: not obj.pause_threading_flag or obj.stop_threading_flag)
+            continue
+        obj._thread_paused_flag = False
+        if not obj.working_flag:
+            obj.working_flag = True
+        if obj.checkup_stop_func():
+            obj.pause_threading_flag = True
+            continue
+        pt = time.perf_counter()
+        obj.loop()
+        busy = time.perf_counter() - pt
+        yield obj.get_while_sleep()
+        obj._record_loop(busy, time.perf_counter() - pt - busy)
+
+
+class CooperativeScheduler:
+    def __init__(self, name='CooperativeScheduler', clock=time.perf_counter, sleep=time.sleep):
+        """
+        Args:
+            name:
+            clock: Seconds, monotonic.
+            sleep: Called with seconds when no task is due. A fake clock and sleep make runs reproducible.
+        """
+        self.name = name
+        self.clock = clock
+        self.sleep = sleep
+        self.tasks: t.List[ScheduledTask] = []
+        self._queue: t.List[ScheduledTask] = []
+        self._parked: t.List[ScheduledTask] = []
+        self._seq = 0
+        self._stop_flag = False
+        self.on_error = self._default_on_error
+
+    def add(self, task, name=None) -> ScheduledTask:
+        """
+        Args:
+            task: BaseThreading object or generator. BaseThreading objects must not be started as threads.
+            name: Defaults to the thread name or the generator name.
+
+        Returns:
+            ScheduledTask
+        """
+        if isinstance(task, BaseThreading):
+            if task.is_alive():
+                logger.warning(f'{task.name} is running as a thread, it will be stepped by both.')
+            steps, owner, name = threading_steps(task), task, name or task.name
+        elif isinstance(task, types.GeneratorType):
+            steps, owner, name = task, None, name or task.__name__
+        else:
+            raise TypeError(f'Cannot schedule {task!r}, expected BaseThreading or generator')
+        scheduled = ScheduledTask(name, steps, self._seq, owner=owner)
+        self._seq += 1
+        scheduled.due = self.clock()
+        self.tasks.append(scheduled)
+        heapq.heappush(self._queue, scheduled)
+        return scheduled
+
+    def stop(self):
+        """Stop `run` after the current step. Thread safe."""
+        self._stop_flag = True
+
+    def is_idle(self) -> bool:
+        """
+        Returns:
+            bool: True if every task is finished or paused.
+        """
+        return not self._queue
+
+    def _default_on_error(self, task: ScheduledTask, e: Exception):
+        # Same as an exception ending a thread
+        threading.excepthook(threading.ExceptHookArgs([type(e), e, e.__traceback__, task.owner]))
+
+    def _step(self, task: ScheduledTask, now: float):
+        task.max_lateness = max(task.max_lateness, now - task.due)
+        try:
+            ret = next(task.steps)
+        except StopIteration:
+            task.done = True
+            return
+        except Exception as e:
+            task.done = True
+            if task.owner is not None:
+                task.owner.stop_threading()
+            self.on_error(task, e)
+            return
+        finally:
+            end = self.clock()
+            task.busy_time += end - now
+            task.step_count += 1
+        if isinstance(ret, _Parked):
+            task.parked = ret
+            self._parked.append(task)
+            return
+        task.due = end + (ret or 0)
+        heapq.heappush(self._queue, task)
+
+    def _resume_parked(self):
+        if not self._parked:
+            return
+        now = self.clock()
+        parked = []
+        for task in self._parked:
+            if task.parked.resume():
+                task.parked = None
+                task.due = now
+                heapq.heappush(self._queue, task)
+            else:
+                parked.append(task)
+        self._parked = parked
+
+    def tick(self) -> int:
+        """
+        Run every task which is due now, once.
+
+        Returns:
+            int: Number of steps run.
+        """
+        self._resume_parked()
+        now = self.clock()
+        due = []
+        while self._queue and self._queue[0].due <= now:
+            due.append(heapq.heappop(self._queue))
+        for task in due:
+            self._step(task, self.clock())
+        return len(due)
+
+    def next_due(self) -> t.Optional[float]:
+        """
+        Returns:
+            Seconds until the next task is due, None if there is none.
+        """
+        if not self._queue:
+            return None
+        return max(self._queue[0].due - self.clock(), 0)
+
+    def run(self, until=lambda: False, timeout=None):
+        """
+        Run tasks on the current thread.
+
+        Args:
+            until: Stop when it returns True, checked between ticks.
+            timeout: Seconds. None for no limit.
+
+        Returns:
+            bool: False if timeout, else True. Returns when stopped, `until` is True, or all tasks are finished.
+        """
+        self._stop_flag = False
+        start = self.clock()
+        while not self._stop_flag:
+            if until():
+                return True
+            if timeout is not None and self.clock() - start >= timeout:
+                return False
+            if not self._queue and not self._parked:
+                return True
+            self.tick()
+            wait = self.next_due()
+            if self._parked:
+                wait = PARKED_CHECK_INTERVAL if wait is None else min(wait, PARKED_CHECK_INTERVAL)
+            if wait:
+                self.sleep(wait)
+        return True
+
+    def statistics(self) -> t.List[dict]:
+        return [{
+            'name': task.name,
+            'steps': task.step_count,
+            'busy_ms': round(task.busy_time * 1000, 3),
+            'max_lateness_ms': round(task.max_lateness * 1000, 3),
+            'done': task.done,
+        } for task in self.tasks]
+
+
+if __name__ == '__main__':
+    # Same workload on threads and on one scheduler:
+    #   cpu_per_step_us: process CPU time per loop step, includes switching threads and the GIL.
+    #   lateness: delay between the end of while_sleep and the start of the next step, the decision latency.
+    N_LOOPS = 16
+    DURATION = 3
+    WORK = 20000
+
+    def percentile(values, q):
+        values = sorted(values)
+        return round(values[min(int(len(values) * q), len(values) - 1)] * 1000, 3) if values else 0.
+
+    class BenchLoop(BaseThreading):
+        def __init__(self, index):
+            super().__init__(thread_name=f'BenchLoop{index}')
+            self.while_sleep = 0.01 + index * 0.001
+            self.due = None
+            self.lateness = []
+
+        def loop(self):
+            now = time.perf_counter()
+            if self.due is not None:
+                self.lateness.append(now - self.due)
+            sum(range(WORK))
+            self.due = time.perf_counter() + self.while_sleep
+
+    def report(mode, loops, cpu, threads):
+        steps = sum(len(loop.lateness) + 1 for loop in loops)
+        lateness = [x for loop in loops for x in loop.lateness]
+        logger.info(f'{mode}: threads {threads}, steps {steps}, '
+                    f'cpu_per_step_us {round(cpu / steps * 1e6, 1)}, '
+                    f'lateness p50 {percentile(lateness, 0.5)}ms p99 {percentile(lateness, 0.99)}ms')
+
+    loops = [BenchLoop(i) for i in range(N_LOOPS)]
+    cpu = time.process_time()
+    for loop in loops:
+        loop.daemon = True
+        loop.start()
+    time.sleep(DURATION)
+    threads = threading.active_count()
+    for loop in loops:
+        loop.stop_threading()
+    cpu = time.process_time() - cpu
+    report('threads', loops, cpu, threads)
+
+    loops = [BenchLoop(i) for i in range(N_LOOPS)]
+    scheduler = CooperativeScheduler()
+    for loop in loops:
+        scheduler.add(loop)
+    cpu = time.process_time()
+    scheduler.run(timeout=DURATION)
+    cpu = time.process_time() - cpu
+    report('scheduler', loops, cpu, threading.active_count())
@@ -0,0 +1,165 @@
+"""
+Loop timing metrics of threads.
+
+Each thread loop records every iteration into its own LoopMetrics:
+    busy: time of the loop body.
+    sleep: time waiting between iterations, `while_sleep` if nothing else happens.
+    busy histogram: fixed buckets, p50/p95/p99 are read from it.
+A LoopMetrics is written only by the thread it belongs to, so recording takes no lock. Snapshots read
+the counters without locking, values of one snapshot may be off by the iteration in progress.
+
+Examples:
+    LOOP_METRICS.snapshot()          # list of dict, busiest first
+    logger.info(LOOP_METRICS.format_snapshot())
+Every Dev.LoopMetricsLogInterval seconds the summary is logged at debug level, 0 to disable.
+"""
+import bisect
+import threading
+import weakref
+
+from source.util import *
+
+# Upper bounds of histogram buckets, seconds. 0.1ms to 9.3s, 2 buckets per doubling.
+BUSY_BUCKETS = [0.0001 * 2 ** (i / 2) for i in range(34)]
+
+
+class LoopMetrics:
+    __slots__ = ['name', 'while_sleep', 'iterations', 'busy_time', 'sleep_time', 'max_busy', 'overruns',
+                 'buckets', 'start_time', '__weakref__']
+
+    def __init__(self, name, while_sleep=0.):
+        """
+        Args:
+            name: Thread name.
+            while_sleep: Expected interval, an iteration busier than this is an overrun.
+        """
+        self.name = name
+        self.while_sleep = while_sleep
+        self.iterations = 0
+        self.busy_time = 0.
+        self.sleep_time = 0.
+        self.max_busy = 0.
+        self.overruns = 0
+        self.buckets = [0] * (len(BUSY_BUCKETS) + 1)
+        self.start_time = time.time()
+
+    def record(self, busy: float, sleep: float):
+        """
+        Args:
+            busy: Seconds in loop body.
+            sleep: Seconds waiting after it.
+        """
+        self.iterations += 1
+        self.busy_time += busy
+        self.sleep_time += sleep
+        if busy > self.max_busy:
+            self.max_busy = busy
+        if self.while_sleep and busy > self.while_sleep:
+            self.overruns += 1
+        self.buckets[bisect.bisect_left(BUSY_BUCKETS, busy)] += 1
+
+    def percentile(self, q: float) -> float:
+        """
+        Args:
+            q: 0-1
+
+        Returns:
+            float: Upper bound of the bucket, seconds. Not more than max_busy.
+        """
+        buckets = list(self.buckets)
+        total = sum(buckets)
+        if not total:
+            return 0.
+        rank = q * total
+        count = 0
+        for i, n in enumerate(buckets):
+            count += n
+            if count >= rank and n:
+                return min(BUSY_BUCKETS[i], self.max_busy) if i < len(BUSY_BUCKETS) else self.max_busy
+        return self.max_busy
+
+    def reset(self):
+        self.__init__(self.name, self.while_sleep)
+
+    def snapshot(self) -> dict:
+        iterations = self.iterations
+        busy, sleep = self.busy_time, self.sleep_time
+
+        def ms(x):
+            return round(x * 1000, 2)
+
+        return {
+            'name': self.name,
+            'iterations': iterations,
+            'busy_s': round(busy, 3),
+            'sleep_s': round(sleep, 3),
+            'utilisation': round(busy / (busy + sleep), 3) if busy + sleep else 0.,
+            'period_ms': ms((busy + sleep) / iterations) if iterations else 0.,
+            'while_sleep_ms': ms(self.while_sleep),
+            'p50_ms': ms(self.percentile(0.5)),
+            'p95_ms': ms(self.percentile(0.95)),
+            'p99_ms': ms(self.percentile(0.99)),
+            'max_ms': ms(self.max_busy),
+            'overruns': self.overruns,
+        }
+
+
+class LoopMetricsRegistry:
+    def __init__(self):
+        # Metrics are owned by thread objects, and dropped with them.
+        self._metrics: t.Dict[int, LoopMetrics] = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self._reporter = None
+
+    def create(self, owner, while_sleep=0.) -> LoopMetrics:
+        """
+        Args:
+            owner: Thread object. Keep the returned LoopMetrics on it.
+            while_sleep:
+
+        Returns:
+            LoopMetrics
+        """
+        metrics = LoopMetrics(getattr(owner, 'name', '') or type(owner).__name__, while_sleep)
+        with self._lock:
+            self._metrics[id(metrics)] = metrics
+            if self._reporter is None:
+                self._start_reporter()
+        return metrics
+
+    def snapshot(self) -> t.List[dict]:
+        """
+        Returns:
+            list: LoopMetrics.snapshot of every thread, busiest first.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return sorted((m.snapshot() for m in metrics), key=lambda x: x['busy_s'], reverse=True)
+
+    def format_snapshot(self, limit=10) -> str:
+        lines = ['loop metrics (busy p50/p95/p99/max ms, period/while_sleep ms):']
+        for s in self.snapshot()[:limit]:
+            line = (f"  {s['name']}: iter {s['iterations']}, util {s['utilisation']}, "
+                    f"busy {s['p50_ms']}/{s['p95_ms']}/{s['p99_ms']}/{s['max_ms']}, "
+                    f"period {s['period_ms']}/{s['while_sleep_ms']}")
+            if s['overruns']:
+                line += f", overruns {s['overruns']}"
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def _start_reporter(self):
+        interval = GIAconfig.Dev_LoopMetricsLogInterval
+        if not interval or interval <= 0:
+            self._reporter = False
+            return
+
+        def report():
+            while 1:
+                time.sleep(interval)
+                logger.debug(self.format_snapshot())
+
+        self._reporter = threading.Thread(target=report, name='LoopMetricsReporter', daemon=True)
+        self._reporter.start()
+
+
+LOOP_METRICS = LoopMetricsRegistry()
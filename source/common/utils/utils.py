@@ -930,4 +930,25 @@ def color_bar_percentage(image, area, prev_color, reverse=False, starter=0, thre
             return prev_index / length
         prev_color = np.mean(image[:, prev_index], axis=0)
 
-    return 0.
\ No newline at end of file
+    return 0.
+
+
+def edit_distance(pattern, text, substring=False):
+    """
+    Levenshtein distance.
+
+    Args:
+        pattern (str):
+        text (str):
+        substring (bool): If True, return the min distance between pattern and any substring of text.
+
+    Returns:
+        int:
+    """
+    prev = [0] * (len(text) + 1) if substring else list(range(len(text) + 1))
+    for i, pc in enumerate(pattern, start=1):
+        curr = [i] + [0] * len(text)
+        for j, tc in enumerate(text, start=1):
+            curr[j] = min(prev[j] + 1, curr[j - 1] + 1, prev[j - 1] + (pc != tc))
+        prev = curr
+    return min(prev) if substring else prev[-1]
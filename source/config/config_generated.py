@@ -37,3 +37,10 @@ class GeneratedConfig:
    Dev_RecordPath_CollectionName = ''
    Dev_DisableF = False
    Dev_UseAllPositionToCorrectionWhenItemNameNotFound = True
+   Dev_OcrCacheMode = 'exact'
+   Dev_OcrCacheTTL = 3.0
+   Dev_OcrCacheSize = 256
+   Dev_OcrModelMemoryBudget = 0
+   Dev_YoloxBackend = 'auto'
+   Dev_YoloxProfile = 'tree_roi'
+   Dev_LoopMetricsLogInterval = 60
@@ -0,0 +1,202 @@
+"""
+Headless video2path: record a TLPP from a screen recording at full CPU speed, without UI.
+
+A VideoDecoder thread decodes frames into a bounded queue and resizes them to 1080p. The calling thread
+feeds them to PathRecorderController through CustomCapture, the same way as the video2path page, but
+without waiting for playback pace.
+While consecutive frames give the same position and direction, up to `max_skip - 1` queued frames are
+dropped between the ones localised. The decision is made when the frames are taken from the queue, so
+localisation is back to every frame as soon as movement starts, however many frames are queued.
+
+Examples:
+    python -m source.dev_tool.video2path_headless video.mp4 GlazeLily --coll-name 琉璃百合 --position 1170.85 -3181.42
+TLPP files are saved in dev_assets/tlpp, same as the video2path page.
+"""
+import argparse
+import queue
+
+from source.util import *
+from source.common.base_threading import BaseThreading
+from source.interaction.interaction_core import itt
+from source.interaction.capture import CustomCapture
+from source.map.map import genshin_map
+from source.ui.ui import ui_control
+from source.ui import page as UIPage
+from source.funclib.movement import calculate_delta_angle
+import source.flow.utils.flow_code as FC
+
+VIDEO_FRAME_SIZE = (1920, 1080)
+# Positions closer than this on GIMAP are the same, about 0.3m.
+SKIP_POSITION_EPS = 0.5
+SKIP_DIRECTION_EPS = 1.
+
+
+class VideoNotFoundError(Exception): pass
+
+
+class VideoDecoder(BaseThreading):
+    def __init__(self, video_path, start_frame=0, end_frame=None, queue_size=64):
+        """
+        Args:
+            video_path:
+            start_frame:
+            end_frame: Excluded. None for end of video.
+            queue_size: Max decoded frames waiting.
+        """
+        super().__init__(thread_name='VideoDecoder')
+        self.fcap = cv2.VideoCapture(video_path)
+        if not self.fcap.isOpened():
+            raise VideoNotFoundError(video_path)
+        self.fcap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        self.total_frames = int(self.fcap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.frame_index = start_frame
+        self.end_frame = self.total_frames if end_frame is None else min(end_frame, self.total_frames)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.decoded_frames = 0
+        self.while_sleep = 0
+
+    def _put(self, item):
+        while not self.stop_threading_flag:
+            try:
+                self.queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def loop(self):
+        success = False
+        frame = None
+        if self.frame_index < self.end_frame:
+            success, frame = self.fcap.read()
+        if not success:
+            self._put(None)
+            self.fcap.release()
+            self.stop_threading_flag = True
+            return
+        if (frame.shape[1], frame.shape[0]) != VIDEO_FRAME_SIZE:
+            frame = cv2.resize(frame, VIDEO_FRAME_SIZE, interpolation=cv2.INTER_LINEAR)
+        self._put((self.frame_index, frame))
+        self.frame_index += 1
+        self.decoded_frames += 1
+
+
+def video_to_path(video_path, path_name, position=None, area=('Liyue', 'Mondstadt', 'Inazuma'), coll_name='',
+                  is_pickup_mode=True, start_frame=0, end_frame=None, auto_stop=True, max_skip=4,
+                  queue_size=64) -> dict:
+    """
+    Args:
+        video_path: 1080p (or same aspect ratio) recording, starting in the main page.
+        path_name: TLPP file head name.
+        position: Start position, TianLi. If None, the closest teleporter in area is used.
+        area: Regions to search for the start position.
+        coll_name: Collection name, see video2path page.
+        is_pickup_mode:
+        start_frame:
+        end_frame: Stop recording at this frame. None for end of video.
+        auto_stop: Stop recording when the bigmap is opened.
+        max_skip: While position does not change, localise one of every `max_skip` frames. 1 to process all frames.
+        queue_size:
+
+    Returns:
+        dict: Report, 'path' is the recorded TLPP dict.
+    """
+    from source.funclib.combat_lib import CSDL
+    from source.flow.path_recorder_flow import PathRecorderController
+    CSDL.pause_threading()
+    CSDL.stop_threading()
+    cc = CustomCapture()
+    itt.capture_obj = cc
+
+    decoder = VideoDecoder(video_path, start_frame=start_frame, end_frame=end_frame, queue_size=queue_size)
+    decoder.setDaemon(True)
+    pt = time.perf_counter()
+    decoder.start()
+    item = decoder.queue.get()
+    if item is None:
+        raise VideoNotFoundError(video_path)
+    cc.set_cap(item[1])
+    if position is None:
+        candidates, distances = genshin_map.get_smallmap_from_teleporter(area=list(area))
+        if not candidates:
+            raise ValueError(f'Cannot find start position in {area}, pass position instead')
+        logger.info(f"start position: {candidates[0].name} {candidates[0].region} {candidates[0].position}, d={round(distances[0], 2)}")
+        genshin_map.init_position(candidates[0].position)
+    else:
+        genshin_map.init_position(tuple(genshin_map.convert_cvAutoTrack_to_GIMAP(list(position))))
+    genshin_map.small_map_init_flag = True
+
+    prf = PathRecorderController()
+    prf.flow_connector.path_name = path_name
+    prf.flow_connector.is_pickup_mode = is_pickup_mode
+    prf.flow_connector.coll_name = coll_name
+    prf.flow_connector.generator = 'video2path_headless'
+    prf.pc._start_stop_recording()
+
+    localised = 0
+    skipped = 0
+    skip = 0
+    last_state = None
+    while item is not None:
+        cc.set_cap(item[1])
+        prf.loop()
+        localised += 1
+        if prf.pc.rfc == FC.INIT:
+            # Recording stopped and saved
+            break
+        if auto_stop and prf.pc.rfc == FC.IN and ui_control.verify_page(UIPage.page_bigmap):
+            logger.info(t2t("Auto Stop"))
+            break
+        state = (genshin_map.position, genshin_map.direction)
+        if max_skip > 1 and last_state is not None \
+                and euclidean_distance(state[0], last_state[0]) < SKIP_POSITION_EPS \
+                and abs(calculate_delta_angle(state[1], last_state[1])) < SKIP_DIRECTION_EPS:
+            skip = min(skip + 1, max_skip - 1)
+        else:
+            skip = 0
+        last_state = state
+        if localised % 300 == 0:
+            logger.info(f"frame: {item[0]}, {round(localised / (time.perf_counter() - pt), 1)} fps")
+        item = decoder.queue.get()
+        for _ in range(skip):
+            if item is None:
+                break
+            skipped += 1
+            item = decoder.queue.get()
+    if prf.pc.rfc == FC.IN:
+        prf.pc._start_stop_recording()
+        prf.loop()
+    decoder.stop_threading()
+
+    cost = time.perf_counter() - pt
+    frames = decoder.decoded_frames
+    return {
+        'frames': frames,
+        'localised_frames': localised,
+        'skipped_frames': skipped,
+        'wall_time_s': round(cost, 2),
+        'fps': round(frames / cost, 1) if cost else 0.,
+        'localised_fps': round(localised / cost, 1) if cost else 0.,
+        'positions': len(prf.flow_connector.collection_path_dict.get('position_list', [])),
+        'path': prf.flow_connector.collection_path_dict,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Record a TLPP from a video without UI.')
+    parser.add_argument('video')
+    parser.add_argument('path_name', help='TLPP file head name')
+    parser.add_argument('--position', type=float, nargs=2, default=None, help='Start position, TianLi')
+    parser.add_argument('--area', default='Liyue|Mondstadt|Inazuma')
+    parser.add_argument('--coll-name', default='')
+    parser.add_argument('--no-pickup', action='store_true')
+    parser.add_argument('--start-frame', type=int, default=0)
+    parser.add_argument('--end-frame', type=int, default=None)
+    parser.add_argument('--no-auto-stop', action='store_true')
+    parser.add_argument('--max-skip', type=int, default=4)
+    args = parser.parse_args()
+    report = video_to_path(args.video, args.path_name, position=args.position, area=args.area.split('|'),
+                           coll_name=args.coll_name, is_pickup_mode=not args.no_pickup,
+                           start_frame=args.start_frame, end_frame=args.end_frame,
+                           auto_stop=not args.no_auto_stop, max_skip=args.max_skip)
+    report.pop('path')
+    logger.info(f"video2path: {report}")
@@ -18,6 +18,8 @@ class AzurLaneConfig:
     DROIDCAST_RAW_FILEPATH_LOCAL = './assets/Android/DroidCast/DroidCastS-release-1.1.5.apk'
     DROIDCAST_RAW_FILEPATH_REMOTE = '/data/local/tmp/DroidCastS.apk'
 
+    SCREENSHOT_AUTOTUNE_FILEPATH = './config/screenshot_autotune.json'
+
     MINITOUCH_FILEPATH_REMOTE = '/data/local/tmp/minitouch'
 
     # HERMIT_FILEPATH_LOCAL = './bin/hermit/hermit.apk'
@@ -35,6 +37,9 @@ class AzurLaneConfig:
     Emulator_ScreenshotMethod = 'DroidCast_raw'  # auto, ADB, ADB_nc, uiautomator2, aScreenCap, aScreenCap_nc, DroidCast, DroidCast_raw, scrcpy
     Emulator_ControlMethod = 'MaaTouch'  # ADB, uiautomator2, minitouch, Hermit, MaaTouch
     Emulator_ScreenshotDedithering = False
+    # Used when Emulator_ScreenshotMethod is 'auto'
+    Emulator_ScreenshotAutotuneTTL = 86400
+    Emulator_ScreenshotAutotuneDegradeRatio = 2.0
     Emulator_AdbRestart = False
 
     # Group `Error`
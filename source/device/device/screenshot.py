@@ -7,6 +7,7 @@ import cv2
 import numpy as np
 from PIL import Image
 
+from source.device.alas.config_utils import read_file, write_file
 from source.device.alas.decorator import cached_property
 from source.device.alas.timer import Timer, timer
 from source.device.alas.utils import get_color, image_size, limit_in, save_image
@@ -16,12 +17,224 @@ from source.device.alas.exception import RequestHumanTakeover, ScriptError
 from source.util import logger
 
 
+def check_screenshot_frame(image, size=(1280, 720)):
+    """
+    Check if a screenshot is blank or corrupt.
+
+    Args:
+        image (np.ndarray):
+        size (tuple): (width, height), orientated screenshots are accepted.
+
+    Returns:
+        str: Reason, empty string if the screenshot is fine.
+    """
+    if not isinstance(image, np.ndarray):
+        return f'not an image: {type(image).__name__}'
+    if image.ndim != 3 or image.shape[2] != 3 or image.dtype != np.uint8:
+        return f'unexpected format: {image.shape} {image.dtype}'
+    width, height = image_size(image)
+    if (width, height) not in (size, size[::-1]):
+        return f'unexpected size: {width}x{height}'
+    # Sample every 8th pixel, it's enough to find a blank screen
+    sample = image[::8, ::8]
+    if int(sample.max()) - int(sample.min()) < 2:
+        return f'blank, color: {tuple(int(c) for c in sample[0, 0])}'
+    # Truncated data is decoded as black rows at the bottom
+    rows = sample.max(axis=(1, 2))
+    band = max(len(rows) // 8, 1)
+    if not rows[-band:].any() and rows[:band].any():
+        return 'truncated, black rows at the bottom'
+    return ''
+
+
+class ScreenshotAutotuner:
+    """
+    Select the fastest screenshot method that gives good screenshots.
+
+    Every method is benchmarked against the current device, a method is reliable if all its screenshots pass
+    `check_screenshot_frame`. The fastest reliable method is recorded with a TTL, and benchmarked again when
+    the record expires, when its latency degrades, or when it gives a bad screenshot.
+
+    Methods are plain callables, so the tuner can run against fake methods,
+    see `python -m source.device.device.screenshot`.
+    """
+
+    def __init__(self, methods, record_file=None, key='', ttl=86400, samples=5, degrade_ratio=2.,
+                 degrade_min=0.05, window=20, cooldown=300, fallback='ADB', size=(1280, 720),
+                 clock=time.time, timer=time.perf_counter):
+        """
+        Args:
+            methods (dict): {name: callable}, callable returns a screenshot.
+            record_file (str): Json file to keep records across runs, None to keep in memory.
+            key (str): Record key, usually device serial.
+            ttl (int, float): Seconds a record is valid.
+            samples (int): Screenshots taken from each method, the first one is a warm-up.
+            degrade_ratio (float): Benchmark again if recent median latency is more than this times benchmark latency,
+            degrade_min (float): and also more than benchmark latency plus this, in seconds.
+            window (int): Number of recent latencies.
+            cooldown (int, float): Minimum seconds between benchmarks.
+            fallback (str): Method to use if no method is reliable.
+            size (tuple): (width, height)
+            clock (callable): Wall time for TTL.
+            timer (callable): Performance counter for latency.
+        """
+        self.methods = methods
+        self.record_file = record_file
+        self.key = key
+        self.ttl = ttl
+        self.samples = samples
+        self.degrade_ratio = degrade_ratio
+        self.degrade_min = degrade_min
+        self.cooldown = cooldown
+        self.fallback = fallback
+        self.size = size
+        self.clock = clock
+        self.timer = timer
+        self.record = {}
+        self.latency = deque(maxlen=window)
+        self._last_benchmark = None
+
+        if self.record_file is not None:
+            self.record = read_file(self.record_file, is_print=False).get(self.key, {})
+
+    def benchmark_method(self, name):
+        """
+        Args:
+            name (str):
+
+        Returns:
+            dict: {'latency': median seconds, None if failed, 'error': reason}
+        """
+        method = self.methods[name]
+        costs = []
+        for _ in range(self.samples):
+            start = self.timer()
+            try:
+                image = method()
+            except Exception as e:
+                # RequestHumanTakeover from @retry included
+                return {'latency': None, 'error': f'{type(e).__name__}: {e}'}
+            cost = self.timer() - start
+            reason = check_screenshot_frame(image, size=self.size)
+            if reason:
+                return {'latency': None, 'error': reason}
+            costs.append(cost)
+        # Drop warm-up, the first call may start servers
+        if len(costs) > 1:
+            costs = costs[1:]
+        return {'latency': float(np.median(costs)), 'error': ''}
+
+    def benchmark(self):
+        """
+        Benchmark all methods and record the fastest reliable one.
+
+        Returns:
+            str: Method name.
+        """
+        logger.hr('Screenshot benchmark')
+        self._last_benchmark = self.clock()
+        results = {}
+        for name in self.methods:
+            result = self.benchmark_method(name)
+            results[name] = result
+            if result['error']:
+                logger.attr(name, f'unreliable, {result["error"]}')
+            else:
+                logger.attr(name, f'{round(result["latency"] * 1000)}ms')
+
+        reliable = [name for name, result in results.items() if not result['error']]
+        if reliable:
+            method = min(reliable, key=lambda name: results[name]['latency'])
+            latency = results[method]['latency']
+            ttl = self.ttl
+        else:
+            method = self.fallback
+            latency = None
+            # Try again soon
+            ttl = self.cooldown
+            logger.warning(f'No reliable screenshot method, use {method}')
+        self.record = {
+            'method': method,
+            'latency': latency,
+            'time': self._last_benchmark,
+            'ttl': ttl,
+            'results': results,
+        }
+        self.latency.clear()
+        self._save()
+        logger.info(f'Screenshot method: {method}')
+        return method
+
+    def _save(self):
+        if self.record_file is None:
+            return
+        data = read_file(self.record_file, is_print=False)
+        data[self.key] = self.record
+        write_file(self.record_file, data)
+
+    def is_expired(self):
+        if not self.record or self.record.get('method') not in self.methods:
+            return True
+        return self.clock() - self.record['time'] > self.record.get('ttl', self.ttl)
+
+    def select(self):
+        """
+        Returns:
+            str: Method name, benchmark first if needed.
+        """
+        if self.is_expired():
+            return self.benchmark()
+        return self.record['method']
+
+    def invalidate(self, reason=''):
+        """
+        Benchmark again on next `select`, unless a benchmark was done in `cooldown` seconds.
+        """
+        if self._last_benchmark is not None and self.clock() - self._last_benchmark < self.cooldown:
+            return False
+        logger.info(f'Screenshot method {self.record.get("method")} invalidated, {reason}')
+        self.record = {}
+        self.latency.clear()
+        return True
+
+    def report(self, name, latency):
+        """
+        Report the latency of a screenshot.
+
+        Args:
+            name (str): Method used.
+            latency (float): Seconds.
+
+        Returns:
+            bool: If invalidated.
+        """
+        if name != self.record.get('method') or self.record.get('latency') is None:
+            return False
+        self.latency.append(latency)
+        if len(self.latency) < self.latency.maxlen:
+            return False
+        baseline = self.record['latency']
+        recent = float(np.median(self.latency))
+        if recent > baseline * self.degrade_ratio and recent > baseline + self.degrade_min:
+            return self.invalidate(f'latency {round(recent * 1000)}ms, benchmark {round(baseline * 1000)}ms')
+        return False
+
+    def report_failure(self, name, reason):
+        """
+        Report a bad screenshot.
+        """
+        if name != self.record.get('method'):
+            return False
+        return self.invalidate(reason)
+
+
 class Screenshot(Adb, DroidCast):
     _screen_size_checked = False
     _screen_black_checked = False
     _minicap_uninstalled = False
     _screenshot_interval = Timer(0.1)
     _last_save_time = {}
+    _screenshot_method_used = ''
     image: np.ndarray
 
     @cached_property
@@ -46,11 +259,12 @@ class Screenshot(Adb, DroidCast):
         self._screenshot_interval.reset()
 
         for _ in range(2):
-            method = self.screenshot_methods.get(
-                self.config.Emulator_ScreenshotMethod,
-                self.screenshot_adb
-            )
+            self._screenshot_method_used = name = self.screenshot_method_name
+            method = self.screenshot_methods.get(name, self.screenshot_adb)
+            start = time.perf_counter()
             self.image = method()
+            if self.config.Emulator_ScreenshotMethod == 'auto':
+                self.screenshot_autotuner.report(name, time.perf_counter() - start)
 
             if self.config.Emulator_ScreenshotDedithering:
                 # This will take 40-60ms
@@ -58,7 +272,8 @@ class Screenshot(Adb, DroidCast):
             self.image = self._handle_orientated_image(self.image)
 
             if self.config.Error_SaveError:
-                self.screenshot_deque.append({'time': datetime.now(), 'image': self.image})
+                # DroidCast_raw reuses its output buffers, keep a copy.
+                self.screenshot_deque.append({'time': datetime.now(), 'image': self.image.copy()})
 
             if self.check_screen_size() and self.check_screen_black():
                 break
@@ -67,6 +282,26 @@ class Screenshot(Adb, DroidCast):
 
         return self.image
 
+    @cached_property
+    def screenshot_autotuner(self):
+        return ScreenshotAutotuner(
+            self.screenshot_methods,
+            record_file=self.config.SCREENSHOT_AUTOTUNE_FILEPATH,
+            key=self.serial,
+            ttl=self.config.Emulator_ScreenshotAutotuneTTL,
+            degrade_ratio=self.config.Emulator_ScreenshotAutotuneDegradeRatio,
+        )
+
+    @property
+    def screenshot_method_name(self):
+        """
+        Returns:
+            str: Emulator_ScreenshotMethod, or the method selected by autotuner if it's `auto`.
+        """
+        if self.config.Emulator_ScreenshotMethod == 'auto':
+            return self.screenshot_autotuner.select()
+        return self.config.Emulator_ScreenshotMethod
+
     def _handle_orientated_image(self, image):
         """
         Args:
@@ -191,7 +426,12 @@ class Screenshot(Adb, DroidCast):
             #     logger.warning('Game not running on display 0, will be restarted')
             #     self.app_stop_uiautomator2()
             #     return False
-            if self.config.Emulator_ScreenshotMethod == 'uiautomator2':
+            if self.config.Emulator_ScreenshotMethod == 'auto':
+                logger.warning(f'Received pure black screenshots from emulator, color: {color}')
+                self.screenshot_autotuner.report_failure(self._screenshot_method_used, 'pure black screenshot')
+                self._screen_black_checked = False
+                return False
+            elif self.config.Emulator_ScreenshotMethod == 'uiautomator2':
                 logger.warning(f'Received pure black screenshots from emulator, color: {color}')
                 logger.warning('Uninstall minicap and retry')
                 self.uninstall_minicap()
@@ -211,3 +451,84 @@ class Screenshot(Adb, DroidCast):
         else:
             self._screen_black_checked = True
             return True
+
+
+if __name__ == '__main__':
+    # Run the autotuner against a local HTTP stand-in of a device, no emulator needed.
+    #   /png?delay=   PNG screenshot, like `screencap -p` and DroidCast
+    #   /raw?delay=   RGB565 bitmap, like DroidCast_raw
+    #   /black        Pure black PNG, fast but unreliable
+    #   /truncated    Half of a PNG
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+
+    import requests
+
+    from source.device.method.droidcast import Rgb565Converter
+
+    frame = np.random.randint(0, 256, (720, 1280, 3), dtype=np.uint8)
+    png = cv2.imencode('.png', frame)[1].tobytes()
+    black_png = cv2.imencode('.png', np.zeros_like(frame))[1].tobytes()
+    raw = (frame[:, :, 0].astype(np.uint16) >> 3 << 11 | frame[:, :, 1].astype(np.uint16) >> 2 << 5
+           | frame[:, :, 2].astype(np.uint16) >> 3).tobytes()
+    delays = {'/png': 0.06, '/raw': 0.02}
+
+    class FakeDevice(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            time.sleep(float(parse_qs(url.query).get('delay', [delays.get(url.path, 0)])[0]))
+            body = {'/png': png, '/raw': raw, '/black': black_png, '/truncated': png[:len(png) // 2]}[url.path]
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeDevice)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    session = requests.Session()
+    session.trust_env = False
+    converter = Rgb565Converter()
+
+    def get(path):
+        return session.get(f'http://127.0.0.1:{server.server_port}{path}', timeout=3).content
+
+    def decode_png(data):
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError('Empty image after cv2.imdecode')
+        return image
+
+    methods = {
+        'ADB': lambda: decode_png(get('/png?delay=0.15')),
+        'DroidCast': lambda: decode_png(get('/png')),
+        'DroidCast_raw': lambda: converter.convert(np.frombuffer(get('/raw'), dtype=np.uint16).reshape((720, 1280))),
+        'black': lambda: decode_png(get('/black')),
+        'truncated': lambda: decode_png(get('/truncated')),
+    }
+    now = [0.]
+    tuner = ScreenshotAutotuner(methods, ttl=3600, window=5, cooldown=60, clock=lambda: now[0])
+
+    def check(name, result, expected):
+        logger.info(f'{name}: {result}, {"OK" if result == expected else f"FAILED, expected {expected}"}')
+
+    check('Fastest reliable', tuner.select(), 'DroidCast_raw')
+    check('Blank and truncated rejected', [name for name, result in tuner.record['results'].items()
+                                           if result['error']], ['black', 'truncated'])
+    now[0] += 1800
+    check('Within TTL', tuner.is_expired(), False)
+
+    # DroidCast_raw gets slow
+    delays['/raw'] = 0.3
+    for _ in range(5):
+        start = time.perf_counter()
+        methods['DroidCast_raw']()
+        tuner.report('DroidCast_raw', time.perf_counter() - start)
+    check('Degraded', tuner.is_expired(), True)
+    check('Re-tuned', tuner.select(), 'DroidCast')
+
+    now[0] += 3601
+    check('TTL expired', tuner.is_expired(), True)
@@ -19,6 +19,91 @@ class DroidCastVersionIncompatible(Exception):
     pass
 
 
+def rgb565_to_rgb888_reference(arr):
+    """
+    Convert RGB565 to RGB888 with full-frame passes, used to build the lookup table.
+    https://blog.csdn.net/happy08god/article/details/10516871
+
+    Args:
+        arr (np.ndarray): uint16, shape (height, width)
+
+    Returns:
+        np.ndarray: uint8, shape (height, width, 3)
+    """
+    # r = (arr & 0b1111100000000000) >> (11 - 3)
+    # g = (arr & 0b0000011111100000) >> (5 - 2)
+    # b = (arr & 0b0000000000011111) << 3
+    # r |= (r & 0b11100000) >> 5
+    # g |= (g & 0b11000000) >> 6
+    # b |= (b & 0b11100000) >> 5
+    # r = r.astype(np.uint8)
+    # g = g.astype(np.uint8)
+    # b = b.astype(np.uint8)
+    # image = cv2.merge([r, g, b])
+
+    # The same as the code above but costs about 5ms instead of 10ms.
+    r = cv2.multiply(arr & 0b1111100000000000, 0.00390625).astype(np.uint8)
+    g = cv2.multiply(arr & 0b0000011111100000, 0.125).astype(np.uint8)
+    b = cv2.multiply(arr & 0b0000000000011111, 8).astype(np.uint8)
+    r = cv2.add(r, cv2.multiply(r, 0.03125))
+    g = cv2.add(g, cv2.multiply(g, 0.015625))
+    b = cv2.add(b, cv2.multiply(b, 0.03125))
+    return cv2.merge([r, g, b])
+
+
+class Rgb565Converter:
+    """
+    Convert RGB565 to RGB888 with a 65536-entry lookup table, one table read per pixel.
+
+    The table is built from `rgb565_to_rgb888_reference`, so results are the same.
+    Entries are packed as uint32 RGBX, pixels are gathered into a uint32 buffer and RGBX is
+    converted to RGB into a preallocated output buffer.
+    Output buffers are reused, a returned image is valid until `buffers` more frames are converted.
+    """
+    _lut = None
+
+    def __init__(self, buffers=2):
+        self.buffers = buffers
+        self._shape = None
+        self._scratch = None
+        self._outputs = []
+        self._index = 0
+
+    @classmethod
+    def lut(cls):
+        """
+        Returns:
+            np.ndarray: uint32, shape (65536,)
+        """
+        if cls._lut is None:
+            rgb = rgb565_to_rgb888_reference(np.arange(65536, dtype=np.uint16).reshape((256, 256)))
+            rgbx = np.zeros((65536, 4), dtype=np.uint8)
+            rgbx[:, :3] = rgb.reshape((65536, 3))
+            cls._lut = rgbx.view(np.uint32).ravel()
+        return cls._lut
+
+    def convert(self, arr):
+        """
+        Args:
+            arr (np.ndarray): uint16, shape (height, width)
+
+        Returns:
+            np.ndarray: uint8, shape (height, width, 3)
+        """
+        if arr.shape != self._shape:
+            self._shape = arr.shape
+            self._scratch = np.empty(arr.shape, dtype=np.uint32)
+            self._outputs = [np.empty((*arr.shape, 3), dtype=np.uint8) for _ in range(self.buffers)]
+            self._index = 0
+        out = self._outputs[self._index]
+        self._index = (self._index + 1) % self.buffers
+        # uint16 indexes are always in range, mode='clip' skips the buffered bounds check.
+        np.take(self.lut(), arr, out=self._scratch, mode='clip')
+        rgbx = self._scratch.view(np.uint8).reshape((*arr.shape, 4))
+        cv2.cvtColor(rgbx, cv2.COLOR_RGBA2RGB, dst=out)
+        return out
+
+
 def retry(func):
     @wraps(func)
     def retry_wrapper(self, *args, **kwargs):
@@ -96,6 +181,10 @@ class DroidCast(Uiautomator2):
 
     _droidcast_port: int = 0
 
+    @cached_property
+    def _droidcast_raw_converter(self):
+        return Rgb565Converter()
+
     @cached_property
     def droidcast_session(self):
         session = requests.Session()
@@ -214,27 +303,8 @@ class DroidCast(Uiautomator2):
             raise ImageTruncated(str(e))
 
         # Convert RGB565 to RGB888
-        # https://blog.csdn.net/happy08god/article/details/10516871
-
-        # r = (arr & 0b1111100000000000) >> (11 - 3)
-        # g = (arr & 0b0000011111100000) >> (5 - 2)
-        # b = (arr & 0b0000000000011111) << 3
-        # r |= (r & 0b11100000) >> 5
-        # g |= (g & 0b11000000) >> 6
-        # b |= (b & 0b11100000) >> 5
-        # r = r.astype(np.uint8)
-        # g = g.astype(np.uint8)
-        # b = b.astype(np.uint8)
-        # image = cv2.merge([r, g, b])
-
-        # The same as the code above but costs about 5ms instead of 10ms.
-        r = cv2.multiply(arr & 0b1111100000000000, 0.00390625).astype(np.uint8)
-        g = cv2.multiply(arr & 0b0000011111100000, 0.125).astype(np.uint8)
-        b = cv2.multiply(arr & 0b0000000000011111, 8).astype(np.uint8)
-        r = cv2.add(r, cv2.multiply(r, 0.03125))
-        g = cv2.add(g, cv2.multiply(g, 0.015625))
-        b = cv2.add(b, cv2.multiply(b, 0.03125))
-        image = cv2.merge([r, g, b])
+        # Costs about 2ms instead of 10ms, see `python -m source.device.method.droidcast`
+        image = self._droidcast_raw_converter.convert(arr)
 
         return image
 
@@ -289,3 +359,21 @@ class DroidCast(Uiautomator2):
         for proc in self._iter_droidcast_proc():
             logger.info(f'Kill pid={proc.pid}')
             self.adb_shell(['kill', '-s', 9, proc.pid])
+
+
+if __name__ == '__main__':
+    import time
+
+    def cost(func, n=50):
+        func()
+        start = time.perf_counter()
+        for _ in range(n):
+            func()
+        return round((time.perf_counter() - start) / n * 1000, 2)
+
+    converter = Rgb565Converter()
+    for height, width in [(720, 1280), (1080, 1920)]:
+        frame = np.random.randint(0, 65536, (height, width), dtype=np.uint16)
+        same = np.array_equal(converter.convert(frame), rgb565_to_rgb888_reference(frame))
+        logger.info(f'{width}x{height}: reference {cost(lambda: rgb565_to_rgb888_reference(frame))}ms, '
+                    f'lookup table {cost(lambda: converter.convert(frame))}ms, same result: {same}')
@@ -171,6 +171,8 @@ class FlowController(base_threading.AdvanceThreading):
         self.last_err_code = ERR_NONE
     
     def loop(self):
+        if self.current_flow_id == ST.NULL:
+            return
         rcode = self.flow_dict[self.current_flow_id].enter_flow()
         if "$END$" in rcode:
             self.last_err_code = self.flow_dict[rcode].enter_flow()
@@ -182,7 +184,9 @@ class FlowController(base_threading.AdvanceThreading):
     def run(self) -> None:
         '''if you're using this class, copy this'''
         while 1:
-            time.sleep(self.get_while_sleep())
+            pt = time.perf_counter()
+            self.sleep_unless_paused(self.get_while_sleep())
+            sleep = time.perf_counter() - pt
             if self.stop_threading_flag:
                 logger.debug(f"{self.name} stop.")
                 return
@@ -191,7 +195,7 @@ class FlowController(base_threading.AdvanceThreading):
                 if self.working_flag:
                     self.working_flag = False
                 self._thread_paused_flag = True
-                time.sleep(1)
+                self.wait_until_continue()
                 continue
             else:
                 self._thread_paused_flag = False
@@ -208,6 +212,7 @@ class FlowController(base_threading.AdvanceThreading):
 
             if self.current_flow_id == ST.NULL:
                 continue
+            pt = time.perf_counter()
             rcode = self.flow_dict[self.current_flow_id].enter_flow()
             if "$END$" in rcode:
                 self.last_err_code = self.flow_dict[rcode].enter_flow()
@@ -215,3 +220,4 @@ class FlowController(base_threading.AdvanceThreading):
                 self.pause_threading()
             else:
                 self.current_flow_id = rcode
+            self._record_loop(time.perf_counter() - pt, sleep)
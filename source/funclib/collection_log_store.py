@@ -0,0 +1,244 @@
+"""
+Append-only store of auto collector history.
+
+`collection_log.jsonl` gets one line per event and is never rewritten. Per-id aggregates
+(last collected timestamp, total/success times) are kept in memory, updated on append,
+and checkpointed to `collection_log.jsonl.idx` together with the byte offset they cover,
+so startup only replays lines written after the last checkpoint.
+
+The legacy `collection_log.json` is imported once if the jsonl file does not exist yet,
+and can be exported again with `export_legacy_json` for the webio log viewer.
+"""
+import datetime
+import threading
+
+from source.util import *
+
+COLLECTION_LOG_FOLDER = os.path.join(ROOT_PATH, "config\\auto_collector")
+COLLECTION_LOG_JSONL = "collection_log.jsonl"
+COLLECTION_LOG_INDEX = "collection_log.jsonl.idx"
+COLLECTION_LOG_LEGACY = "collection_log.json"
+
+EVENT_LOG = 'log'
+EVENT_COLLECTED = 'collected'
+
+# checkpoint aggregates every N appends; they are also checkpointed by `flush`.
+CHECKPOINT_INTERVAL = 20
+
+
+def _parse_log_time(col_time: str) -> float:
+    if '.' in col_time:
+        col_time = col_time[:col_time.index('.')]
+    return time.mktime(time.strptime(col_time, "%Y-%m-%d %H:%M:%S"))
+
+
+class CollectionLogStore:
+    def __init__(self, folder_path=COLLECTION_LOG_FOLDER):
+        self.folder_path = folder_path
+        self.jsonl_path = os.path.join(folder_path, COLLECTION_LOG_JSONL)
+        self.index_path = os.path.join(folder_path, COLLECTION_LOG_INDEX)
+        self.legacy_path = os.path.join(folder_path, COLLECTION_LOG_LEGACY)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._append_times = 0
+        self.offset = 0
+        # key -> str(id) -> {"last_time": float, "total_times": int, "succ_times": int}
+        self.aggregates = {}
+
+    def _new_aggregate(self, key, col_id) -> dict:
+        return self.aggregates.setdefault(key, {}).setdefault(str(col_id), {
+            "last_time": 0.0,
+            "total_times": 0,
+            "succ_times": 0,
+        })
+
+    def _apply(self, event: dict):
+        agg = self._new_aggregate(event["key"], event["id"])
+        agg["last_time"] = max(agg["last_time"], event["timestamp"])
+        if event.get("type", EVENT_LOG) == EVENT_LOG:
+            agg["total_times"] += 1
+            if event["picked item"] != ["None"]:
+                agg["succ_times"] += 1
+
+    def _write_lines(self, events: list):
+        with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+            f.flush()
+            self.offset = f.tell()
+
+    def _import_legacy(self):
+        """
+        One-time migration from `collection_log.json`.
+        """
+        if not os.path.exists(self.legacy_path):
+            return
+        try:
+            loglist = load_json(COLLECTION_LOG_LEGACY, self.folder_path)
+        except FileNotFoundError:
+            return
+        events = []
+        for key in loglist:
+            for row in loglist[key]:
+                event = {
+                    "type": EVENT_LOG,
+                    "key": key,
+                    "time": row["time"],
+                    "timestamp": _parse_log_time(row["time"]),
+                    "id": row["id"],
+                    "error_code": row.get("error_code", ""),
+                    "picked item": row["picked item"],
+                }
+                events.append(event)
+        self._write_lines(events)
+        for event in events:
+            self._apply(event)
+        logger.info(f"collection log: imported {len(events)} entries from {COLLECTION_LOG_LEGACY}")
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            self.aggregates = checkpoint["aggregates"]
+            self.offset = checkpoint["offset"]
+        except Exception as e:
+            logger.warning(f"collection log checkpoint broken, rebuild: {e}")
+            self.aggregates = {}
+            self.offset = 0
+
+    def _replay(self):
+        """
+        Apply lines written after the checkpoint.
+        """
+        if os.path.getsize(self.jsonl_path) < self.offset:
+            # file was truncated or replaced, rebuild from scratch
+            self.aggregates = {}
+            self.offset = 0
+        with open(self.jsonl_path, 'r', encoding='utf-8') as f:
+            f.seek(self.offset)
+            while True:
+                line = f.readline()
+                if not line:
+                    break
+                if not line.endswith('\n'):
+                    # partially written line, ignore it
+                    break
+                self.offset = f.tell()
+                line = line.strip()
+                if line:
+                    self._apply(json.loads(line))
+
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            if not os.path.exists(self.jsonl_path):
+                self._import_legacy()
+                if not os.path.exists(self.jsonl_path):
+                    open(self.jsonl_path, 'a', encoding='utf-8').close()
+            else:
+                self._load_checkpoint()
+            self._replay()
+            self._loaded = True
+            self._save_checkpoint()
+
+    def _save_checkpoint(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"offset": self.offset, "aggregates": self.aggregates}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def flush(self):
+        with self._lock:
+            if self._loaded:
+                self._save_checkpoint()
+
+    def _append(self, event: dict):
+        self.load()
+        with self._lock:
+            self._write_lines([event])
+            self._apply(event)
+            self._append_times += 1
+            if self._append_times % CHECKPOINT_INTERVAL == 0:
+                self._save_checkpoint()
+
+    def add_log(self, key: str, col_id: int, error_code: str, picked_list: list):
+        """
+        Append one collection attempt.
+
+        Args:
+            key: Collection name.
+            col_id: Point id.
+            error_code: Result of the attempt.
+            picked_list: Picked item names, ['None'] if nothing was picked.
+        """
+        now = datetime.datetime.now()
+        self._append({
+            "type": EVENT_LOG,
+            "key": key,
+            "time": str(now),
+            "timestamp": now.timestamp(),
+            "id": col_id,
+            "error_code": error_code,
+            "picked item": list(picked_list) if picked_list else ['None'],
+        })
+
+    def add_collected(self, key: str, col_id: int):
+        """
+        Mark a point as collected without counting an attempt.
+        """
+        now = datetime.datetime.now()
+        self._append({
+            "type": EVENT_COLLECTED,
+            "key": key,
+            "time": str(now),
+            "timestamp": now.timestamp(),
+            "id": col_id,
+        })
+
+    def get_aggregates(self, key: str = None) -> dict:
+        """
+        Returns:
+            dict: key -> str(id) -> aggregate, or str(id) -> aggregate if `key` is given.
+        """
+        self.load()
+        with self._lock:
+            if key is not None:
+                return {k: v.copy() for k, v in self.aggregates.get(key, {}).items()}
+            return {key: {k: v.copy() for k, v in i.items()} for key, i in self.aggregates.items()}
+
+    def iter_events(self, key: str = None):
+        """
+        Iterate all events from the beginning of the file. Cost is O(history), for statistic pages only.
+        """
+        self.load()
+        with open(self.jsonl_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                event = json.loads(line)
+                if key is not None and event["key"] != key:
+                    continue
+                yield event
+
+    def export_legacy_json(self):
+        """
+        Write `collection_log.json` in its original format, so it can still be viewed in webio.
+        """
+        out = {}
+        for event in self.iter_events():
+            if event.get("type", EVENT_LOG) != EVENT_LOG:
+                continue
+            out.setdefault(event["key"], []).append({
+                "time": event["time"],
+                "id": event["id"],
+                "error_code": event["error_code"],
+                "picked item": event["picked item"],
+            })
+        save_json(out, COLLECTION_LOG_LEGACY, default_path=self.folder_path)
+
+
+collection_log_store = CollectionLogStore()
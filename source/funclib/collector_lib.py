@@ -1,5 +1,6 @@
 from typing import Union
 from source.util import *
+from source.funclib.collection_log_store import collection_log_store, EVENT_LOG
 
 
 def add_to_blacklist(key: str, id: Union[int, list]) -> None:
@@ -24,9 +25,7 @@ global REFRESH_TIME_JSON
 REFRESH_TIME_JSON = None
 
 
-def is_col_refreshed(col_id, col_time):
-    col_time = col_time[:col_time.index('.')]
-    time_stamp = time.mktime(time.strptime(col_time, "%Y-%m-%d %H:%M:%S"))
+def is_col_refreshed_ts(col_id, time_stamp: float):
     now_stamp = time.time()
     global REFRESH_TIME_JSON
     if REFRESH_TIME_JSON is None:
@@ -42,77 +41,71 @@ def is_col_refreshed(col_id, col_time):
         return False
 
 
+def is_col_refreshed(col_id, col_time):
+    col_time = col_time[:col_time.index('.')]
+    time_stamp = time.mktime(time.strptime(col_time, "%Y-%m-%d %H:%M:%S"))
+    return is_col_refreshed_ts(col_id, time_stamp)
+
+
 def generate_collected_from_log(regenerate=True):
-    loglist = load_json("collection_log.json", "config\\auto_collector")
+    aggregates = collection_log_store.get_aggregates()
     if regenerate:
         collected_list = {}
     else:
         collected_list = load_json("collected.json", "config\\auto_collector")
-    for i in loglist:
-        key_name = i
+    for key_name in aggregates:
         collected_list.setdefault(key_name, [])
-        for ii in loglist[i]:
-            col_id = ii["id"]
-            col_time = ii["time"]
-            if not is_col_refreshed(col_id, col_time):
-                collected_list[key_name].append(col_id)
-                # print(col_id)
+        for col_id, agg in aggregates[key_name].items():
+            if not is_col_refreshed_ts(col_id, agg["last_time"]):
+                collected_list[key_name].append(int(col_id))
     save_json(collected_list, "collected.json", "config\\auto_collector")
+    return collected_list
 
 
 def generate_col_succ_rate_from_log():
-    loglist = load_json("collection_log.json", "config\\auto_collector")
+    aggregates = collection_log_store.get_aggregates()
     dict1 = {}
-    for i in loglist:
-        for ii in loglist[i]:
-            col_id = ii["id"]
-            dict1.setdefault(col_id, {
+    for key_name in aggregates:
+        for col_id, agg in aggregates[key_name].items():
+            if agg["total_times"] == 0:
+                continue
+            d = dict1.setdefault(col_id, {
                 "total_times": 0,
                 "succ_times": 0,
                 "succ_rate": 0.0
             })
-            col_time = ii["picked item"]
-            dict1[col_id]["total_times"] += 1
-            if col_time != ["None"]:
-                dict1[col_id]["succ_times"] += 1
+            d["total_times"] += agg["total_times"]
+            d["succ_times"] += agg["succ_times"]
     for i in dict1:
         dict1[i]["succ_rate"] = round(dict1[i]["succ_times"] / dict1[i]["total_times"], 2)
     save_json(dict1, "collection_id_details.json", "config\\auto_collector")
+    return dict1
 
 
 def generate_masked_col_from_log(regenerate=True):
     min_times = load_json("auto_collector.json")["minimum_times_mask_col_id"]
-    loglist = load_json("collection_log.json", "config\\auto_collector")
+    aggregates = collection_log_store.get_aggregates()
     if regenerate:
         bla_list = {}
     else:
         bla_list = load_json("collection_blacklist.json", "config\\auto_collector")
-    for i in loglist:
-        key_name = i
+    for key_name in aggregates:
         bla_list.setdefault(key_name, [])
-        fail_times = {}
-        for ii in loglist[i]:
-            col_id = ii["id"]
-            col_time = ii["picked item"]
-            if col_time == ["None"]:
-                fail_times[str(col_id)] = fail_times.setdefault(str(col_id), 0) + 1
-        for ii in fail_times:
-            if int(fail_times[str(ii)]) >= min_times:
-                bla_list[key_name].append(int(ii))
+        for col_id, agg in aggregates[key_name].items():
+            if agg["total_times"] - agg["succ_times"] >= min_times:
+                bla_list[key_name].append(int(col_id))
     save_json(bla_list, "collection_blacklist.json", "config\\auto_collector")
 
 
 def col_succ_times_from_log(key_name, day=1):
-    loglist = load_json("collection_log.json", "config\\auto_collector")
     total_n = 0
     succ_n = 0
     t = day * 3600 * 24
-    for i in loglist[key_name]:
-        col_time = i["time"]
-        col_time = col_time[:col_time.index('.')]
-        time_stamp = time.mktime(time.strptime(col_time, "%Y-%m-%d %H:%M:%S"))
-        now_stamp = time.time()
-        if now_stamp - time_stamp <= t:
+    now_stamp = time.time()
+    for i in collection_log_store.iter_events(key_name):
+        if i.get("type") != EVENT_LOG:
+            continue
+        if now_stamp - i["timestamp"] <= t:
             total_n += 1
             if i["picked item"] != ["None"]:
                 succ_n += 1
@@ -171,23 +164,21 @@ def conv_kongying_str_pos_to_cvat_pos(x: str):
     pos = [float(pos[0]), float(pos[1])]
     return list(MapConverter.convert_kongying_to_cvAutoTrack(pos, decimal=2))
 POIAPI = PoiJsonApi()
-def get_item_position_new(marker_title: str,ret_mode=RETURN_POSITIONS, area=AREA_TEYVAT):
-    ret_list = []
-    area_list = []
+def _area_list(area):
     if area==AREA_TEYVAT:
-        area_list = POIAPI.LIST_AREA_TEYVAT
+        return POIAPI.LIST_AREA_TEYVAT
     elif area==AREA_ALL_GENSHIN:
-        area_list = range(1,100)
-    for i in POIAPI.data.values():
-        i: PointInfoModel
-        if POIAPI.item[i.itemList[0].itemId].areaId not in area_list:
-            continue
-        if i.markerTitle == marker_title:
-            pos = i.position
-            if ret_mode == RETURN_POSITIONS:
-                ret_list.append(conv_kongying_str_pos_to_cvat_pos(pos))
-            elif ret_mode == RETURN_ALL:
-                ret_list.append(i.model_copy())
+        return range(1,100)
+    return []
+
+
+def get_item_position_new(marker_title: str,ret_mode=RETURN_POSITIONS, area=AREA_TEYVAT):
+    ret_list = []
+    for i in POIAPI.query_title(marker_title, area_list=_area_list(area)):
+        if ret_mode == RETURN_POSITIONS:
+            ret_list.append(list(POIAPI.cvat_position[i]))
+        elif ret_mode == RETURN_ALL:
+            ret_list.append(POIAPI.data[i].model_copy())
     return ret_list
 
 
@@ -289,15 +280,9 @@ def predict_feature_by_position(posi, ita, threshold=15):
             ret_list.append(i)
     return ret_list
 
-def predict_feature_by_pos_v2(pos:list, name: str, threshold = 15):
-    res = get_item_position_new(name,ret_mode=RETURN_ALL)
-    ret = []
-    for i in res:
-        i: PointInfoModel
-        p = conv_kongying_str_pos_to_cvat_pos(i.position)
-        if euclidean_distance(p, pos)<threshold:
-            ret.append(i.model_copy())
-    return ret
+def predict_feature_by_pos_v2(pos:list, name: str, threshold = 15, area=AREA_TEYVAT):
+    res = POIAPI.query_radius(pos, threshold, marker_title=name, area_list=_area_list(area))
+    return [POIAPI.data[i].model_copy() for i in res]
 
 # def load_feature_position(text, blacklist_id=None, ret_mode = 0, check_mode = 0):
 #     """_summary_
@@ -0,0 +1,176 @@
+"""
+Combat state bus.
+
+The combat perception stage (`combat_lib.perceive_combat_frame`) wraps one captured frame into a
+CombatFrameState, whose fields are perceived on first access, and publishes it here. Operators read the latest state instead of capturing
+by themselves, or subscribe to events which are fired when a state changes.
+
+Examples:
+    COMBAT_BUS.subscribe(EVENT_COMBAT_STATE, lambda old, new, state: print(old, '->', new))
+    state = combat_lib.get_combat_frame_state(max_age=combat_lib.COMBAT_STATE_MAX_AGE)
+    if not state.character_busy: ...
+"""
+import threading
+
+from source.util import *
+
+# Fields of CombatFrameState, fired when changed.
+EVENT_BLOOD_BAR = 'blood_bar'
+EVENT_ARROW = 'arrow'
+EVENT_CHARACTER_BUSY = 'character_busy'
+EVENT_CURRENT_CHARA_NUM = 'current_chara_num'
+EVENT_E_AVAILABLE = 'e_available'
+EVENT_Q_READY = 'q_ready'
+EVENT_LOW_HEALTH = 'low_health'
+FRAME_EVENTS = [EVENT_BLOOD_BAR, EVENT_ARROW, EVENT_CHARACTER_BUSY, EVENT_CURRENT_CHARA_NUM,
+                EVENT_E_AVAILABLE, EVENT_Q_READY, EVENT_LOW_HEALTH]
+# Debounced combat state of CombatStatementDetectionLoop, fired by `emit`.
+EVENT_COMBAT_STATE = 'combat_state'
+# Field of CombatFrameState without event: {name: ColorKeyResult} of all blood bars, see combat_detector.
+FRAME_BLOOD_BARS = 'blood_bars'
+
+
+# Value of a field when it is neither given nor perceivable.
+FRAME_DEFAULTS = {EVENT_BLOOD_BAR: False, EVENT_ARROW: False, EVENT_CHARACTER_BUSY: True, EVENT_CURRENT_CHARA_NUM: 0,
+                  EVENT_E_AVAILABLE: False, EVENT_Q_READY: None, EVENT_LOW_HEALTH: None, FRAME_BLOOD_BARS: None}
+
+
+def _frame_field(name):
+    return property(lambda self: self.get(name), doc='Perceived on first access, see CombatFrameState.get')
+
+
+class CombatFrameState:
+    def __init__(self, frame: np.ndarray, frame_time: float, perceivers: t.Optional[t.Dict[str, t.Callable]] = None,
+                 **values):
+        """
+        Fields are perceived lazily, on first access, and then cached on this frame.
+        Single-field checks only pay for the field they read.
+
+        Args:
+            frame: The 4-channel capture these states come from. Shared, do not modify.
+            frame_time: time.time() of capture.
+            perceivers: {field: perceiver}. perceiver(frame) returns a dict of fields,
+                so that fields from the same computation (blood_bar and arrow) are perceived together.
+            **values: Fields already known, see FRAME_EVENTS:
+                blood_bar: Enemy blood bar exists.
+                arrow: Enemy arrow exists.
+                character_busy:
+                current_chara_num: 1-4, 0 if unknown.
+                e_available: E icon is shown, False when knocked down.
+                q_ready: None if vision of current character is unknown.
+                low_health: None if not in main page.
+                blood_bars: Enemy and mineral bars, from the same detection as blood_bar.
+        """
+        self.frame = frame
+        self.frame_time = frame_time
+        self._perceivers = perceivers if perceivers is not None else {}
+        self._values = dict(values)
+        self._lock = threading.Lock()
+
+    blood_bar = _frame_field(EVENT_BLOOD_BAR)
+    arrow = _frame_field(EVENT_ARROW)
+    character_busy = _frame_field(EVENT_CHARACTER_BUSY)
+    current_chara_num = _frame_field(EVENT_CURRENT_CHARA_NUM)
+    e_available = _frame_field(EVENT_E_AVAILABLE)
+    q_ready = _frame_field(EVENT_Q_READY)
+    low_health = _frame_field(EVENT_LOW_HEALTH)
+    blood_bars = _frame_field(FRAME_BLOOD_BARS)
+
+    def get(self, field: str):
+        """
+        Args:
+            field: EVENT_* or FRAME_BLOOD_BARS
+
+        Returns:
+            Value of field, perceived from frame if it has not been.
+        """
+        if field in self._values:
+            return self._values[field]
+        with self._lock:
+            if field not in self._values:
+                perceiver = self._perceivers.get(field)
+                if perceiver is None:
+                    self._values[field] = FRAME_DEFAULTS[field]
+                else:
+                    self._values.update(perceiver(self.frame))
+        return self._values[field]
+
+    def is_perceived(self, field: str) -> bool:
+        return field in self._values
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.frame_time
+
+    def __repr__(self):
+        # Do not perceive for logging
+        return 'CombatFrameState(' + ', '.join(
+            f'{name}={self._values[name]}' for name in FRAME_EVENTS if name in self._values) + ')'
+
+
+class CombatStateBus:
+    def __init__(self):
+        self.latest: t.Optional[CombatFrameState] = None
+        self._subscribers: t.Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, event: str, callback):
+        """
+        Args:
+            event: EVENT_*
+            callback: callback(old, new, state). Called in the publishing thread, keep it short.
+        """
+        with self._lock:
+            self._subscribers.setdefault(event, []).append(callback)
+
+    def unsubscribe(self, event: str, callback):
+        with self._lock:
+            if callback in self._subscribers.get(event, []):
+                self._subscribers[event].remove(callback)
+
+    def _fire(self, event, old, new, state):
+        with self._lock:
+            callbacks = list(self._subscribers.get(event, []))
+        for callback in callbacks:
+            try:
+                callback(old, new, state)
+            except Exception as e:
+                logger.exception(e)
+
+    def publish(self, state: CombatFrameState):
+        """
+        Set the latest state and fire events of changed fields. Older frames are ignored.
+        Only fields with subscribers are perceived here, others stay lazy.
+        """
+        with self._lock:
+            old_state = self.latest
+            if old_state is not None and state.frame_time < old_state.frame_time:
+                return
+            self.latest = state
+        if old_state is None:
+            return
+        with self._lock:
+            events = [event for event in FRAME_EVENTS if self._subscribers.get(event)]
+        for event in events:
+            old, new = old_state.get(event), state.get(event)
+            if old != new:
+                self._fire(event, old, new, state)
+
+    def emit(self, event: str, old, new):
+        """
+        Fire an event which is not a field of CombatFrameState.
+        """
+        self._fire(event, old, new, self.latest)
+
+    def get_latest(self, max_age: float) -> t.Optional[CombatFrameState]:
+        """
+        Returns:
+            The latest state if it is captured within max_age seconds, else None.
+        """
+        state = self.latest
+        if state is None or state.age > max_age:
+            return None
+        return state
+
+
+COMBAT_BUS = CombatStateBus()
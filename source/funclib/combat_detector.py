@@ -0,0 +1,300 @@
+"""
+Image pipeline of combat state detection.
+
+Works on one 4-channel 1080p capture, without modifying or copying it:
+    blood bar: cv2.inRange over the area above the skill bar, for the exact enemy bar colour with opaque alpha.
+    enemy arrow: only pixels inside the elliptical band around the screen center are gathered, by a flat index
+        computed once. HSV conversion and red ranges run on those pixels only.
+Output buffers are allocated once per thread and reused.
+
+Blood bars are found by ColorKeyDetector, which keys a list of colour signatures in one pass over a crop of the frame:
+    enemy: exact red bar above enemies.
+    mineral: exact yellow bar of ores.
+One cv2.inRange with the range covering all signatures finds the candidate pixels, which are few,
+then each signature is matched on the candidates only.
+"""
+import threading
+
+from source.util import *
+
+# [x1, y1, x2, y2]. Bottom rows are skill bar and party, which may have the same red.
+BLOOD_BAR_AREA = [0, 0, 1920, 990]
+# Blood bars are opaque UI
+BLOOD_BAR_ALPHA_MIN = 254
+ENEMY_BAR = 'enemy'
+MINERAL_BAR = 'mineral'
+
+# Enemy arrows stay in the band between two ellipses
+ARROW_ELLIPSE_CENTER = (960, 540 - 17)
+ARROW_ELLIPSE_OUTER = (510 + 20 + 10, 430 + 20)
+ARROW_ELLIPSE_INNER = (510 - 40 + 10, 430 - 40)
+ARROW_ALPHA_MIN = 150
+ARROW_ALPHA_LOWER = np.array([0, 0, 0, ARROW_ALPHA_MIN])
+ARROW_ALPHA_UPPER = np.array([255, 255, 255, 255])
+ARROW_RED_HSV_RANGES = [
+    (np.array([0, 43, 46]), np.array([10, 255, 255])),
+    (np.array([170, 43, 46]), np.array([180, 255, 255])),
+]
+ARROW_PIXEL_THRESHOLD = 180
+
+
+class _ThreadBuffers:
+    def __init__(self):
+        self._local = threading.local()
+
+    def _buffer(self, name, shape, dtype=np.uint8) -> np.ndarray:
+        buf = getattr(self._local, name, None)
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, dtype=dtype)
+            setattr(self._local, name, buf)
+        return buf
+
+
+class ColorSignature:
+    def __init__(self, name, color, tolerance=0, alpha_min=BLOOD_BAR_ALPHA_MIN):
+        """
+        Args:
+            name:
+            color: (B, G, R)
+            tolerance: Max difference of each channel. 0 for exact colour.
+            alpha_min: Pixels more transparent than this are ignored.
+        """
+        self.name = name
+        self.color = tuple(color)
+        self.tolerance = tolerance
+        self.lower = np.array([max(c - tolerance, 0) for c in color] + [alpha_min])
+        self.upper = np.array([min(c + tolerance, 255) for c in color] + [255])
+
+    def __repr__(self):
+        return f'ColorSignature({self.name}, {self.color}, tolerance={self.tolerance})'
+
+
+class ColorKeyResult(t.NamedTuple):
+    name: str
+    count: int
+    """Number of matched pixels"""
+    bbox: t.Optional[t.List[int]]
+    """[x1, y1, x2, y2] of all matched pixels in frame. None if nothing matched"""
+    rects: t.List[t.List[int]]
+    """[x1, y1, x2, y2] of each connected area in frame, largest first"""
+
+    @property
+    def centers(self) -> t.List[t.List[float]]:
+        return [[(x1 + x2) / 2, (y1 + y2) / 2] for x1, y1, x2, y2 in self.rects]
+
+
+BLOOD_BAR_SIGNATURES = [
+    ColorSignature(ENEMY_BAR, (90, 90, 255)),
+    ColorSignature(MINERAL_BAR, (98, 217, 255)),
+]
+
+
+class ColorKeyDetector(_ThreadBuffers):
+    def __init__(self, signatures: t.List[ColorSignature], area=None):
+        """
+        Args:
+            signatures:
+            area: [x1, y1, x2, y2] of frame to search in. None for full frame.
+        """
+        super().__init__()
+        self.signatures = {signature.name: signature for signature in signatures}
+        self.area = area
+        self._ranges = {}
+
+    def _crop(self, frame: np.ndarray) -> t.Tuple[np.ndarray, int, int]:
+        if self.area is None:
+            return frame, 0, 0
+        x1, y1, x2, y2 = self.area
+        return frame[y1:y2, x1:x2], x1, y1
+
+    def _candidate_range(self, names) -> t.Tuple[np.ndarray, np.ndarray]:
+        key = tuple(names)
+        ranges = self._ranges.get(key)
+        if ranges is None:
+            signatures = [self.signatures[name] for name in names]
+            ranges = (np.min([signature.lower for signature in signatures], axis=0),
+                      np.max([signature.upper for signature in signatures], axis=0))
+            self._ranges[key] = ranges
+        return ranges
+
+    def mask(self, name) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: Mask of the signature in the last `detect` of this thread, in area coordinates.
+        """
+        shape, ys, xs, matched = self._local.last
+        mask = np.zeros(shape, dtype=np.uint8)
+        if name in matched:
+            mask[ys[matched[name]], xs[matched[name]]] = 255
+        return mask
+
+    def detect(self, frame: np.ndarray, names=None, with_rects=True) -> t.Dict[str, ColorKeyResult]:
+        """
+        Args:
+            frame: BGRA capture.
+            names: Signatures to detect. None for all.
+            with_rects: Find connected areas of matched signatures.
+
+        Returns:
+            {name: ColorKeyResult}, of all signatures in names from the same pass.
+        """
+        roi, ox, oy = self._crop(frame)
+        if names is None:
+            names = self.signatures.keys()
+        names = list(names)
+        lower, upper = self._candidate_range(names)
+        candidate = self._buffer('candidate', roi.shape[:2])
+        # The only pass over the whole area, BGR and alpha keyed together
+        cv2.inRange(roi, lower, upper, dst=candidate)
+        ys, xs = np.nonzero(candidate)
+        pixels = roi[ys, xs]
+        results = {}
+        matched = {}
+        for name in names:
+            signature = self.signatures[name]
+            index = np.flatnonzero(np.all((pixels >= signature.lower) & (pixels <= signature.upper), axis=1))
+            matched[name] = index
+            count = len(index)
+            bbox = None
+            rects = []
+            if count:
+                sx, sy = xs[index], ys[index]
+                x1, y1, x2, y2 = int(sx.min()), int(sy.min()), int(sx.max()) + 1, int(sy.max()) + 1
+                bbox = [x1 + ox, y1 + oy, x2 + ox, y2 + oy]
+                if with_rects:
+                    # Connected areas within the bbox only
+                    mask = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
+                    mask[sy - y1, sx - x1] = 255
+                    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+                    boxes = sorted((cv2.boundingRect(c) for c in contours), key=lambda b: b[2] * b[3], reverse=True)
+                    rects = [[x + x1 + ox, y + y1 + oy, x + w + x1 + ox, y + h + y1 + oy] for x, y, w, h in boxes]
+            results[name] = ColorKeyResult(name, count, bbox, rects)
+        self._local.last = (roi.shape[:2], ys, xs, matched)
+        return results
+
+
+class CombatStateDetector(_ThreadBuffers):
+    def __init__(self):
+        super().__init__()
+        self._band_mask = {}
+        self._band_index = {}
+        self.blood_bars = ColorKeyDetector(BLOOD_BAR_SIGNATURES, area=BLOOD_BAR_AREA)
+
+    def arrow_band_mask(self, shape) -> np.ndarray:
+        """
+        Args:
+            shape: (height, width) of frame.
+
+        Returns:
+            np.ndarray: uint8 mask, 255 inside the arrow band. Cached, do not modify.
+        """
+        shape = tuple(shape[:2])
+        mask = self._band_mask.get(shape)
+        if mask is None:
+            mask = np.zeros(shape, dtype=np.uint8)
+            cv2.ellipse(mask, ARROW_ELLIPSE_CENTER, ARROW_ELLIPSE_OUTER, 0, 0, 360, 255, -1)
+            cv2.ellipse(mask, ARROW_ELLIPSE_CENTER, ARROW_ELLIPSE_INNER, 0, 0, 360, 0, -1)
+            self._band_mask[shape] = mask
+        return mask
+
+    def arrow_band_index(self, shape) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: Flat pixel indexes of the arrow band.
+        """
+        shape = tuple(shape[:2])
+        index = self._band_index.get(shape)
+        if index is None:
+            index = np.flatnonzero(self.arrow_band_mask(shape))
+            self._band_index[shape] = index
+        return index
+
+    def is_blood_bar_exist(self, frame: np.ndarray) -> bool:
+        """
+        Args:
+            frame: BGRA capture.
+        """
+        return self.blood_bars.detect(frame, names=[ENEMY_BAR], with_rects=False)[ENEMY_BAR].count > 0
+
+    def get_blood_bars(self, frame: np.ndarray, names=None) -> t.Dict[str, ColorKeyResult]:
+        """
+        Enemy and mineral bars from one pass, see BLOOD_BAR_SIGNATURES.
+
+        Args:
+            frame: BGRA capture.
+            names: Signatures to detect. None for all.
+        """
+        return self.blood_bars.detect(frame, names=names)
+
+    def count_arrow_pixels(self, frame: np.ndarray) -> int:
+        """
+        Args:
+            frame: BGRA capture.
+
+        Returns:
+            int: Number of opaque red pixels in the arrow band.
+        """
+        index = self.arrow_band_index(frame.shape)
+        n = len(index)
+        # Pixels of band as an (n, 1) image
+        band = self._buffer('band', (n, 1, 4))
+        np.take(np.ascontiguousarray(frame).reshape(-1, 4), index, axis=0, out=band.reshape(n, 4))
+        hsv = self._buffer('band_hsv', (n, 1, 3))
+        # BGR2HSV takes 4-channel input and ignores alpha
+        cv2.cvtColor(band, cv2.COLOR_BGR2HSV, dst=hsv)
+        red = self._buffer('band_red', (n, 1))
+        tmp = self._buffer('band_tmp', (n, 1))
+        (lower0, upper0), (lower1, upper1) = ARROW_RED_HSV_RANGES
+        cv2.inRange(hsv, lower0, upper0, dst=red)
+        cv2.inRange(hsv, lower1, upper1, dst=tmp)
+        cv2.bitwise_or(red, tmp, dst=red)
+        cv2.inRange(band, ARROW_ALPHA_LOWER, ARROW_ALPHA_UPPER, dst=tmp)
+        cv2.bitwise_and(red, tmp, dst=red)
+        return cv2.countNonZero(red)
+
+    def is_arrow_exist(self, frame: np.ndarray) -> bool:
+        return self.count_arrow_pixels(frame) > ARROW_PIXEL_THRESHOLD
+
+    def detect(self, frame: np.ndarray) -> list:
+        """
+        Returns:
+            list: [is blood bar exist, is enemy arrow exist]
+        """
+        return [self.is_blood_bar_exist(frame), self.is_arrow_exist(frame)]
+
+
+combat_state_detector = CombatStateDetector()
+
+
+if __name__ == '__main__':
+    # Per-call cost, compared with the previous full frame pipeline.
+    def legacy_detection(frame):
+        im_src = frame.copy()[:, :, :3]
+        im_src[frame[:, :, 3] < 254] = 0
+        im_src[990:1080, :, :] = 0
+        im_src[:, :, 2][im_src[:, :, 2] != 255] = 0
+        im_src[:, :, 2][im_src[:, :, 0] != 90] = 0
+        im_src[:, :, 2][im_src[:, :, 1] != 90] = 0
+        bar = im_src[:, :, 2].max() > 0
+        img = frame.copy()[:, :, :3]
+        img[frame[:, :, 3] < ARROW_ALPHA_MIN] = 0
+        mask = np.zeros_like(img[:, :, 0])
+        cv2.ellipse(mask, ARROW_ELLIPSE_CENTER, ARROW_ELLIPSE_OUTER, 0, 0, 360, 255, -1)
+        cv2.ellipse(mask, ARROW_ELLIPSE_CENTER, ARROW_ELLIPSE_INNER, 0, 0, 360, 0, -1)
+        img = cv2.bitwise_and(img, img, mask=mask)
+        img_hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        arrow = cv2.inRange(img_hsv, *ARROW_RED_HSV_RANGES[0]) + cv2.inRange(img_hsv, *ARROW_RED_HSV_RANGES[1])
+        return [bar, len(np.where(arrow >= 254)[-1]) > ARROW_PIXEL_THRESHOLD]
+
+    if len(sys.argv) > 1:
+        frame = cv2.imread(sys.argv[1], cv2.IMREAD_UNCHANGED)
+    else:
+        frame = np.random.randint(0, 256, (1080, 1920, 4), dtype=np.uint8)
+    detector = CombatStateDetector()
+    for name, func in [('legacy', legacy_detection), ('detector', detector.detect),
+                       ('blood bars', detector.get_blood_bars)]:
+        result = func(frame)
+        pt = time.perf_counter()
+        for _ in range(100):
+            func(frame)
+        logger.info(f'{name}: {result}, {round((time.perf_counter() - pt) * 10, 3)}ms per call')
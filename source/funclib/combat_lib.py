@@ -1,4 +1,5 @@
 import random
+import threading
 
 from source.manager import img_manager, posi_manager, asset
 from source.util import *
@@ -13,6 +14,9 @@ from source.api.pdocr_complete import ocr
 from source.ui.ui import ui_control
 from source.ui import page as UIPage
 from source.common.lang_data import translate_character_auto
+from source.combat.tactic_program import validate_tactic
+from source.funclib.combat_bus import *
+from source.funclib.combat_detector import combat_state_detector, ColorKeyResult, ENEMY_BAR, MINERAL_BAR
 
 """
 战斗相关常用函数库。
@@ -91,24 +95,30 @@ def unconventionality_situation_detection(autoDispose=True, detect_type='abc', s
 
     return situation_code
 
-def is_character_busy(print_log = True):
-    cap = itt.capture(jpgmode=2)
-    # cap = itt.png2jpg(cap, channel='ui')
+def _ui_color(frame, p):
+    # Same as the pixel of itt.capture(jpgmode=2)
+    if frame.shape[2] == 4 and frame[p[0], p[1], 3] < 50:
+        return np.zeros(3, dtype=np.uint8)
+    return frame[p[0], p[1], :3]
+
+
+def _is_character_busy_in(frame, print_log=True):
     t1 = 0
     t2 = 0
     for i in range(4):
         p = posi_manager.chara_head_list_point[i]
-        if cap[p[0], p[1]][0] > 0 and cap[p[0], p[1]][1] > 0 and cap[p[0], p[1]][2] > 0:
+        col = _ui_color(frame, p)
+        if col[0] > 0 and col[1] > 0 and col[2] > 0:
             t1 += 1
     for i in range(4):
         p = posi_manager.chara_num_list_point[i]
         # print(min(cap[p[0], p[1]]))
-        if min(cap[p[0], p[1]]) > 248:
+        if min(_ui_color(frame, p)) > 248:
             t2 += 1
     cols = []
     for i in range(4):
         p = posi_manager.chara_num_list_point[i]
-        cols.append(max(cap[p[0], p[1]]))
+        cols.append(max(_ui_color(frame, p)))
     del cols[cols.index(min(cols))]
     # elif t == 4:
     #     logger.debug("function: get_character_busy: t=4： 测试中功能，如果导致换人失败，反复输出 waiting 请上报。")
@@ -117,13 +127,17 @@ def is_character_busy(print_log = True):
     if t1 >= 3 and t2 == 3:
         return False
     if t1 >= 3 and np.std(cols)<=5:
-        if abs(max(cap[46,1846])-np.average(cols))<=5:
+        if abs(max(_ui_color(frame, [46, 1846]))-np.average(cols))<=5:
             logger.warning_once(t2t("Located at the map boundary, the is_chara_busy function enables fuzzy recognition mode."))
             return False
     if print_log:
         logger.trace(f"waiting: character busy: t1{t1} t2{t2}")
     return True
 
+
+def is_character_busy(print_log = True):
+    return get_combat_frame_state(max_age=BUSY_STATE_MAX_AGE, print_log=print_log).character_busy
+
 def chara_waiting(stop_func, max_times = 1000, is_usd=True):
     if is_usd:
         unconventionality_situation_detection()
@@ -153,16 +167,20 @@ def get_current_chara_num(stop_func, max_times = 1000):
         int: character num.
     """
     chara_waiting(stop_func, max_times = max_times)
-    cap = itt.capture(jpgmode=2)
+    # The frame chara_waiting has just seen not busy, or a newer one
+    r = get_combat_frame_state(max_age=BUSY_STATE_MAX_AGE).current_chara_num
+    if r == 0:
+        logger.warning(t2t("获得当前角色编号失败"))
+    return r
+
+
+def _get_current_chara_num_in(frame):
     for i in range(4):
         p = posi_manager.chara_num_list_point[i]
-        # print(min(cap[p[0], p[1]]))
-        if min(cap[p[0], p[1]]) > 248:
+        if min(_ui_color(frame, p)) > 248:
             continue
         else:
             return i + 1
-        
-    logger.warning(t2t("获得当前角色编号失败"))
     return 0
 
 
@@ -187,9 +205,7 @@ def get_arrow_img(img, show_res=False):
         # 拼接两个区间
         mask = mask0 + mask1
         return mask# cv2.bitwise_and(img,img,mask=mask)
-    mask = np.zeros_like(img[:,:,0])
-    cv2.ellipse(mask, (960, 540-17), (510+20+10, 430+20), 0, 0, 360, 255, -1)
-    cv2.ellipse(mask, (960, 540-17), (510-40+10, 430-40), 0, 0, 360, 0, -1)
+    mask = combat_state_detector.arrow_band_mask(img.shape)
 
     
     # cv2.ellipse(mask, (960, 540), (510+30-1, 430+30-1), 0, 0, 360, 0, -1)
@@ -228,102 +244,180 @@ def get_enemy_arrow_direction():
         angle = points_angle([SCREEN_CENTER_X,SCREEN_CENTER_Y],ret_contours[0][0],coordinate=ANGLE_NEGATIVE_Y)
     return int(angle)
 
-def get_enemy_blood_bar_img(img):
-    red_num = 255
-    bg_num = 90
-    im_src = img
-    im_src = itt.png2jpg(im_src, channel='ui', alpha_num=254)
-    im_src[990:1080, :, :] = 0
-    im_src[:, :, 2][im_src[:, :, 2] != red_num] = 0
-    im_src[:, :, 2][im_src[:, :, 0] != bg_num] = 0
-    im_src[:, :, 2][im_src[:, :, 1] != bg_num] = 0
-    # _, imsrc2 = cv2.threshold(imsrc[:, :, 2], 1, 255, cv2.THRESH_BINARY)
-    blood_bar_img = im_src[:, :, 2]
-    if CV_DEBUG_MODE:
-        # cv2.imshow("mask",mask)
-        cv2.imshow("21312231", im_src)
-        cv2.imshow("2131231", blood_bar_img)
-        cv2.waitKey(10)
-    return blood_bar_img
-
-def get_mineral_blood_bar_img(img):
+def get_blood_bars(img, names=None) -> t.Dict[str, ColorKeyResult]:
     """
-    挖矿也是战斗！
-    :param img:
-    :return:
+    获取敌人、矿物血条，一次检测得到所有血条。挖矿也是战斗！
+
+    Args:
+        img: 4通道截图
+        names: ENEMY_BAR, MINERAL_BAR的列表. None为全部.
+
+    Returns:
+        dict: {ENEMY_BAR: ColorKeyResult, ...} 血条数量、位置
     """
-    red_num = 255
-    green_num = 217
-    blue_num = 98
-    # bg_num = 90
-    im_src = img
-    im_src = itt.png2jpg(im_src, channel='ui', alpha_num=254)
-    im_src[990:1080, :, :] = 0
-    im_src[:, :, 2][im_src[:, :, 2] != red_num] = 0
-    im_src[:, :, 2][im_src[:, :, 0] != blue_num] = 0
-    im_src[:, :, 2][im_src[:, :, 1] != green_num] = 0
-    # _, imsrc2 = cv2.threshold(imsrc[:, :, 2], 1, 255, cv2.THRESH_BINARY)
-    blood_bar_img = im_src[:, :, 2]
+    ret = combat_state_detector.get_blood_bars(img, names=names)
     if CV_DEBUG_MODE:
-        # cv2.imshow("mask",mask)
-        cv2.imshow("21312231", cv2.cvtColor(im_src, cv2.COLOR_BGR2RGB))
-        cv2.imshow("2131231", blood_bar_img)
+        for name in ret:
+            cv2.imshow(name, combat_state_detector.blood_bars.mask(name))
         cv2.waitKey(10)
-    return blood_bar_img
+    return ret
     
 def combat_statement_detection():
     # return: ret[0]: blood bar; ret[1]: enemy arrow
-    ret = [False,False]
-    
-    im_src = itt.capture(jpgmode=FOUR_CHANNELS)
-    orsrc = im_src.copy()
-    blood_bar_img = get_enemy_blood_bar_img(orsrc.copy())
-    
-    flag_is_blood_bar_exist = blood_bar_img.max() > 0
-    
-    # print('flag_is_blood_bar_exist ',flag_is_blood_bar_exist)
-    if flag_is_blood_bar_exist:
+    state = get_combat_frame_state(max_age=COMBAT_STATE_MAX_AGE)
+    return [state.blood_bar, state.arrow]
+
+
+"""
+战斗感知：每帧截图只截一次，发布到COMBAT_BUS。各战斗状态在首次读取时才计算，并缓存在该帧上。
+CSDL是感知阶段，每次循环截图并发布一帧，战斗中每COMBAT_FRAME_PERIOD秒一帧。
+其他线程读取最新帧，只有帧过期时（CSDL暂停、未在战斗中）才自己截图。
+"""
+# Period of CSDL in combat, in seconds
+COMBAT_FRAME_PERIOD = 0.1
+# Max age of shared state, in seconds. One CSDL period and its perception time.
+COMBAT_STATE_MAX_AGE = COMBAT_FRAME_PERIOD * 2
+# character_busy is polled right after key presses, an older frame may be captured before the key press.
+BUSY_STATE_MAX_AGE = 0.05
+# Vision of current character for q_ready, set by TacticOperator.
+q_ready_vision = None
+_perception_lock = threading.Lock()
+
+
+def _icon_cap_in(frame, imgicon: img_manager.ImgIcon):
+    # Same as itt.capture(posi=imgicon.cap_posi, jpgmode=imgicon.jpgmode)
+    cap = crop(frame, imgicon.cap_posi)
+    if imgicon.jpgmode == 1:
+        return itt.png2jpg(cap.copy(), bgcolor='black', channel='bg')
+    elif imgicon.jpgmode == 2:
+        return itt.png2jpg(cap.copy(), bgcolor='black', channel='ui')
+    elif imgicon.jpgmode == FOUR_CHANNELS:
+        return cap
+    return cap[:, :, :3]
+
+
+def _is_main_page_in(frame):
+    return itt.get_img_existence(asset.IconUIEmergencyFood, is_log=False, cap=_icon_cap_in(frame, asset.IconUIEmergencyFood))
+
+
+def _is_e_available_in(frame):  # 被击飞时不可用
+    cap = crop(frame, posi_manager.posi_chara_smaller_e)
+    if cap.shape[2] == 4:
+        cap = cap[:, :, :3][cap[:, :, 3] >= 50]
+    return cap.size > 0 and cap.max() >= 10
+
+
+def is_q_ready_in(frame, vision, show_res=False):
+    """Check Q-State by image recognition
+
+    Args:
+        frame: 截图
+        vision: 角色元素
+        show_res (bool, optional): Whether to display recognized image. Defaults to False.
+
+    Returns:
+        bool: Whether Q-Skill can be triggered
+    """
+    imsrc_q_skill = crop(frame, posi_manager.posi_complete_chara_q)[:, :, :3]
+    mask = np.zeros_like(imsrc_q_skill[:,:,0])
+    hh, ww = imsrc_q_skill.shape[:2]
+    xc = hh // 2
+    yc = ww // 2
+    radius1 = 53
+    radius2 = 47
+    cv2.circle(mask, (xc,yc), radius1, (255,255,255), -1)
+    cv2.circle(mask, (xc,yc), radius2, (0,0,0), -1)
+    res1 = cv2.bitwise_and(imsrc_q_skill,imsrc_q_skill,mask=mask)
+    HUE_DELTA = 5
+
+    # stone HSV=0.12538226299694,0.85490196078431,1
+    orhsv = character.Q_SKILL_COLOR[vision]
+    hsv_lower = np.array([int(max(0,orhsv[0]*180-HUE_DELTA)), int(max(orhsv[1]*255-60, 50)), 200])
+    hsv_upper = np.array([int(min(179,orhsv[0]*180+HUE_DELTA)), int(min(orhsv[1]*255+60, 255)), 255])
+    hsv = cv2.cvtColor(res1, cv2.COLOR_BGR2HSV)
+    mask2 = cv2.inRange(hsv, hsv_lower, hsv_upper)
+    res = cv2.countNonZero(mask2)
+    if show_res:
+        print(f"num: {res}")
+        cv2.imshow("res", mask2)
+        cv2.waitKey(100)
+    return res>=(650*GIAconfig.General_DeterminingStrictWeight)
+
+
+def _perceive_blood_bar(frame):
+    bars = combat_state_detector.get_blood_bars(frame)
+    bar = bars[ENEMY_BAR].count > 0
+    if bar:
         only_arrow_timer.reset()
-        ret[0]=True
-    
-    '''-----------------------------'''
-    
-    
-    # im_src3 = orsrc.copy()
-    # img_manager.qshow(imsrc)
+    return {EVENT_BLOOD_BAR: bar, EVENT_ARROW: combat_state_detector.is_arrow_exist(frame), FRAME_BLOOD_BARS: bars}
 
-    '''可以用圆形遮挡优化'''
 
-    arrow_img = get_arrow_img(orsrc.copy())
-    # _, imsrc2 = cv2.threshold(imsrc2[:, :, 2], 1, 255, cv2.THRESH_BINARY)
-    # img_manager.qshow(imsrc2)
-    
-    # if True:
-    #     if len(ret_contours) != 0:
-    #         angle = cv2.minAreaRect(ret_contours)[2]
-    #         print(angle)
-    #         img = im_src.copy()[:, :, 2]
-    #         img = img[ret_range[0]:ret_range[2],ret_range[1]:ret_range[3]]
-    #         h, w = img.shape
-    #         center = (w//2, h//2)
-    #         M = cv2.getRotationMatrix2D(center, angle, 1.0)
-    #         rotated = cv2.warpAffine(img, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)    
-    #         cv2.imshow('123', rotated)
-    #         cv2.waitKey(50)
-        
-    red_arrow_num = len(np.where(arrow_img>=254)[-1])
-    # print(red_arrow_num)
-    if red_arrow_num > 180:
-        ret[1]=True
+def _perceive_low_health(frame):
+    healthy = _is_character_healthy_in(frame)
+    return {EVENT_LOW_HEALTH: None if healthy is None else not healthy}
 
-    
 
-    return ret
+def _perceive_q_ready(frame, vision):
+    return {EVENT_Q_READY: is_q_ready_in(frame, vision) if vision in character.Q_SKILL_COLOR else None}
+
+
+def perceive_combat_frame(frame, frame_time=None, print_log=True) -> CombatFrameState:
+    """
+    Wrap one 4-channel capture into a CombatFrameState.
+    Combat states are perceived on first access, so checks only pay for the fields they read.
+    """
+    if frame_time is None:
+        frame_time = time.time()
+    vision = q_ready_vision
+    return CombatFrameState(frame, frame_time, perceivers={
+        EVENT_BLOOD_BAR: _perceive_blood_bar,
+        EVENT_ARROW: _perceive_blood_bar,
+        FRAME_BLOOD_BARS: _perceive_blood_bar,
+        EVENT_CHARACTER_BUSY: lambda f: {EVENT_CHARACTER_BUSY: _is_character_busy_in(f, print_log=print_log)},
+        EVENT_CURRENT_CHARA_NUM: lambda f: {EVENT_CURRENT_CHARA_NUM: _get_current_chara_num_in(f)},
+        EVENT_E_AVAILABLE: lambda f: {EVENT_E_AVAILABLE: _is_e_available_in(f)},
+        EVENT_Q_READY: lambda f: _perceive_q_ready(f, vision),
+        EVENT_LOW_HEALTH: _perceive_low_health,
+    })
+
+
+def get_combat_frame_state(max_age=COMBAT_STATE_MAX_AGE, print_log=True) -> CombatFrameState:
+    """
+    Latest combat state on COMBAT_BUS. If it is older than max_age, capture a new frame.
+    Fields of the returned state are perceived when read.
+
+    Args:
+        max_age: seconds. 0 to always capture.
+    """
+    state = COMBAT_BUS.get_latest(max_age)
+    if state is not None:
+        return state
+    with _perception_lock:
+        # Another thread may have perceived while waiting
+        state = COMBAT_BUS.get_latest(max_age)
+        if state is not None:
+            return state
+        return _publish_combat_frame(print_log=print_log)
+
+
+def _publish_combat_frame(print_log=True) -> CombatFrameState:
+    frame_time = time.time()
+    state = perceive_combat_frame(itt.capture(jpgmode=FOUR_CHANNELS), frame_time=frame_time, print_log=print_log)
+    COMBAT_BUS.publish(state)
+    return state
+
+
+def publish_combat_frame(print_log=True) -> CombatFrameState:
+    """
+    Capture a new frame and publish it to COMBAT_BUS. Called by CSDL every loop.
+    """
+    with _perception_lock:
+        return _publish_combat_frame(print_log=print_log)
 
 def get_chara_blood():
     img = itt.capture(jpgmode=NORMAL_CHANNELS,posi=asset.AreaCombatBloodBar.position)
     img = extract_white_letters(img, threshold=251)
-    t = ocr_light.get_all_texts(img)
+    t = ocr_light.get_all_texts(img, line_count=asset.AreaCombatBloodBar.line_count)
     t2 = ','.join(str(i) for i in t).replace(',','')
     cb=""
     tb=""
@@ -351,14 +445,18 @@ def get_chara_blood_percentage():
     else:
         return None
 
-def is_character_healthy():
-    if ui_control.verify_page(UIPage.page_main):
-        img = itt.capture(jpgmode=NORMAL_CHANNELS)
+def _is_character_healthy_in(frame):
+    if _is_main_page_in(frame):
         if IS_DEVICE_PC:
-            col = img[1011,847]
+            col = frame[1011,847,:3]
         target_col = [35,215,150]
         return color_similar(col,target_col,threshold=20)
 
+def is_character_healthy():
+    low_health = get_combat_frame_state(max_age=COMBAT_STATE_MAX_AGE).low_health
+    if low_health is not None:
+        return not low_health
+
 def get_characters_name(max_retry = 50):
     retry_times = 0
     for retry_times in range(max_retry):
@@ -369,7 +467,7 @@ def get_characters_name(max_retry = 50):
         for name_area in [asset.AreaCombatCharacterName1,asset.AreaCombatCharacterName2,asset.AreaCombatCharacterName3,asset.AreaCombatCharacterName4]:
             img2 = img.copy()
             img3 = crop(img2,name_area.position)
-            texts = ocr.get_all_texts(img3)
+            texts = ocr.get_all_texts(img3, line_count=name_area.line_count)
             succ=False
             for t in texts:
                 if translate_character_auto(t) != None:
@@ -400,7 +498,7 @@ def get_team_chara_names_in_party_setup():
               asset.AreaCombatPartySetupCharaName3,asset.AreaCombatPartySetupCharaName4]:
         img = itt.capture(jpgmode=NORMAL_CHANNELS, posi=i.position)
         img2 = extract_white_letters(img)
-        text = ocr.get_all_texts(img2)
+        text = ocr.get_all_texts(img2, line_count=i.line_count)
         text_list.append(text[0])
     return text_list
 
@@ -588,6 +686,7 @@ def get_chara_list():
         except:
             c_tactic_group = team_item["tastic_group"]
             logger.warning(t2t("请将配对文件中的tastic_group更名为tactic_group. 已自动识别。"))
+        validate_tactic(c_tactic_group, cname)
             
         c_trigger = get_param(team_item, "trigger", autofill_flag, chara_name=cname, value_when_empty="e_ready")
         cEpress_time = get_param(team_item, "Epress_time", autofill_flag, chara_name=cname)
@@ -652,20 +751,18 @@ class CombatStatementDetectionLoop(BaseThreading):
             time.sleep(2)
             if self.stop_threading_flag:return
             self._is_init = True
-        r = is_character_healthy()
-        if r != None:
-            self.is_low_health = not r
+        frame_state = publish_combat_frame()
+        if frame_state.low_health is not None:
+            self.is_low_health = frame_state.low_health
 
         if self.is_freeze_state:
             return
+        r = [frame_state.blood_bar, frame_state.arrow]
         if only_arrow_timer.get_diff_time()>=150:
             if self.current_state == True:
                 logger.debug("only arrow but blood bar is not exist over 150, ready to exit combat mode.")
-            r = combat_statement_detection()
-            state = r[0] or r[1]
             state = False
         else:
-            r = combat_statement_detection()
             state = r[0] or r[1]
         if state != self.current_state:
             if self.current_state == True: # 切换到无敌人慢一点, 8s
@@ -676,13 +773,16 @@ class CombatStatementDetectionLoop(BaseThreading):
             self.state_counter += 1
         else:
             self.state_counter = 0
-            self.while_sleep = 0.4
+            # Operators read the frames published in combat
+            self.while_sleep = COMBAT_FRAME_PERIOD if self.current_state else 0.4
         if self.state_counter >= 10:
             logger.debug(f'combat_statement_detection change state: {self.current_state} -> {state} {r}')
             # if self.current_state == False:
             #     only_arrow_timer.reset()
             self.state_counter = 0
+            old_state = self.current_state
             self.current_state = state
+            COMBAT_BUS.emit(EVENT_COMBAT_STATE, old_state, state)
     
             
                 
@@ -699,7 +799,7 @@ if __name__ == '__main__':
     # set_party_setup("Lisa")
     while 1:
         time.sleep(0.1)
-        get_mineral_blood_bar_img(itt.capture(jpgmode=FOUR_CHANNELS))
+        print(get_blood_bars(itt.capture(jpgmode=FOUR_CHANNELS)))
         # print(get_characters_name())
         # print(is_character_busy())
         # print(unconventionality_situation_detection())
@@ -24,14 +24,14 @@ class GenericEvent(BaseThreading):
         '''if you're using this class, copy this'''
         while 1:
             pt = time.time()
-            time.sleep(self.while_sleep)
+            self.sleep_unless_paused(self.while_sleep)
             if self.stop_threading_flag:
                 return
 
             if self.pause_threading_flag:
                 if self.working_flag:
                     self.working_flag = False
-                time.sleep(1)
+                self.wait_until_continue()
                 continue
 
             if not self.working_flag:
@@ -1,20 +1,47 @@
 # coding: utf-8
 
+import hashlib
+import json
 import os.path
+import pickle
 import re
 import time
 import typing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 from cached_property import cached_property
 from source.integration_json.utils import *
 from source.device.alas.config_utils import *
 
 
+PREPROCESSING_PATH = f"{ROOT_PATH}\\assets\\POI_JSON_API\\integration_json"
+PREPROCESSING_INDEX = 'preprocessing_integration_index.pkl'
+PREPROCESSING_MANIFEST = 'preprocessing_integration_manifest.pkl'
+PREPROCESSING_JSON = 'preprocessing_integration_json.json'
+
+
+def _parse_position_file(path: str, old_hash: str = None):
+    """
+    Worker of `JsonIntegrationApi.read_folder`. Kept free of GIA imports so that it can run in a process pool.
+
+    Returns:
+        tuple: (sha1 of file content, position list or None if content is unchanged)
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    digest = hashlib.sha1(raw).hexdigest()
+    if digest == old_hash:
+        return digest, None
+    return digest, json.loads(raw)['position']
+
+
 class JsonIntegrationApi():
-    def __init__(self, path=None, lang=GLOBAL_LANG, prefix: str = ''):
+    def __init__(self, path=None, lang=GLOBAL_LANG, prefix: str = '', workers: int = None, use_process=False):
         """
         Args:
             path (str): Path to json_integration/zh_CN
+            workers (int): Number of parsing workers. None to use cpu count.
+            use_process (bool): Parse in a process pool instead of a thread pool.
         """
         if path is None:
             path = f'./assets/json_integration/{lang}'
@@ -26,6 +53,12 @@ class JsonIntegrationApi():
         self.preprocessing_data = {}
         # self.preprocessing_data = load_json(all_path="{ROOT_PATH}\\assets\\POI_JSON_API\\integration_json\\preprocessing_integration_json.json")
         self.read_times = 0
+        self.parse_times = 0
+        self.workers = workers if workers is not None else (os.cpu_count() or 4)
+        self.use_process = use_process
+        # complete file path -> {'mtime', 'size', 'hash', 'position'}
+        self.manifest = {}
+        self._seen_paths = set()
 
     @classmethod
     def read_json(cls, data, model, attr: str, coll_name: str, coll_type: str, path: str):
@@ -47,8 +80,11 @@ class JsonIntegrationApi():
     @cached_property
     def data(self) -> t.Dict[str, t.List[PositionJson]]:
         data = {}
-        row: dict
-        row = read_file(f"{ROOT_PATH}\\assets\\POI_JSON_API\\integration_json\\preprocessing_integration_json.json")
+        index_path = os.path.join(PREPROCESSING_PATH, PREPROCESSING_INDEX)
+        if os.path.exists(index_path):
+            row = self.load_index(index_path)
+        else:
+            row = read_file(os.path.join(PREPROCESSING_PATH, PREPROCESSING_JSON))
         for k in row.keys():
             data[k] = []
             for i in row[k]:
@@ -56,12 +92,73 @@ class JsonIntegrationApi():
 
         return data
 
-    def read_folder(self, rel_path: str = "", collection_type: str = COLL_TYPE_ANY):
-        pt = time.time();pt2=time.time()
+    @staticmethod
+    def save_index(preprocessing_data: dict, index_path: str):
+        """
+        Save preprocessing data column-wise. Positions are stored as a numpy array if they all have the same length,
+        else as a list.
+        """
+        out = {}
+        for coll_name, rows in preprocessing_data.items():
+            positions = [i['position'] for i in rows]
+            if len({len(i) for i in positions}) <= 1:
+                positions = np.array(positions, dtype=np.float64).reshape(len(rows), -1)
+            out[coll_name] = {
+                'name': [i['name'] for i in rows],
+                'position': positions,
+                'collection_name': [i['collection_name'] for i in rows],
+                'collection_type': [i['collection_type'] for i in rows],
+                'path': [i['path'] for i in rows],
+                'location': [i['location'] for i in rows],
+            }
+        with open(index_path, 'wb') as f:
+            pickle.dump(out, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load_index(index_path: str) -> dict:
+        with open(index_path, 'rb') as f:
+            columns = pickle.load(f)
+        out = {}
+        for coll_name, col in columns.items():
+            positions = col['position']
+            if isinstance(positions, np.ndarray):
+                positions = positions.tolist()
+            # Index saved without collection_name, rows are grouped by it.
+            coll_names = col.get('collection_name', [coll_name] * len(col['name']))
+            out[coll_name] = [
+                {
+                    'name': name,
+                    'position': position,
+                    'collection_name': collection_name,
+                    'collection_type': collection_type,
+                    'path': path,
+                    'location': location,
+                }
+                for name, position, collection_name, collection_type, path, location in zip(
+                    col['name'], positions, coll_names, col['collection_type'], col['path'], col['location'])
+            ]
+        return out
+
+    def load_manifest(self, save_in=PREPROCESSING_PATH):
+        path = os.path.join(save_in, PREPROCESSING_MANIFEST)
+        if not os.path.exists(path):
+            self.manifest = {}
+            return
+        try:
+            with open(path, 'rb') as f:
+                self.manifest = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"manifest broken, reparse all files: {e}")
+            self.manifest = {}
+
+    def save_manifest(self, save_in=PREPROCESSING_PATH):
+        with open(os.path.join(save_in, PREPROCESSING_MANIFEST), 'wb') as f:
+            pickle.dump(self.manifest, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _iter_folder_files(self, rel_path: str, collection_type: str):
         for root, dirs, files in os.walk(self.path + f"\\{rel_path}"):
             for f in files:
                 complete_file_path = os.path.join(root, f)
-                # print(complete_file_path)
                 if f == '.json':
                     logger.warning(f"read {complete_file_path}, skip.")
                     continue
@@ -76,27 +173,65 @@ class JsonIntegrationApi():
                     coll_name = "传送点"
                 elif "狗粮" in complete_file_path:
                     coll_name = "圣遗物"
-                # os.path.dirname(os.path.dirname(complete_file_path)).split('\\')[-1]
-                json_content = read_file(complete_file_path, is_print=False)
-                row = {}
-                row['name'] = f[:-5]
-
-                row['position'] = round_list(json_content['position'],3)
-                row['collection_name'] = coll_name
-                row['collection_type'] = collection_type
-                row['path'] = self.get_rel_path(complete_file_path)
-                row['location'] = LOCA_TEYVAT
-
-                if coll_name not in self.preprocessing_data.keys():
-                    self.preprocessing_data[coll_name] = []
-                self.preprocessing_data[coll_name].append(row)
-
-                self.read_times += 1
-                if self.read_times % 500 == 0:
-                    logger.info(f'load data: {self.read_times}/20591+; speed: {round(500/(time.time()-pt2), 2)}/s')
-                    pt2=time.time()
-        logger.info(t2t("data loaded. cost") + f'{round(time.time() - pt, 2)}')
-        logger.info(f'load {self.read_times} data')
+                yield complete_file_path, f, coll_name
+
+    def _read_positions(self, file_paths: t.List[str]) -> t.Dict[str, list]:
+        """
+        Get positions of files. Files whose mtime and size are unchanged since last run are taken from manifest,
+        the rest are hashed and parsed in a worker pool. Files with new mtime but same hash are not parsed again.
+        """
+        positions = {}
+        pending = []
+        self._seen_paths.update(file_paths)
+        for path in file_paths:
+            stat = os.stat(path)
+            entry = self.manifest.get(path)
+            if entry is not None and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+                positions[path] = entry['position']
+            else:
+                pending.append((path, stat))
+        if not pending:
+            return positions
+
+        executor_class = ProcessPoolExecutor if self.use_process else ThreadPoolExecutor
+        with executor_class(max_workers=self.workers) as executor:
+            old_hashes = [self.manifest.get(path, {}).get('hash') for path, _ in pending]
+            chunksize = max(1, len(pending) // (self.workers * 4)) if self.use_process else 1
+            results = executor.map(_parse_position_file, [path for path, _ in pending], old_hashes,
+                                   chunksize=chunksize)
+            for (path, stat), (digest, position) in zip(pending, results):
+                if position is None:
+                    position = self.manifest[path]['position']
+                else:
+                    position = round_list(position, 3)
+                    self.parse_times += 1
+                self.manifest[path] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'hash': digest,
+                                       'position': position}
+                positions[path] = position
+        return positions
+
+    def read_folder(self, rel_path: str = "", collection_type: str = COLL_TYPE_ANY):
+        pt = time.time()
+        parse_times = self.parse_times
+        files = list(self._iter_folder_files(rel_path, collection_type))
+        positions = self._read_positions([i[0] for i in files])
+        for complete_file_path, f, coll_name in files:
+            row = {}
+            row['name'] = f[:-5]
+
+            row['position'] = positions[complete_file_path]
+            row['collection_name'] = coll_name
+            row['collection_type'] = collection_type
+            row['path'] = self.get_rel_path(complete_file_path)
+            row['location'] = LOCA_TEYVAT
+
+            if coll_name not in self.preprocessing_data.keys():
+                self.preprocessing_data[coll_name] = []
+            self.preprocessing_data[coll_name].append(row)
+            self.read_times += 1
+        cost = max(time.time() - pt, 1e-6)
+        logger.info(f'load {rel_path}: {len(files)} files, {self.parse_times - parse_times} parsed, '
+                    f'cost {round(cost, 2)}s, speed: {round(len(files) / cost, 2)} files/s')
 
     def get_rel_path(self, completet_file_path, addi=1):
         j = [i for i in completet_file_path.split('\\')]
@@ -106,10 +241,15 @@ class JsonIntegrationApi():
             p = os.path.join(p, k)
         return p
 
-    def preprocess_data(self, save_in=f"{ROOT_PATH}\\assets\\POI_JSON_API\\integration_json"):
+    def preprocess_data(self, save_in=PREPROCESSING_PATH):
         logger.info(t2t("loading data"))
         pt = time.time()
-        times = 0
+        self.read_times = 0
+        self.parse_times = 0
+        self.preprocessing_data = {}
+        self._seen_paths = set()
+        self.load_manifest(save_in=save_in)
+        manifest_size = len(self.manifest)
 
         for i in [r"锚点&神像\3.4沙漠锚点神像",
                   r"锚点&神像\蒙德&璃月锚点神像",
@@ -125,7 +265,16 @@ class JsonIntegrationApi():
         self.read_folder(r"圣遗物狗粮\AB线狗粮全部", collection_type=COLL_TYPE_ARTIFACT)
         self.read_folder("植物", collection_type=COLL_TYPE_PLANT)
         self.read_folder("怪物", collection_type=COLL_TYPE_ENEMY)
-        save_json(self.preprocessing_data, json_name='preprocessing_integration_json.json', default_path=save_in)
+        self.save_index(self.preprocessing_data, os.path.join(save_in, PREPROCESSING_INDEX))
+        # drop files that no longer exist
+        self.manifest = {k: v for k, v in self.manifest.items() if k in self._seen_paths}
+        self.save_manifest(save_in=save_in)
+
+        cost = max(time.time() - pt, 1e-6)
+        logger.info(t2t("data loaded. cost") + f'{round(cost, 2)}')
+        logger.info(f'load {self.read_times} data, {self.parse_times} parsed, '
+                    f'{self.read_times - self.parse_times} reused from manifest ({manifest_size} entries); '
+                    f'speed: {round(self.read_times / cost, 2)} files/s')
 
         # for root, dirs, files in os.walk(self.path):
         #     for f in files:
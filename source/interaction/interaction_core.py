@@ -305,7 +305,7 @@ class InteractionBGD:
         from source.api.pdocr_complete import ocr
         cap = self.capture(posi = textobj.cap_area, jpgmode=NORMAL_CHANNELS, recapture_limit=(self.RECAPTURE_LIMIT if use_cache else 0))
         # res = LOCAL_OCR_MODEL.ocr_lines(cap)
-        res = ocr.get_all_texts(cap)
+        res = ocr.get_all_texts(cap, line_count=textobj.line_count)
         is_exist = textobj.match_results(res)
         if textobj.is_print_log(is_exist):
             logger.trace(f"get_text_existence: text: {textobj.text} {'Found' if is_exist else 'Not Found'}")
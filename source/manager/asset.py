@@ -49,28 +49,28 @@ AreaBigmapSwitchMap = Area()
 ButtonBigmapSwitchMap = Button()
 IconBigMapScaling = ImgIcon(threshold=0.98, print_log = LOG_ALL, offset=0)
 ButtonBigmapCloseMarkTableInTP = Button(threshold=0.999)
-AreaCombatBloodBar = Area()
-AreaCombatCharacterName1 = Area()
-AreaCombatCharacterName2 = Area()
-AreaCombatCharacterName3 = Area()
-AreaCombatCharacterName4 = Area()
+AreaCombatBloodBar = Area(line_count=1)
+AreaCombatCharacterName1 = Area(line_count=1)
+AreaCombatCharacterName2 = Area(line_count=1)
+AreaCombatCharacterName3 = Area(line_count=1)
+AreaCombatCharacterName4 = Area(line_count=1)
 AreaCombatTeamCharactersName = Area()
 ButtonUIEnterPartySetup = Button()
 CombatButtonGoToFight = Button()
 ButtonCombatSwitchTeamLeft = Button(threshold=0)
 ButtonCombatSwitchTeamRight = Button(threshold=0)
 IconUIPartySetup = ImgIcon(threshold=0.96,print_log=LOG_WHEN_TRUE)
-AreaCombatPartySetupCharaName1=Area()
-AreaCombatPartySetupCharaName2=Area()
-AreaCombatPartySetupCharaName3=Area()
-AreaCombatPartySetupCharaName4=Area()
+AreaCombatPartySetupCharaName1=Area(line_count=1)
+AreaCombatPartySetupCharaName2=Area(line_count=1)
+AreaCombatPartySetupCharaName3=Area(line_count=1)
+AreaCombatPartySetupCharaName4=Area(line_count=1)
 IconBigmapCommission = ImgIcon(is_bbg=False)
 AreaBigmapSidebarCommissionName = PosiTemplate()
 IconBigmapSidebarIsCommissionExist = ImgIcon(threshold=0.97)
 IconCommissionCommissionIcon = ImgIcon()
 IconCommissionInCommission = ImgIcon(is_bbg=False)
 AreaClaimRewardAvailableReward = PosiTemplate()
-AreaDomainLeaveIn = PosiTemplate()
+AreaDomainLeaveIn = PosiTemplate(line_count=1)
 AreaDomainLeyLineDisorder = PosiTemplate()
 AreaGeneralInteractiveItemInformation = ImgIcon()
 IconGeneralTalkBubble = ImgIcon()
@@ -102,7 +102,7 @@ exit_challenge = TextTemplate(text={'zh_CN': '退出秘境',"en_US": "Leave Doma
 TextDomainObtain = TextTemplate(text={'zh_CN': '获得', "en_US": "Obtained"})
 use_revival_item = TextTemplate(text={'zh_CN': '用道具',"en_US": "revival item"})
 revival = Text(zh="复苏", en="Revive")
-LEAVING_IN = TextTemplate(text={'zh_CN': '自动退出',"en_US": 'Leaving in'}, cap_area = AreaDomainLeaveIn.position)
+LEAVING_IN = TextTemplate(text={'zh_CN': '自动退出',"en_US": 'Leaving in'}, cap_area = AreaDomainLeaveIn.position, line_count=AreaDomainLeaveIn.line_count)
 LEY_LINE_DISORDER = TextTemplate(text={'zh_CN': '地脉异常',"en_US": "Ley Line Disorder"}, cap_area = AreaDomainLeyLineDisorder.position)
 
 # ImgIcon&Button which based on text
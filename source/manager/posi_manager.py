@@ -15,12 +15,13 @@ d2y = 5
 # }
 
 class PosiTemplate(AssetBase):
-    def __init__(self, name = None, posi=None, img_path=None):
+    def __init__(self, name = None, posi=None, img_path=None, line_count=None):
         """坐标管理类
 
         Args:
             posi (list, optional): 可选。若有，则使用该坐标. Defaults to None.
             img_path (str, optional): 可选。若有，则使用该图片。图片应符合bbg格式. Defaults to None.
+            line_count (int, optional): 可选。区域内固定的文字行数。若有，OCR跳过文本检测，只做识别. Defaults to None.
         """
         if name is None:
             super().__init__(get_name(traceback.extract_stack()[-2]))
@@ -28,6 +29,7 @@ class PosiTemplate(AssetBase):
             super().__init__(name)
         self.posi_list = []
         self.position = None
+        self.line_count = line_count
         
         if posi is None and img_path is None:
             img_path = self.get_img_path()
@@ -54,9 +56,9 @@ class PosiTemplate(AssetBase):
             self.position = self.posi_list
 
 class Area(PosiTemplate):
-    def __init__(self, name=None):
+    def __init__(self, name=None, line_count=None):
         name = get_name(traceback.extract_stack()[-2])
-        super().__init__(name)
+        super().__init__(name, line_count=line_count)
 
 """
 amazing. how could i add so many positions manually here?
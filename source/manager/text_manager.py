@@ -2,7 +2,12 @@ from source.manager.util import *
 
 
 class TextTemplate(AssetBase):
-    def __init__(self, text:dict, cap_area=None, name=None, match_mode=CONTAIN_MATCHING, print_log=LOG_WHEN_TRUE):
+    def __init__(self, text:dict, cap_area=None, name=None, match_mode=CONTAIN_MATCHING, print_log=LOG_WHEN_TRUE, line_count=None):
+        """
+        Args:
+            line_count (int, optional): Known number of text lines in cap_area.
+                If set, OCR skips text detection and only runs recognition on the area. Defaults to None.
+        """
         if name is None:
             super().__init__(get_name(traceback.extract_stack()[-2]))
         else:
@@ -18,6 +23,7 @@ class TextTemplate(AssetBase):
         self.text = self.origin_text[GLOBAL_LANG]
         self.match_mode = match_mode
         self.print_log = print_log
+        self.line_count = line_count
     def gettext(self):
         return self.origin_text[GLOBAL_LANG]
 
@@ -34,7 +40,7 @@ class TextTemplate(AssetBase):
                 return self.text == res
 
 class Text(TextTemplate):
-    def __init__(self, name=None, cap_area=None, zh=None,en=None, print_log = LOG_WHEN_TRUE) -> None:
+    def __init__(self, name=None, cap_area=None, zh=None,en=None, print_log = LOG_WHEN_TRUE, line_count=None) -> None:
         if name is None:
             name = get_name(traceback.extract_stack()[-2])
         d={}
@@ -42,7 +48,7 @@ class Text(TextTemplate):
             d["zh_CN"]=zh
         if en != None:
             d["en_US"]=en
-        super().__init__(d, cap_area=cap_area, name=name, print_log=print_log)
+        super().__init__(d, cap_area=cap_area, name=name, print_log=print_log, line_count=line_count)
 
 
 # if __name__ == '__main__':  
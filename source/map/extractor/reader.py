@@ -1,6 +1,7 @@
 import re
 import typing as t
 
+import numpy as np
 from cached_property import cached_property
 from pydantic import BaseModel
 
@@ -183,6 +184,123 @@ class PoiJsonApi:
     def area(self) -> t.Dict[int, AreaModel]:
         return self.read_json(os.path.join(self.path, './area.json'), AreaModel, 'areaId')
 
+    # Cell size of `index_grid`, in cvAutoTrack units.
+    # Radius queries used by collector are ~15 units, so one query touches at most 4 cells.
+    GRID_SIZE = 64
+
+    @cached_property
+    def index_title(self) -> t.Dict[str, t.List[int]]:
+        """
+        markerTitle -> list of point id.
+        """
+        out = {}
+        for id_, row in self.data.items():
+            out.setdefault(row.markerTitle, []).append(id_)
+        return out
+
+    @cached_property
+    def point_area(self) -> t.Dict[int, int]:
+        """
+        point id -> areaId of its first item.
+        Points without item are not indexed.
+        """
+        out = {}
+        for id_, row in self.data.items():
+            if not row.itemList:
+                continue
+            item = self.item.get(row.itemList[0].itemId)
+            if item is None:
+                continue
+            out[id_] = item.areaId
+        return out
+
+    @cached_property
+    def cvat_position(self) -> t.Dict[int, t.Tuple[float, float]]:
+        """
+        point id -> position in cvAutoTrack coordinates, converted once.
+        """
+        ids = list(self.data.keys())
+        if not ids:
+            return {}
+        positions = np.array([self.data[id_].position_tuple for id_ in ids], dtype=float)
+        positions = MapConverter.convert_kongying_to_cvAutoTrack(positions, decimal=2)
+        return {id_: (float(x), float(y)) for id_, (x, y) in zip(ids, positions)}
+
+    @cached_property
+    def index_grid(self) -> t.Dict[t.Tuple[int, int], t.List[int]]:
+        """
+        Uniform grid over `cvat_position`, (cell_x, cell_y) -> list of point id.
+        """
+        out = {}
+        size = self.GRID_SIZE
+        for id_, (x, y) in self.cvat_position.items():
+            out.setdefault((int(x // size), int(y // size)), []).append(id_)
+        return out
+
+    @cached_property
+    def _title_arrays(self) -> t.Dict[str, t.Tuple[np.ndarray, np.ndarray]]:
+        """
+        markerTitle -> (ids, cvAutoTrack positions) as numpy arrays, for vectorized radius queries.
+        """
+        out = {}
+        for title, ids in self.index_title.items():
+            positions = np.array([self.cvat_position[id_] for id_ in ids], dtype=float).reshape(-1, 2)
+            out[title] = (np.array(ids, dtype=np.int64), positions)
+        return out
+
+    def _filter_area(self, ids: t.Iterable[int], area_list=None) -> t.List[int]:
+        if area_list is None:
+            return list(ids)
+        if not isinstance(area_list, (set, frozenset, range)):
+            area_list = set(area_list)
+        point_area = self.point_area
+        return [id_ for id_ in ids if point_area.get(id_) in area_list]
+
+    def query_title(self, marker_title: str, area_list=None) -> t.List[int]:
+        """
+        Args:
+            marker_title: Exact markerTitle.
+            area_list: Iterable of areaId to keep. None to keep all.
+
+        Returns:
+            list[int]: Point ids, in the same order as `data`.
+        """
+        return self._filter_area(self.index_title.get(marker_title, []), area_list=area_list)
+
+    def query_radius(self, position, radius: float, marker_title: str = None, area_list=None) -> t.List[int]:
+        """
+        Find points within `radius` of `position`.
+
+        Args:
+            position: (x, y) in cvAutoTrack coordinates.
+            radius: Distance in cvAutoTrack units, exclusive.
+            marker_title: Exact markerTitle. None to query all points.
+            area_list: Iterable of areaId to keep. None to keep all.
+
+        Returns:
+            list[int]: Point ids.
+        """
+        x, y = float(position[0]), float(position[1])
+        if marker_title is not None:
+            ids, positions = self._title_arrays.get(marker_title, (None, None))
+            if ids is None or not len(ids):
+                return []
+            dist = np.hypot(positions[:, 0] - x, positions[:, 1] - y)
+            return self._filter_area(ids[dist < radius].tolist(), area_list=area_list)
+
+        size = self.GRID_SIZE
+        x1, x2 = int((x - radius) // size), int((x + radius) // size)
+        y1, y2 = int((y - radius) // size), int((y + radius) // size)
+        cvat_position = self.cvat_position
+        out = []
+        for cx in range(x1, x2 + 1):
+            for cy in range(y1, y2 + 1):
+                for id_ in self.index_grid.get((cx, cy), []):
+                    px, py = cvat_position[id_]
+                    if (px - x) ** 2 + (py - y) ** 2 < radius ** 2:
+                        out.append(id_)
+        return self._filter_area(out, area_list=area_list)
+
     DICT_AREA_ID = {
         1: MapConverter.REGION_Liyue,
         2: MapConverter.REGION_Liyue,
@@ -4,6 +4,7 @@ import gimapdev as gimap
 import matplotlib.pyplot as plt
 from matplotlib.offsetbox import OffsetImage, AnnotationBbox
 from source.map.extractor.convert import MapConverter
+from source.teyvat_move.tlpp_binary import load_tlpp
 
 import matplotlib.image as mpimg
 
@@ -206,7 +207,7 @@ class TianLiNavigatorDev(TianliNavigator):
             self.draw_navigation_in_gimap()
 
     def get_path_file(self, path_file_name: str):
-        return load_json(path_file_name + ".json", "assets\\TeyvatMovePath")
+        return load_tlpp(path_file_name)
 
     def analyze_path(self, filename):
         """
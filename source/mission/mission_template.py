@@ -1,4 +1,5 @@
 from source.teyvat_move import teyvat_move_flow_upgrade
+from source.teyvat_move.tlpp_binary import load_tlpp
 from source.util import *
 from source.flow import collector_flow_upgrade
 from source.common.base_threading import BaseThreading
@@ -133,7 +134,7 @@ class MissionExecutor(BaseThreading):
             return ERR_PASS
     
     def get_path_file(self, path_file_name:str):
-        return load_json(path_file_name+".json","assets\\TeyvatMovePath")
+        return load_tlpp(path_file_name)
     
     def _detect_fight_if_needed(self):
         if self.fight_if_needed:
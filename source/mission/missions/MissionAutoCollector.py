@@ -2,6 +2,7 @@ from source.util import *
 from source.flow.utils import flow_state as ST
 from source.interaction.minimap_tracker import tracker
 from source.funclib import collector_lib
+from source.funclib.collection_log_store import collection_log_store
 import datetime
 from source.ui.ui import ui_control
 import source.ui.page as UIPage
@@ -59,18 +60,15 @@ class MissionMain(MissionExecutor):
             self.collected_id[self.collector_name] = []
             save_json(self.collected_id, "collected.json", default_path="config\\auto_collector", sort_keys=False)
 
-        if not os.path.exists(os.path.join(ROOT_PATH, "config\\auto_collector", "collection_log.json")):
-            save_json({}, os.path.join(ROOT_PATH, "config\\auto_collector", "collection_log.json"))
-        self.collection_log = load_json("collection_log.json", folder_path="config\\auto_collector", auto_create=True)
+        collection_log_store.load()
         
         self.collector_posi_dict = []
         self.current_position = tracker.get_position()
         self.last_collection_posi = [9999,9999]
         # collector_lib.generate_masked_col_from_log()
         collector_lib.generate_collected_from_log()
-        collector_lib.generate_col_succ_rate_from_log()
+        self.collection_details = collector_lib.generate_col_succ_rate_from_log()
         logger.debug(f"generate collection_id_details succ")
-        self.collection_details = load_json("collection_id_details.json", "config\\auto_collector", auto_create=True)
         
         
         self.collector_posi_dict = collector_lib.load_items_position(self.collector_name, blacklist_id=self.shielded_id)
@@ -78,7 +76,6 @@ class MissionMain(MissionExecutor):
         ui_control.ui_goto(UIPage.page_main)
         tracker.while_until_no_excessive_error()
         self.current_position = tracker.get_position()
-        self.collection_details = load_json("collection_id_details.json", "config\\auto_collector", auto_create=True)
         self.collector_posi_dict.sort(key=self.sort_by_distance_and_succrate)
         # logger.info("switch Flow to: BEFORE_MOVETO_COLLECTOR")
         # self.current_state = ST.BEFORE_MOVETO_COLLECTOR
@@ -111,22 +108,16 @@ class MissionMain(MissionExecutor):
             break
     
     def _set_collected_id(self):
-        self.collected_id[self.collector_name].append(self.collector_posi_dict[self.collector_i]["id"])
-        save_json(self.collected_id, "collected.json", default_path="config\\auto_collector", sort_keys=False)
+        col_id = self.collector_posi_dict[self.collector_i]["id"]
+        self.collected_id[self.collector_name].append(col_id)
+        collection_log_store.add_collected(self.collector_name, col_id)
         
     
     def _add_logs(self,x):
-        picked_list = []
-        a = self.collection_log.setdefault(self.collector_name, [])
         picked_list = self.picked_list.copy()
         if not picked_list:
             picked_list.append('None')
-        a.append({"time":str(datetime.datetime.now()),
-                  "id": self.collection_id,
-                  "error_code": x,
-                  "picked item": picked_list})
-        self.collection_log[self.collector_name] = a
-        save_json(self.collection_log, "collection_log.json", default_path="config\\auto_collector")
+        collection_log_store.add_log(self.collector_name, self.collection_id, x, picked_list)
         self.refresh_picked_list()
         self.PUO.reset_pickup_item_list()
     
@@ -168,6 +159,7 @@ class MissionMain(MissionExecutor):
 
             if not self._add_collection_i():
                 break
+        collection_log_store.flush()
         # self.start_pickup()
         # self.move_along("Crystalfly16786174406", is_tp=True)
         # self.move_along("Crystalfly167861751483", is_tp=True)
@@ -0,0 +1,63 @@
+"""
+Windows-only modules for the simulator on other platforms.
+
+The bot imports pywin32, pyautogui and ctypes.windll at module level. The simulator replaces every game
+window interaction (itt, genshin_map), so on Linux and macOS these modules are only needed to import.
+`install_windows_stubs()` registers a stub for each one that cannot be imported, before `source.util`.
+Every attribute of a stub is a stub, and every call returns 0 (no window, no handle).
+
+This module must not import source.util.
+"""
+import ctypes
+import importlib
+import sys
+import types
+
+WINDOWS_MODULES = ['win32api', 'win32con', 'win32gui', 'win32print', 'win32process', 'win32ui', 'pywintypes',
+                   'pyautogui', 'pydirectinput']
+
+
+class WindowsStub:
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return WindowsStub(f'{self._name}.{name}')
+
+    def __call__(self, *args, **kwargs):
+        return 0
+
+    def __repr__(self):
+        return f'WindowsStub({self._name})'
+
+
+class WindowsStubModule(types.ModuleType):
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return WindowsStub(f'{self.__name__}.{name}')
+
+
+def install_windows_stubs() -> list:
+    """
+    Returns:
+        list: Names of stubbed modules. Empty on Windows.
+    """
+    if sys.platform == 'win32':
+        return []
+    stubbed = []
+    for name in WINDOWS_MODULES:
+        if name in sys.modules:
+            continue
+        try:
+            importlib.import_module(name)
+        except Exception:
+            # pyautogui raises KeyError without a display
+            sys.modules[name] = WindowsStubModule(name)
+            stubbed.append(name)
+    if not hasattr(ctypes, 'windll'):
+        ctypes.windll = WindowsStub('ctypes.windll')
+        stubbed.append('ctypes.windll')
+    return stubbed
@@ -0,0 +1,468 @@
+"""
+Dry-run simulator of missions and TeyvatMove paths, without the game.
+
+Inside a MissionSimulator:
+    itt sends key and mouse actions to a recorder instead of the game window, and captures return a fixed frame.
+    genshin_map reports the position and rotation of a simulated character. It walks towards its rotation
+        while a move key is held, mouse movement turns it, and teleports move it at once.
+    time.time, time.sleep, time.perf_counter and the waits of BaseThreading follow a VirtualClock. It skips ahead
+        `speed` times faster while every thread waits, and runs at real pace while any thread works.
+Screen recognition still runs on the fixed frame. Pass a capture of the main page (4-channel 1080p PNG),
+or a black frame is used and nothing is ever recognized.
+Windows-only modules are stubbed on other platforms, see sim_platform.
+
+Examples:
+    with MissionSimulator(start_position=[2083, -4844], speed=10) as sim:
+        sim.run_path(path_dict)
+    print(sim.report())
+
+    python -m source.mission.simulator MissionQingXin2 --frame main_page.png
+    python -m source.mission.simulator path/to/tlpp.json --speed 20
+"""
+import argparse
+import json
+import math
+import threading
+
+from source.mission.sim_platform import install_windows_stubs
+
+install_windows_stubs()
+from source.util import *
+
+# TianLi units per second while running.
+SIM_MOVE_SPEED = 6.
+# Mouse pixels per degree of view, same as movement.angle2movex.
+SIM_PX_PER_DEGREE = 10.
+# Move keys, relative to rotation. Rotation is 0 at north and 90 at west, same as movement.calculate_posi2degree.
+SIM_MOVE_KEYS = {'w': 0, 's': 180, 'a': 90, 'd': -90}
+# Max real seconds of one wait, waiting threads check the clock rate at this interval.
+SIM_WAIT_SLICE = 0.01
+
+# Wall clock of the harness, not affected by VirtualClock.patch
+_wall_clock = time.perf_counter
+
+
+class VirtualClock:
+    def __init__(self, speed=10.):
+        """
+        Virtual time runs at real pace while any simulated thread works, and `speed` times faster while all of
+        them wait. Recognition and OCR take their real time, so the character does not move further during them.
+
+        A thread joins the simulation on its first wait. Waits are time.sleep and the BaseThreading waits
+        patched by MissionSimulator. A thread blocked elsewhere (locks, queues) counts as working.
+
+        Args:
+            speed: Virtual seconds per real second while all threads wait.
+        """
+        self.speed = speed
+        self._time = time.time
+        self._perf_counter = time.perf_counter
+        self._lock = threading.Condition()
+        self._threads = set()
+        self._waiting = set()
+        self._rate = 1.
+        self._base_real = self._perf_counter()
+        self._base_virtual = 0.
+        self._origin_time = self._time()
+        self._origin_perf = self._perf_counter()
+
+    def _elapsed(self) -> float:
+        return self._base_virtual + (self._perf_counter() - self._base_real) * self._rate
+
+    def _rebase(self):
+        # Called with _lock held when a thread starts or stops waiting
+        now = self._perf_counter()
+        self._base_virtual += (now - self._base_real) * self._rate
+        self._base_real = now
+        self._threads = {thread for thread in self._threads if thread.is_alive()}
+        self._rate = self.speed if self._threads and self._threads <= self._waiting else 1.
+        self._lock.notify_all()
+
+    def elapsed(self) -> float:
+        """Virtual seconds since start."""
+        with self._lock:
+            return self._elapsed()
+
+    def time(self) -> float:
+        return self._origin_time + self.elapsed()
+
+    def perf_counter(self) -> float:
+        return self._origin_perf + self.elapsed()
+
+    def wait_for(self, predicate, timeout=None, condition: threading.Condition = None):
+        """
+        Same as Condition.wait_for, but timeout is in virtual seconds.
+
+        Args:
+            predicate:
+            timeout: Virtual seconds, None to wait until predicate is True.
+            condition: Held by the caller and notified when predicate may change. None to wait on the clock.
+
+        Returns:
+            The last result of predicate.
+        """
+        thread = threading.current_thread()
+        with self._lock:
+            end = None if timeout is None else self._elapsed() + timeout
+            self._threads.add(thread)
+            self._waiting.add(thread)
+            self._rebase()
+        try:
+            while 1:
+                result = predicate()
+                if result:
+                    return result
+                with self._lock:
+                    if end is None:
+                        wait = SIM_WAIT_SLICE
+                    else:
+                        remaining = end - self._elapsed()
+                        if remaining <= 0:
+                            return result
+                        wait = min(remaining / self._rate, SIM_WAIT_SLICE)
+                    if condition is None:
+                        # Woken at once when the rate changes
+                        self._lock.wait(wait)
+                        continue
+                condition.wait(wait)
+        finally:
+            with self._lock:
+                self._waiting.discard(thread)
+                self._rebase()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.wait_for(lambda: False, timeout=seconds)
+
+    def start(self):
+        with self._lock:
+            self._base_real = self._perf_counter()
+            self._base_virtual = 0.
+            self._origin_time = self._time()
+            self._origin_perf = self._perf_counter()
+
+    def patch(self) -> list:
+        """
+        Returns:
+            list: (module, name, original) to restore.
+        """
+        names = ('time', 'sleep', 'perf_counter', 'monotonic')
+        patched = [(time, name, getattr(time, name)) for name in names]
+        time.time, time.sleep, time.perf_counter, time.monotonic = self.time, self.sleep, self.perf_counter, self.perf_counter
+        return patched
+
+
+class SimulatedCharacter:
+    def __init__(self, clock: VirtualClock, position, rotation=0., move_speed=SIM_MOVE_SPEED):
+        """
+        Args:
+            clock:
+            position: TianLi position.
+            rotation: Degree, see SIM_MOVE_KEYS.
+            move_speed: TianLi units per virtual second.
+        """
+        self.clock = clock
+        self.position = np.array(position, dtype=float)
+        self.rotation = float(rotation)
+        self.move_speed = move_speed
+        self.keys = set()
+        self.distance = 0.
+        self._last_time = clock.time()
+        self._lock = threading.Lock()
+
+    def _update(self):
+        now = self.clock.time()
+        dt = now - self._last_time
+        self._last_time = now
+        if dt <= 0:
+            return
+        dx = dy = 0.
+        for key in self.keys:
+            if key in SIM_MOVE_KEYS:
+                angle = math.radians(self.rotation + SIM_MOVE_KEYS[key])
+                dx -= math.sin(angle)
+                dy -= math.cos(angle)
+        norm = math.hypot(dx, dy)
+        if norm > 1e-6:
+            step = self.move_speed * dt
+            self.position += [dx / norm * step, dy / norm * step]
+            self.distance += step
+
+    def key_down(self, key):
+        with self._lock:
+            self._update()
+            self.keys.add(key)
+
+    def key_up(self, key):
+        with self._lock:
+            self._update()
+            self.keys.discard(key)
+
+    def turn(self, px):
+        """Mouse moved right by px."""
+        with self._lock:
+            self._update()
+            rotation = self.rotation - px / SIM_PX_PER_DEGREE
+            self.rotation = (rotation + 180) % 360 - 180
+
+    def teleport(self, position):
+        with self._lock:
+            self._update()
+            self.keys.clear()
+            self.position = np.array(position, dtype=float)
+
+    def get_position(self) -> list:
+        with self._lock:
+            self._update()
+            return list(self.position)
+
+    def get_rotation(self) -> float:
+        with self._lock:
+            return self.rotation
+
+
+class SimAction(t.NamedTuple):
+    time: float
+    """Virtual seconds since start"""
+    name: str
+    args: tuple
+
+
+class RecordingExecutor:
+    """Replaces InteractionNormal/InteractionDm of itt."""
+
+    def __init__(self, clock: VirtualClock, character: SimulatedCharacter):
+        self.clock = clock
+        self.character = character
+        self.actions: t.List[SimAction] = []
+
+    def _record(self, name, *args):
+        self.actions.append(SimAction(round(self.clock.elapsed(), 3), name, args))
+
+    def left_click(self):
+        self._record('left_click')
+
+    def left_down(self):
+        self._record('left_down')
+
+    def left_up(self):
+        self._record('left_up')
+
+    def left_double_click(self, dt=0.05):
+        self._record('left_double_click')
+
+    def right_click(self):
+        self._record('right_click')
+
+    def middle_click(self):
+        self._record('middle_click')
+
+    def key_down(self, key):
+        self._record('key_down', key)
+        self.character.key_down(key)
+
+    def key_up(self, key):
+        self._record('key_up', key)
+        self.character.key_up(key)
+
+    def key_press(self, key):
+        self._record('key_press', key)
+
+    def move_to(self, x: int, y: int, relative=False, isBorderlessWindow=False):
+        self._record('move_to', x, y, relative)
+        if relative:
+            self.character.turn(x)
+
+
+class FixedCapture:
+    """Replaces the capture object of itt."""
+
+    def __init__(self, frame: np.ndarray):
+        self.frame = frame
+
+    def capture(self, recapture_limit=0, **kwargs):
+        # Callers may draw on captures
+        return self.frame.copy()
+
+
+class MissionSimulator:
+    def __init__(self, start_position=(0, 0), rotation=0., speed=10., move_speed=SIM_MOVE_SPEED, frame=None):
+        """
+        Args:
+            start_position: TianLi position.
+            rotation:
+            speed: Virtual seconds per real second while all threads wait, see VirtualClock.
+            move_speed: TianLi units per virtual second.
+            frame: Path or BGRA image returned by every capture. None for a black frame.
+        """
+        if isinstance(frame, str):
+            frame = cv2.imdecode(np.fromfile(frame, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        if frame is None:
+            frame = np.zeros((1080, 1920, 4), dtype=np.uint8)
+        self.clock = VirtualClock(speed)
+        self.character = SimulatedCharacter(self.clock, start_position, rotation=rotation, move_speed=move_speed)
+        self.executor = RecordingExecutor(self.clock, self.character)
+        self.capture = FixedCapture(frame)
+        self.stages: t.Dict[str, t.List[float]] = {}
+        self._patched = []
+        self._wall_start = 0.
+        self._wall_time = 0.
+        self._virtual_time = 0.
+
+    def _timed(self, stage, func):
+        record = self.stages.setdefault(stage, [0, 0.])
+
+        def wrapper(*args, **kwargs):
+            pt = _wall_clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record[0] += 1
+                record[1] += _wall_clock() - pt
+        return wrapper
+
+    def _patch(self, obj, name, value):
+        # Methods are patched on instances and deleted on exit, attributes are set back.
+        self._patched.append((obj, name, vars(obj).get(name), name in vars(obj)))
+        setattr(obj, name, value)
+
+    def _bigmap_tp(self, posi, *args, **kwargs):
+        from source.map.position.position import TianLiPosition
+        self.character.teleport(posi)
+        return TianLiPosition(list(posi))
+
+    def _get_rotation(self):
+        from source.map.map import genshin_map
+        genshin_map.rotation = self.character.get_rotation()
+        return genshin_map.rotation
+
+    def _patch_threading(self):
+        # BaseThreading waits on a Condition with real timeouts, wait on the virtual clock instead
+        from source.common.base_threading import BaseThreading
+        clock = self.clock
+
+        def sleep_unless_paused(obj, seconds):
+            if seconds <= 0:
+                return not (obj._pause_flag or obj._stop_flag)
+            with obj._state_condition:
+                return not clock.wait_for(lambda: obj._pause_flag or obj._stop_flag, seconds, obj._state_condition)
+
+        def wait_until_continue(obj, timeout=None):
+            with obj._state_condition:
+                clock.wait_for(lambda: not obj._pause_flag or obj._stop_flag, timeout, obj._state_condition)
+                return not obj._pause_flag and not obj._stop_flag
+
+        self._patch(BaseThreading, 'sleep_unless_paused', sleep_unless_paused)
+        self._patch(BaseThreading, 'wait_until_continue', wait_until_continue)
+
+    def __enter__(self):
+        # Game modules are imported here, so the simulation classes can be used without them
+        from source.interaction import interaction_core
+        from source.interaction.interaction_core import itt
+        from source.map.map import genshin_map
+        for module, name, original in self.clock.patch():
+            self._patched.append((module, name, original, True))
+        self._patch_threading()
+        self.clock.start()
+        self.character._last_time = self.clock.time()
+        self._patch(itt, 'itt_exec', self.executor)
+        self._patch(itt, 'capture_obj', self.capture)
+        self._patch(itt, 'capture', self._timed('capture', itt.capture))
+        # The game window is always active
+        self._patch(interaction_core, 'get_active_window_process_name', lambda: PROCESS_NAME[0])
+        self._patch(genshin_map, 'get_position', self._timed('position', lambda *args, **kwargs: self.character.get_position()))
+        self._patch(genshin_map, 'get_rotation', self._timed('rotation', self._get_rotation))
+        self._patch(genshin_map, 'get_direction', self._timed('rotation', self._get_rotation))
+        self._patch(genshin_map, 'reinit_smallmap', lambda *args, **kwargs: None)
+        self._patch(genshin_map, 'bigmap_tp', self._timed('teleport', self._bigmap_tp))
+        for name in ('key_down', 'key_up', 'key_press', 'move_to', 'left_click'):
+            self._patch(self.executor, name, self._timed('input', getattr(self.executor, name)))
+        self._wall_start = _wall_clock()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._virtual_time = self.clock.elapsed()
+        self._wall_time = _wall_clock() - self._wall_start
+        for obj, name, original, is_own in reversed(self._patched):
+            if is_own:
+                setattr(obj, name, original)
+            else:
+                delattr(obj, name)
+        self._patched = []
+
+    def run_mission(self, mission_name):
+        """
+        Run a mission of missions/mission_index in the current thread.
+        """
+        from source.mission import mission_manager
+        mission = mission_manager.MI.get_mission_object(mission_name)
+        if mission is None:
+            raise ValueError(f'Cannot find mission: {mission_name}')
+        mission.continue_threading(ignore_warning=True)
+        try:
+            mission.loop()
+        finally:
+            mission.stop_threading()
+
+    def run_path(self, path_dict: dict, timeout=600):
+        """
+        Follow a TLPP with TeyvatMoveFlowController, from the current position.
+
+        Args:
+            path_dict: TLPP.
+            timeout: Virtual seconds.
+        """
+        from source.teyvat_move.teyvat_move_flow_upgrade import TeyvatMoveFlowController
+        tmcf = TeyvatMoveFlowController()
+        tmcf.setDaemon(True)
+        tmcf.pause_threading()
+        tmcf.start()
+        tmcf.set_parameter(MODE="PATH", path_dict=path_dict, is_tp=False)
+        tmcf.start_flow()
+        start = self.clock.elapsed()
+        while not tmcf.pause_threading_flag:
+            time.sleep(0.2)
+            if self.clock.elapsed() - start > timeout:
+                logger.warning(f'simulated path timeout after {timeout}s')
+                break
+        tmcf.stop_threading()
+        return tmcf.get_last_err_code()
+
+    def report(self) -> dict:
+        virtual_time = self._virtual_time if not self._patched else self.clock.elapsed()
+        wall_time = self._wall_time if not self._patched else _wall_clock() - self._wall_start
+        actions = {}
+        for action in self.executor.actions:
+            actions[action.name] = actions.get(action.name, 0) + 1
+        return {
+            'virtual_time_s': round(virtual_time, 2),
+            'wall_time_s': round(wall_time, 2),
+            'speedup': round(virtual_time / wall_time, 2) if wall_time else 0.,
+            'actions': actions,
+            'distance': round(self.character.distance, 2),
+            'final_position': [round(x, 2) for x in self.character.position],
+            'stages': {stage: {'count': count, 'wall_ms': round(cost * 1000, 2)}
+                       for stage, (count, cost) in self.stages.items()},
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Dry-run a mission or a TLPP file without the game.')
+    parser.add_argument('target', help='Mission name, or path of a TLPP json')
+    parser.add_argument('--position', type=float, nargs=2, default=None, help='Start position, TianLi')
+    parser.add_argument('--speed', type=float, default=10.)
+    parser.add_argument('--move-speed', type=float, default=SIM_MOVE_SPEED)
+    parser.add_argument('--frame', default=None, help='4-channel 1080p capture returned by itt.capture')
+    args = parser.parse_args()
+
+    path_dict = None
+    if args.target.endswith('.json'):
+        with open(args.target, 'r', encoding='utf-8') as f:
+            path_dict = json.load(f)
+    position = args.position or (path_dict['start_position'] if path_dict else [0, 0])
+    with MissionSimulator(position, speed=args.speed, move_speed=args.move_speed, frame=args.frame) as sim:
+        if path_dict:
+            sim.run_path(path_dict)
+        else:
+            sim.run_mission(args.target)
+    logger.info(f'simulation: {sim.report()}')
@@ -47,20 +47,15 @@ class MissionMiner(MissionExecutor):
         Returns:
             _type_: _description_
         """
-        cap = self.itt.capture(jpgmode=FOUR_CHANNELS)
-        orsrc = cap.copy()
-        imsrc = combat_lib.get_mineral_blood_bar_img(cap)
-        _, imsrc2 = cv2.threshold(imsrc, 1, 255, cv2.THRESH_BINARY)
-        # cv2.imshow('123',retimg)
-        # cv2.waitKey(100)
+        state = combat_lib.get_combat_frame_state(max_age=combat_lib.COMBAT_STATE_MAX_AGE)
+        bars = state.blood_bars[combat_lib.MINERAL_BAR]
         if ret_mode == 1: # 返回点坐标
-            ret_point = img_manager.get_rect(imsrc2, orsrc, ret_mode=2)
-            return ret_point
+            return bars.centers
         elif ret_mode == 2: # 返回高度差
-            ret_rect = img_manager.get_rect(imsrc2, orsrc, ret_mode=0)
-            if ret_rect is None:
+            if not bars.rects:
                 return None
-            return ret_rect[2] - ret_rect[0]
+            x1, y1, x2, y2 = bars.rects[0]
+            return y2 - y1
 
     def _lock_on_enemy(self):
         ret_points = self.get_enemy_feature() # 获得敌方血条坐标
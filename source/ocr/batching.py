@@ -0,0 +1,69 @@
+"""
+Batched recognition of single-line crops, shared by OcrService and the offline benchmark.
+
+Recognizers pad every crop of a batch to the widest one, which changes results. So crops are grouped by a key,
+the width of the crop after resizing to recognizer height, and only crops of one group are batched together.
+
+Only depends on numpy, so source.ocr.benchmark can use it without source.util.
+"""
+import typing as t
+
+import numpy as np
+
+
+def pponnxcr_group_key(recognizer, image) -> int:
+    """
+    Width of the crop in pponnxcr input. Crops of the same width are padded to the same width as alone.
+
+    Args:
+        recognizer: pponnxcr TextRecognizer.
+        image: Single-line crop.
+    """
+    height = recognizer.rec_image_shape[1]
+    return int(height * image.shape[1] / image.shape[0])
+
+
+def run_pponnxcr_batch(recognizer, image_list) -> t.List[t.Tuple[str, float]]:
+    """
+    Recognize crops of the same group in one inference, same preprocessing as pponnxcr TextRecognizer.
+
+    Args:
+        recognizer: pponnxcr TextRecognizer.
+        image_list: Crops with the same `pponnxcr_group_key`.
+    """
+    max_wh_ratio = max(image.shape[1] / image.shape[0] for image in image_list)
+    norm_img_batch = np.concatenate([
+        recognizer.resize_norm_img(image, max_wh_ratio)[None] for image in image_list
+    ])
+    outputs = recognizer.predictor.run(recognizer.output_tensors, {recognizer.input_tensor.name: norm_img_batch})
+    return [tuple(res) for res in recognizer.postprocess_op(outputs[0])]
+
+
+def group_by_key(image_list, group_key) -> t.Dict[t.Any, t.List[int]]:
+    """
+    Returns:
+        dict: {key: [index in image_list, ...]}, in order of first appearance.
+    """
+    groups = {}
+    for index, image in enumerate(image_list):
+        groups.setdefault(group_key(image), []).append(index)
+    return groups
+
+
+def run_grouped(image_list, group_key, run_batch) -> list:
+    """
+    Run one inference per group, as the OcrService worker does with one collected batch.
+
+    Args:
+        image_list: Crops.
+        group_key: Function of a crop.
+        run_batch: Function of a list of crops with the same key, returns one result per crop.
+
+    Returns:
+        list: Results in order of image_list.
+    """
+    results = [None] * len(image_list)
+    for indexes in group_by_key(image_list, group_key).values():
+        for index, result in zip(indexes, run_batch([image_list[i] for i in indexes])):
+            results[index] = result
+    return results
@@ -0,0 +1,274 @@
+"""
+Offline OCR accuracy and latency benchmark.
+
+It only depends on numpy, opencv, pponnxcr and optionally fastdeploy, so it runs on CPU-only Linux
+without the game, Windows APIs or GIA config.
+
+Corpus layout:
+    assets/ocr_benchmark/labels.json
+    assets/ocr_benchmark/<category>/<name>.png
+
+labels.json is a list of samples:
+    {"image": "pickup/0001.png", "text": "甜甜花", "category": "pickup", "lang": "zh_CN", "line_count": 1}
+Categories used by the bot: pickup, commission, hp, team_name, domain_reward.
+Use `add_sample()` to save a crop from a running bot into the corpus.
+
+Backends:
+    onnx: pponnxcr TextSystem, used by source.ocr
+    complete: fastdeploy PPOCRv3 of the sample language, `ocr` in source.api.pdocr_complete
+    light: fastdeploy PPOCRv3 of en_US, `ocr_light` in source.api.pdocr_light
+Paths:
+    det: full text detection + recognition
+    rec: recognition only, the crop is split into `line_count` rows, grouped and batched as in OcrService
+
+Examples:
+    python -m source.ocr.benchmark --backends onnx complete --repeat 5
+    python -m source.ocr.benchmark --batch-sizes 1 4 16 --output benchmark.json
+"""
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from source.common.utils import edit_distance
+from source.ocr.batching import pponnxcr_group_key, run_grouped, run_pponnxcr_batch
+
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+CORPUS_PATH = os.path.join(ROOT_PATH, 'assets', 'ocr_benchmark')
+LABELS_FILE = 'labels.json'
+
+DIC_LANG_TO_ONNX_MODEL = {
+    'zh_CN': 'zhs',
+    'en_US': 'en',
+}
+
+
+class Sample:
+    def __init__(self, image: np.ndarray, text: str, category: str, lang: str, line_count=1, name=''):
+        self.image = image
+        self.text = text
+        self.category = category
+        self.lang = lang
+        self.line_count = line_count
+        self.name = name
+
+
+def load_corpus(path=CORPUS_PATH, lang=None, categories=None) -> list:
+    with open(os.path.join(path, LABELS_FILE), 'r', encoding='utf-8') as f:
+        labels = json.load(f)
+    samples = []
+    for label in labels:
+        if lang is not None and label.get('lang', 'zh_CN') != lang:
+            continue
+        if categories and label['category'] not in categories:
+            continue
+        image = cv2.imdecode(np.fromfile(os.path.join(path, label['image']), dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            print(f'Unable to read {label["image"]}, skip')
+            continue
+        samples.append(Sample(image, label['text'], label['category'], label.get('lang', 'zh_CN'),
+                              line_count=label.get('line_count', 1), name=label['image']))
+    return samples
+
+
+def add_sample(image: np.ndarray, text: str, category: str, lang='zh_CN', line_count=1, path=CORPUS_PATH):
+    """
+    Save a crop and its label into the corpus.
+    """
+    os.makedirs(os.path.join(path, category), exist_ok=True)
+    labels_path = os.path.join(path, LABELS_FILE)
+    labels = []
+    if os.path.exists(labels_path):
+        with open(labels_path, 'r', encoding='utf-8') as f:
+            labels = json.load(f)
+    name = f'{category}/{int(time.time() * 1000)}.png'
+    cv2.imencode('.png', image)[1].tofile(os.path.join(path, name))
+    labels.append({'image': name, 'text': text, 'category': category, 'lang': lang, 'line_count': line_count})
+    with open(labels_path, 'w', encoding='utf-8') as f:
+        json.dump(labels, f, ensure_ascii=False, indent=2)
+
+
+def split_rows(image: np.ndarray, line_count: int) -> list:
+    h = image.shape[0]
+    return [image[h * i // line_count: h * (i + 1) // line_count] for i in range(line_count)]
+
+
+def char_accuracy(predict: str, label: str) -> float:
+    predict = predict.replace(' ', '')
+    label = label.replace(' ', '')
+    if not label:
+        return float(not predict)
+    return max(1 - edit_distance(predict, label) / len(label), 0.)
+
+
+class OnnxBackend:
+    name = 'onnx'
+
+    def __init__(self, lang):
+        from pponnxcr import TextSystem
+        self.lang = lang
+        self.model = TextSystem(DIC_LANG_TO_ONNX_MODEL.get(lang, lang))
+
+    def detect(self, image) -> str:
+        return ''.join(result.ocr_text for result in self.model.detect_and_ocr(image))
+
+    def recognize_batch(self, rows) -> list:
+        # Grouped and batched as OcrService of get_ocr_service
+        recognizer = self.model.text_recognizer
+        results = run_grouped(rows, lambda row: pponnxcr_group_key(recognizer, row),
+                              lambda batch: run_pponnxcr_batch(recognizer, batch))
+        return [text for text, score in results]
+
+
+class FastDeployBackend:
+    def __init__(self, name, lang):
+        import fastdeploy
+        self.name = name
+        self.lang = lang
+        path = os.path.join(ROOT_PATH, 'assets', 'PPOCRModels', lang)
+        self.det_model = fastdeploy.vision.ocr.DBDetector(
+            model_file=os.path.join(path, 'pddet', 'inference.pdmodel'),
+            params_file=os.path.join(path, 'pddet', 'inference.pdiparams'))
+        self.rec_model = fastdeploy.vision.ocr.Recognizer(
+            model_file=os.path.join(path, 'pdrec', 'inference.pdmodel'),
+            params_file=os.path.join(path, 'pdrec', 'inference.pdiparams'),
+            label_path=os.path.join(path, 'rec', 'keys.txt'))
+        self.model = fastdeploy.vision.ocr.PPOCRv3(self.det_model, None, self.rec_model)
+
+    def detect(self, image) -> str:
+        return ''.join(self.model.predict(cv2.cvtColor(image, cv2.COLOR_RGB2BGR)).text)
+
+    def recognize_batch(self, rows) -> list:
+        # Grouped by crop width as PaddleOcrFastDeploy.service
+        rows = [cv2.cvtColor(row, cv2.COLOR_RGB2BGR) for row in rows]
+        return run_grouped(rows, lambda row: row.shape[1], lambda batch: list(self.rec_model.batch_predict(batch).text))
+
+
+def create_backend(name, lang):
+    if name == 'onnx':
+        return OnnxBackend(lang)
+    if name == 'complete':
+        return FastDeployBackend(name, lang)
+    if name == 'light':
+        return FastDeployBackend(name, 'en_US')
+    raise ValueError(f'Unknown backend: {name}')
+
+
+def percentile_ms(times, q) -> float:
+    return round(float(np.percentile(times, q)) * 1000, 2) if times else 0.
+
+
+def summarize(times, accuracies, exact) -> dict:
+    return {
+        'samples': len(accuracies),
+        'p50_ms': percentile_ms(times, 50),
+        'p90_ms': percentile_ms(times, 90),
+        'p99_ms': percentile_ms(times, 99),
+        'char_accuracy': round(float(np.mean(accuracies)), 4) if accuracies else 0.,
+        'exact_rate': round(float(np.mean(exact)), 4) if exact else 0.,
+    }
+
+
+def run_path(backend, path, samples, repeat=3) -> dict:
+    """
+    Returns:
+        dict: {category: summary}, and 'all' for all samples.
+    """
+    records = {}
+    for sample in samples:
+        if path == 'det':
+            run = lambda: backend.detect(sample.image)
+        else:
+            rows = split_rows(sample.image, sample.line_count)
+            run = lambda: ''.join(backend.recognize_batch(rows))
+        # Warm up, also the result for accuracy
+        predict = run()
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        for key in (sample.category, 'all'):
+            record = records.setdefault(key, ([], [], []))
+            record[0].extend(times)
+            record[1].append(char_accuracy(predict, sample.text))
+            record[2].append(predict.replace(' ', '') == sample.text.replace(' ', ''))
+    return {key: summarize(*record) for key, record in records.items()}
+
+
+def run_batch_scaling(backend, samples, batch_sizes=(1, 2, 4, 8, 16), repeat=3) -> dict:
+    """
+    Crops of a batch are grouped as in OcrService, so a batch may run as several inferences.
+
+    Returns:
+        dict: {batch_size: ms per crop} of the rec path.
+    """
+    rows = [row for sample in samples for row in split_rows(sample.image, sample.line_count)]
+    result = {}
+    for batch_size in batch_sizes:
+        batch = [rows[i % len(rows)] for i in range(batch_size)]
+        backend.recognize_batch(batch)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            backend.recognize_batch(batch)
+        result[batch_size] = round((time.perf_counter() - start) / repeat / batch_size * 1000, 3)
+    return result
+
+
+def run_benchmark(corpus=CORPUS_PATH, backends=('onnx', 'complete', 'light'), lang='zh_CN',
+                  categories=None, repeat=3, batch_sizes=(1, 2, 4, 8, 16)) -> dict:
+    report = {}
+    for backend_name in backends:
+        try:
+            backend = create_backend(backend_name, lang)
+        except Exception as e:
+            print(f'Backend {backend_name} unavailable: {e}')
+            continue
+        samples = load_corpus(corpus, lang=backend.lang, categories=categories)
+        if not samples:
+            print(f'No samples for backend {backend_name} ({backend.lang})')
+            continue
+        report[backend_name] = {
+            'lang': backend.lang,
+            'det': run_path(backend, 'det', samples, repeat=repeat),
+            'rec': run_path(backend, 'rec', samples, repeat=repeat),
+            'batch_scaling': run_batch_scaling(backend, samples, batch_sizes=batch_sizes, repeat=repeat),
+        }
+    return report
+
+
+def print_report(report: dict):
+    head = f'{"backend":<10}{"path":<6}{"category":<15}{"n":>5}{"p50":>9}{"p90":>9}{"p99":>9}{"char_acc":>10}{"exact":>8}'
+    print(head)
+    print('-' * len(head))
+    for backend_name, result in report.items():
+        for path in ('det', 'rec'):
+            for category, s in result[path].items():
+                print(f'{backend_name:<10}{path:<6}{category:<15}{s["samples"]:>5}{s["p50_ms"]:>9}{s["p90_ms"]:>9}'
+                      f'{s["p99_ms"]:>9}{s["char_accuracy"]:>10}{s["exact_rate"]:>8}')
+    print()
+    for backend_name, result in report.items():
+        curve = ', '.join(f'{k}: {v}ms' for k, v in result['batch_scaling'].items())
+        print(f'{backend_name} rec ms per crop by batch size: {curve}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='OCR accuracy and latency benchmark')
+    parser.add_argument('--corpus', default=CORPUS_PATH)
+    parser.add_argument('--backends', nargs='+', default=['onnx', 'complete', 'light'])
+    parser.add_argument('--lang', default='zh_CN')
+    parser.add_argument('--categories', nargs='*', default=None)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument('--output', default=None, help='Save report as json')
+    args = parser.parse_args()
+
+    report = run_benchmark(corpus=args.corpus, backends=args.backends, lang=args.lang,
+                           categories=args.categories, repeat=args.repeat, batch_sizes=args.batch_sizes)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,121 @@
+"""
+Content-addressed cache of OCR results.
+
+Key is a hash of the preprocessed crop, so the same prompt on a static screen is recognized once per TTL
+instead of on every loop.
+
+CACHE_EXACT: blake2b over raw pixels. Any pixel change is a miss.
+CACHE_PERCEPTUAL: 64-bit difference hash of a 9x8 grayscale thumbnail. Tolerates small noise,
+    such as compression or a blinking cursor, but may also merge crops that differ in a single small glyph.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from source.util import *
+
+CACHE_OFF = 'off'
+CACHE_EXACT = 'exact'
+CACHE_PERCEPTUAL = 'perceptual'
+
+
+class OcrResultCache:
+    def __init__(self, maxsize=256, ttl=3.0, mode=CACHE_EXACT):
+        """
+        Args:
+            maxsize: Max number of entries, least recently used ones are evicted first.
+            ttl: Seconds an entry stays valid.
+            mode: CACHE_OFF, CACHE_EXACT or CACHE_PERCEPTUAL.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.mode = mode
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != CACHE_OFF and self.maxsize > 0
+
+    @staticmethod
+    def exact_hash(image: np.ndarray) -> str:
+        image = np.ascontiguousarray(image)
+        h = hashlib.blake2b(image.data, digest_size=16)
+        h.update(str((image.shape, image.dtype.str)).encode())
+        return h.hexdigest()
+
+    @staticmethod
+    def perceptual_hash(image: np.ndarray) -> str:
+        if image.ndim == 3:
+            if image.shape[2] == 4:
+                image = cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
+            else:
+                image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        thumb = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = (thumb[:, 1:] > thumb[:, :-1]).flatten()
+        value = int(np.packbits(bits).view('>u8')[0])
+        return f'{image.shape[0]}x{image.shape[1]}:{value:016x}'
+
+    def key(self, image: np.ndarray, namespace='') -> str:
+        if self.mode == CACHE_PERCEPTUAL:
+            return f'{namespace}:{self.perceptual_hash(image)}'
+        return f'{namespace}:{self.exact_hash(image)}'
+
+    def get(self, key):
+        """
+        Returns:
+            tuple: (is_hit, value)
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            created, value = entry
+            if now - created > self.ttl:
+                del self._data[key]
+                self.evictions += 1
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'mode': self.mode,
+                'size': len(self._data),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 3) if total else 0.,
+            }
+
+
+def create_ocr_cache() -> OcrResultCache:
+    """
+    Create a cache with settings from Dev config.
+    """
+    return OcrResultCache(
+        maxsize=GIAconfig.Dev_OcrCacheSize,
+        ttl=GIAconfig.Dev_OcrCacheTTL,
+        mode=GIAconfig.Dev_OcrCacheMode,
+    )
@@ -0,0 +1,224 @@
+"""
+Match OCR lines against many target texts at once.
+
+Targets are normalized and compiled into one Aho-Corasick automaton, so every OCR line is scanned
+once no matter how many targets there are. Lines without an exact hit can fall back to
+edit-distance matching, which tolerates a few wrong characters from OCR.
+
+Examples:
+    matcher = TextMatcher()
+    matcher.add('IcyIssues', '冷冰冰的大麻烦')
+    matcher.add('Emergency', '临危受命')
+    hits = matcher.match(['委托：临危受命', '冷冰冰的大麻'], max_distance=1)
+"""
+from collections import deque
+
+from source.util import *
+from source.api.utils import CONTAIN_MATCHING, ACCURATE_MATCHING
+from source.common.utils import edit_distance
+
+
+def normalize_text(text: str, lang=None) -> str:
+    """
+    Same rules as PaddleOcrFastDeploy._preprocessing_str, plus lowercase.
+    """
+    if lang is None:
+        lang = GLOBAL_LANG
+    if lang == 'en_US':
+        text = text.replace(' ', '').lower()
+    return text
+
+
+class AhoCorasick:
+    def __init__(self, patterns: t.List[str]):
+        """
+        Args:
+            patterns: Index of a pattern in this list is returned on match.
+        """
+        self.goto: t.List[dict] = [{}]
+        self.fail: t.List[int] = [0]
+        self.output: t.List[list] = [[]]
+        self.lengths = [len(p) for p in patterns]
+        for index, pattern in enumerate(patterns):
+            if pattern == '':
+                continue
+            node = 0
+            for char in pattern:
+                if char not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[node][char] = len(self.goto) - 1
+                node = self.goto[node][char]
+            self.output[node].append(index)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fail = self.fail[node]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[child] = self.goto[fail].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def iter_matches(self, text: str):
+        """
+        Yields:
+            tuple[int, int, int]: (pattern index, start, end)
+        """
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            for index in self.output[node]:
+                yield index, i + 1 - self.lengths[index], i + 1
+
+
+class MatchHit(t.NamedTuple):
+    line: int
+    """Index of OCR line"""
+    key: str
+    """Key of the matched target"""
+    text: str
+    """Original text of the matched target"""
+    start: int
+    end: int
+    """Span in the normalized OCR line. (0, 0) for fuzzy hits"""
+    distance: int
+    """0 for exact hits"""
+
+
+class TextMatcher:
+    def __init__(self, lang=None, replace_dict: dict = None):
+        """
+        Args:
+            lang: Used for normalization. If None, use GLOBAL_LANG.
+            replace_dict: Known OCR mistakes, applied to OCR lines before matching.
+        """
+        if lang is None:
+            lang = GLOBAL_LANG
+        self.lang = lang
+        self.replacer = TextReplacer(replace_dict) if replace_dict else None
+        self._targets: t.List[t.Tuple[str, str, str, int]] = []
+        self._automaton = None
+
+    def add(self, key: str, text: str, mode=CONTAIN_MATCHING):
+        """
+        Args:
+            key: Returned in MatchHit.key
+            text: Target text.
+            mode: CONTAIN_MATCHING or ACCURATE_MATCHING.
+        """
+        self._targets.append((key, text, normalize_text(text, self.lang), mode))
+        self._automaton = None
+        return self
+
+    def add_texts(self, texts, mode=CONTAIN_MATCHING):
+        """
+        Args:
+            texts (dict | list): {key: text} or a list of texts which are also keys.
+        """
+        if not isinstance(texts, dict):
+            texts = {text: text for text in texts}
+        for key, text in texts.items():
+            self.add(key, text, mode=mode)
+        return self
+
+    def __len__(self):
+        return len(self._targets)
+
+    @property
+    def automaton(self) -> AhoCorasick:
+        if self._automaton is None:
+            self._automaton = AhoCorasick([target[2] for target in self._targets])
+        return self._automaton
+
+    def preprocess(self, line: str) -> str:
+        if self.replacer is not None:
+            line = self.replacer.replace(line)
+        return normalize_text(line, self.lang)
+
+    def match(self, lines, max_distance=0) -> t.List[MatchHit]:
+        """
+        Args:
+            lines (str | list[str]): OCR results.
+            max_distance: If > 0, lines without exact hits are compared to targets by edit distance.
+                Targets shorter than 3 * max_distance are skipped in fuzzy matching.
+
+        Returns:
+            Hits sorted by line, then by position.
+        """
+        if isinstance(lines, str):
+            lines = [lines]
+        hits = []
+        for line_index, line in enumerate(lines):
+            line = self.preprocess(line)
+            line_hits = []
+            for index, start, end in self.automaton.iter_matches(line):
+                key, text, norm, mode = self._targets[index]
+                if mode == ACCURATE_MATCHING and (start, end) != (0, len(line)):
+                    continue
+                line_hits.append(MatchHit(line_index, key, text, start, end, 0))
+            if not line_hits and max_distance > 0 and line:
+                line_hits = self._fuzzy_match(line_index, line, max_distance)
+            hits += line_hits
+        return hits
+
+    def _fuzzy_match(self, line_index, line, max_distance) -> t.List[MatchHit]:
+        best = []
+        best_distance = max_distance
+        for key, text, norm, mode in self._targets:
+            if len(norm) < 3 * max_distance:
+                continue
+            distance = edit_distance(norm, line, substring=(mode == CONTAIN_MATCHING))
+            if distance < best_distance:
+                best, best_distance = [], distance
+            if distance == best_distance:
+                best.append(MatchHit(line_index, key, text, 0, 0, distance))
+        return best
+
+    def match_first(self, lines, max_distance=0) -> t.Optional[MatchHit]:
+        hits = self.match(lines, max_distance=max_distance)
+        if not hits:
+            return None
+        return min(hits, key=lambda hit: (hit.distance, hit.line, hit.start))
+
+    def matched_lines(self, lines, max_distance=0) -> t.Set[int]:
+        """
+        Returns:
+            Indexes of lines which matched any target.
+        """
+        return {hit.line for hit in self.match(lines, max_distance=max_distance)}
+
+
+class TextReplacer:
+    def __init__(self, replace_dict: dict):
+        """
+        Replace all keys of replace_dict in one scan. Longest key wins on overlaps.
+        """
+        self.keys = list(replace_dict.keys())
+        self.values = [replace_dict[key] for key in self.keys]
+        self.automaton = AhoCorasick(self.keys)
+
+    def replace(self, text: str) -> str:
+        # Longest match at each start position
+        best = {}
+        for index, start, end in self.automaton.iter_matches(text):
+            if start not in best or end > best[start][1]:
+                best[start] = (index, end)
+        if not best:
+            return text
+        result = []
+        cursor = 0
+        for start in sorted(best):
+            if start < cursor:
+                continue
+            index, end = best[start]
+            result.append(text[cursor:start])
+            result.append(self.values[index])
+            cursor = end
+        result.append(text[cursor:])
+        return ''.join(result)
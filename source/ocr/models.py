@@ -1,9 +1,14 @@
+import threading
+import time
+from collections import OrderedDict
+
+import psutil
 from pponnxcr import TextSystem as TextSystem_
+from pponnxcr.utility import LANG as PPONNXCR_LANG
 
-from source.common.decorator import cached_property, del_cached_property
 from source.exceptions.common import ScriptError
 
-from source.util import GLOBAL_LANG
+from source.util import GLOBAL_LANG, GIAconfig, logger
 
 DIC_LANG_TO_MODEL = {
     'zh_CN': 'zhs',
@@ -42,45 +47,151 @@ def model2lang(model: str) -> str:
 class TextSystem(TextSystem_):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Direct calls recognize one crop at a time.
+        # To batch crops from different threads, use `source.ocr.service`.
         self.text_recognizer.rec_batch_num = 1
 
 
+class ModelEntry:
+    __slots__ = ('key', 'model', 'load_time', 'memory', 'hits')
+
+    def __init__(self, key, model, load_time, memory):
+        self.key = key
+        self.model = model
+        self.load_time = load_time
+        self.memory = memory
+        self.hits = 0
+
+
+class ModelPool:
+    """
+    Process-wide registry of OCR models.
+
+    Models are loaded on first use. When `memory_budget` is exceeded,
+    least recently used models are dropped and will be loaded again on next use.
+    Memory of a model is measured as the growth of process RSS while loading it, so it's an estimate.
+    """
+
+    def __init__(self, memory_budget=0):
+        """
+        Args:
+            memory_budget: Max MB of all loaded models. 0 for unlimited.
+        """
+        self.memory_budget = memory_budget
+        self._entries: "OrderedDict[tuple, ModelEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.load_count = 0
+        self.evict_count = 0
+
+    @staticmethod
+    def _rss() -> int:
+        return psutil.Process().memory_info().rss
+
+    def get(self, key: tuple, loader):
+        """
+        Args:
+            key: Unique key of the model, such as ('pponnxcr', 'zhs').
+            loader: Function to create the model if it's not loaded.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                rss = self._rss()
+                start = time.perf_counter()
+                model = loader()
+                entry = ModelEntry(key, model,
+                                   load_time=time.perf_counter() - start,
+                                   memory=max(self._rss() - rss, 0))
+                self._entries[key] = entry
+                self.load_count += 1
+                logger.info(f'OCR model {key} loaded, cost {round(entry.load_time, 2)}s, '
+                            f'{round(entry.memory / 1048576, 1)}MB')
+                self._evict()
+            else:
+                self._entries.move_to_end(key)
+            entry.hits += 1
+            return entry.model
+
+    def _evict(self):
+        if self.memory_budget <= 0:
+            return
+        budget = self.memory_budget * 1048576
+        # The latest model is always kept, even if it alone exceeds the budget.
+        while len(self._entries) > 1 and sum(e.memory for e in self._entries.values()) > budget:
+            key, entry = self._entries.popitem(last=False)
+            self.evict_count += 1
+            logger.info(f'OCR model {key} evicted, memory budget {self.memory_budget}MB')
+
+    def is_loaded(self, key: tuple) -> bool:
+        return key in self._entries
+
+    def release(self, key: tuple = None):
+        """
+        Args:
+            key: Model to release. If None, release all.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Load time in seconds and memory in MB of each loaded model.
+        """
+        with self._lock:
+            return {
+                'memory_budget': self.memory_budget,
+                'resident_memory': round(sum(e.memory for e in self._entries.values()) / 1048576, 1),
+                'loads': self.load_count,
+                'evictions': self.evict_count,
+                'models': {
+                    '/'.join(str(k) for k in entry.key): {
+                        'load_time': round(entry.load_time, 3),
+                        'memory': round(entry.memory / 1048576, 1),
+                        'hits': entry.hits,
+                    } for entry in self._entries.values()
+                },
+            }
+
+
+MODEL_POOL = ModelPool(memory_budget=GIAconfig.Dev_OcrModelMemoryBudget)
+
+
 class OcrModel:
     def get_by_model(self, model: str) -> TextSystem:
-        try:
-            return self.__getattribute__(model)
-        except AttributeError:
+        if model not in PPONNXCR_LANG:
             raise ScriptError(f'OCR model "{model}" does not exists')
+        return MODEL_POOL.get(('pponnxcr', model), lambda: TextSystem(model))
 
     def get_by_lang(self, lang: str) -> TextSystem:
-        try:
-            model = lang2model(lang)
-            return self.__getattribute__(model)
-        except AttributeError:
+        model = lang2model(lang)
+        if model not in PPONNXCR_LANG:
             raise ScriptError(f'OCR model under lang "{lang}" does not exists')
+        return self.get_by_model(model)
+
+    def lazy_by_lang(self, lang: str) -> "LazyTextSystem":
+        return LazyTextSystem(lang)
 
     def resource_release(self):
-        del_cached_property(self, 'zhs')
-        del_cached_property(self, 'en')
-        del_cached_property(self, 'ja')
-        del_cached_property(self, 'zht')
+        for model in PPONNXCR_LANG:
+            MODEL_POOL.release(('pponnxcr', model))
 
-    @cached_property
-    def zhs(self):
-        return TextSystem('zhs')
 
-    @cached_property
-    def en(self):
-        return TextSystem('en')
+class LazyTextSystem:
+    """
+    Module-level handle of a TextSystem.
+    The model is fetched from MODEL_POOL on each call, so it's loaded on first use and can be evicted.
+    """
 
-    @cached_property
-    def ja(self):
-        return TextSystem('ja')
+    def __init__(self, lang: str):
+        self.lang = lang
 
-    @cached_property
-    def zht(self):
-        return TextSystem('zht')
+    def __getattr__(self, item):
+        return getattr(OCR_MODEL.get_by_lang(self.lang), item)
 
 
 OCR_MODEL = OcrModel()
-LOCAL_OCR_MODEL = OCR_MODEL.get_by_lang(GLOBAL_LANG)
+LOCAL_OCR_MODEL = OCR_MODEL.lazy_by_lang(GLOBAL_LANG)
@@ -7,6 +7,7 @@ from source.manager.button_manager import Button
 from source.common.decorator import cached_property, del_cached_property
 from source.common.utils import area_pad, corner2area, crop, extract_white_letters, float2str
 from source.ocr.models import OCR_MODEL, TextSystem
+from source.ocr.service import OcrService, get_ocr_service
 from source.exceptions.common import ScriptError
 from datetime import timedelta
 from pponnxcr.predict_system import BoxedResult
@@ -35,10 +36,14 @@ class Ocr:
         self.name: str = 'testname1'
         self.lang: str = lang
 
-    @cached_property
+    @property
     def model(self) -> TextSystem:
         return OCR_MODEL.get_by_lang(self.lang)
 
+    @cached_property
+    def service(self) -> OcrService:
+        return get_ocr_service(self.lang)
+
     def pre_process(self, image):
         """
         Args:
@@ -80,7 +85,7 @@ class Ocr:
         #     image = crop(image, self.button.area)
         image = self.pre_process(image)
         # ocr
-        text, rate = self.model.ocr_single_line(image)
+        text, rate = self.service.recognize(image)
         # after proces
         text = self._log_change('after', self.after_process, text)
         text = self._log_change('format', self.format_result, text)
@@ -89,19 +94,19 @@ class Ocr:
         result = OcrResult(text=text, similarity=rate)
         return result
 
-    def ocr_multi_lines(self, image_list) -> t.List(OcrResult):
+    def ocr_multi_lines(self, image_list) -> t.List[OcrResult]:
         # pre process
         start_time = time.time()
         image_list = [self.pre_process(image) for image in image_list]
         # ocr
-        result_list = self.model.ocr_lines(image_list)
+        result_list = self.service.recognize_lines(image_list)
         result_list = [(result, score) for result, score in result_list]
         # after process
         result_list = [(self.after_process(result), score) for result, score in result_list]
         result_list = [(self.format_result(result), score) for result, score in result_list]
         logger.attr(name="%s %ss" % (self.name, float2str(time.time() - start_time)),
                     text=str([result for result, _ in result_list]))
-        result_list = [OcrResult(text=i) for i in result_list]
+        result_list = [OcrResult(text=result, similarity=score) for result, score in result_list]
         return result_list
 
     def filter_detected(self, result: BoxedResult) -> bool:
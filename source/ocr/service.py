@@ -0,0 +1,249 @@
+"""
+Micro-batched text recognition shared by all threads.
+
+Callers submit single-line crops from any thread. A worker thread per service waits for the first
+request, keeps collecting requests for `batch_window` seconds (or until `max_batch_size` is reached),
+runs batched inference, and resolves each request's future.
+
+Recognizers pad every crop of a batch to the widest one, which changes results. So a batch is split by
+`group_key`, the width of a crop after resizing to recognizer height, and crops of one group are the same
+tensors as when recognized one by one. See source.ocr.batching.
+
+Two backends:
+    pponnxcr recognizer of `OCR_MODEL`, `get_ocr_service(lang)`.
+    FastDeploy recognizer, PaddleOcrFastDeploy.recognize_lines / recognize_rows go through `PaddleOcrFastDeploy.service`.
+
+Examples:
+    from source.ocr.service import get_ocr_service
+    text, score = get_ocr_service().recognize(image)
+    future = get_ocr_service().submit(image)
+"""
+import queue
+import threading
+from concurrent.futures import Future
+
+from source.util import *
+from source.ocr.models import OCR_MODEL, TextSystem
+from source.ocr.cache import create_ocr_cache
+from source.ocr import batching
+
+
+class OcrRequest:
+    __slots__ = ('image', 'group', 'future', 'enqueue_time')
+
+    def __init__(self, image, group):
+        self.image = image
+        self.group = group
+        self.future = Future()
+        self.enqueue_time = time.perf_counter()
+
+
+class OcrService:
+    def __init__(self, lang=None, max_batch_size=8, batch_window=0.004, run_batch=None, group_key=None,
+                 namespace=None):
+        """
+        Args:
+            lang: In-game language. If None, use GLOBAL_LANG.
+            max_batch_size: Max number of crops in one inference.
+            batch_window: Seconds to wait for more requests after the first one arrives.
+            run_batch: Function of a list of crops with the same group key, returns [(text, score), ...].
+                If None, use the pponnxcr recognizer of lang.
+            group_key: Function of a crop, crops with the same key are batched together.
+                If None, the width of the crop resized to pponnxcr input height.
+            namespace: Name of the service and its cache namespace. If None, use lang.
+        """
+        if lang is None:
+            lang = GLOBAL_LANG
+        self.lang = lang
+        self.namespace = namespace if namespace is not None else lang
+        self.run_batch = run_batch if run_batch is not None else self.run_pponnxcr_batch
+        self.group_key = group_key if group_key is not None else self.pponnxcr_group_key
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.cache = create_ocr_cache()
+        self.reset_stats()
+
+    @property
+    def model(self) -> TextSystem:
+        return OCR_MODEL.get_by_lang(self.lang)
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.request_count = 0
+            self.batch_count = 0
+            self.max_queue_depth = 0
+            self.batch_size_hist = {}
+            self.total_wait_time = 0.
+            self.total_infer_time = 0.
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: queue depth and batch size metrics. Times are in milliseconds.
+        """
+        with self._stats_lock:
+            batches = max(self.batch_count, 1)
+            requests = max(self.request_count, 1)
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'requests': self.request_count,
+                'batches': self.batch_count,
+                'avg_batch_size': round(self.request_count / batches, 2),
+                'batch_size_hist': dict(sorted(self.batch_size_hist.items())),
+                'avg_wait_ms': round(self.total_wait_time / requests * 1000, 3),
+                'avg_infer_ms': round(self.total_infer_time / batches * 1000, 3),
+                'cache': self.cache.stats(),
+            }
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._worker, name=f'OcrService-{self.namespace}', daemon=True)
+            self._thread.start()
+
+    def submit(self, image) -> Future:
+        """
+        Args:
+            image (np.ndarray): Single-line crop, shape (height, width, 3).
+
+        Returns:
+            Future: Resolves to (text, score).
+        """
+        if self.cache.enabled:
+            key = self.cache.key(image, namespace=self.namespace)
+            is_hit, result = self.cache.get(key)
+            if is_hit:
+                future = Future()
+                future.set_result(result)
+                return future
+            future = self._submit(image)
+
+            def save_cache(f: Future):
+                if f.exception() is None:
+                    self.cache.put(key, f.result())
+
+            future.add_done_callback(save_cache)
+            return future
+        return self._submit(image)
+
+    def _submit(self, image) -> Future:
+        self._ensure_worker()
+        request = OcrRequest(image, self.group_key(image))
+        self._queue.put(request)
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            if depth > self.max_queue_depth:
+                self.max_queue_depth = depth
+        return request.future
+
+    def recognize(self, image, timeout=None) -> t.Tuple[str, float]:
+        return self.submit(image).result(timeout=timeout)
+
+    def recognize_lines(self, image_list, timeout=None) -> t.List[t.Tuple[str, float]]:
+        """
+        Submit all crops at once, so they are likely to share one batch.
+        """
+        futures = [self.submit(image) for image in image_list]
+        return [future.result(timeout=timeout) for future in futures]
+
+    def _collect(self) -> t.List[OcrRequest]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remain = deadline - time.perf_counter()
+            try:
+                if remain <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remain))
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self):
+        while 1:
+            batch = self._collect()
+            groups = {}
+            for request in batch:
+                groups.setdefault(request.group, []).append(request)
+            for group in groups.values():
+                start = time.perf_counter()
+                try:
+                    results = self.run_batch([request.image for request in group])
+                except Exception as e:
+                    logger.exception(e)
+                    for request in group:
+                        request.future.set_exception(e)
+                    continue
+                end = time.perf_counter()
+                for request, result in zip(group, results):
+                    request.future.set_result(result)
+                with self._stats_lock:
+                    self.request_count += len(group)
+                    self.batch_count += 1
+                    self.batch_size_hist[len(group)] = self.batch_size_hist.get(len(group), 0) + 1
+                    self.total_wait_time += sum(start - request.enqueue_time for request in group)
+                    self.total_infer_time += end - start
+
+    def pponnxcr_group_key(self, image) -> int:
+        """
+        Width of the crop in pponnxcr input. Crops of the same width are padded to the same width as alone.
+        """
+        return batching.pponnxcr_group_key(self.model.text_recognizer, image)
+
+    def run_pponnxcr_batch(self, image_list) -> t.List[t.Tuple[str, float]]:
+        """
+        Recognize crops of the same group in one inference, same preprocessing as pponnxcr TextRecognizer.
+        """
+        return batching.run_pponnxcr_batch(self.model.text_recognizer, image_list)
+
+
+_OCR_SERVICES: t.Dict[str, OcrService] = {}
+_OCR_SERVICES_LOCK = threading.Lock()
+
+
+def get_ocr_service(lang=None, namespace=None, factory=None) -> OcrService:
+    """
+    Get a shared service.
+
+    Args:
+        lang: If None, use GLOBAL_LANG.
+        namespace: Key of the service. If None, the pponnxcr service of lang.
+        factory: Function to create the service of namespace if it doesn't exist.
+    """
+    if lang is None:
+        lang = GLOBAL_LANG
+    if namespace is None:
+        namespace = lang
+    with _OCR_SERVICES_LOCK:
+        if namespace not in _OCR_SERVICES:
+            _OCR_SERVICES[namespace] = factory() if factory is not None else OcrService(lang=lang)
+        return _OCR_SERVICES[namespace]
+
+
+if __name__ == '__main__':
+    from concurrent.futures import ThreadPoolExecutor
+    image = cv2.imread(fr'{ROOT_PATH}/assets/pytest/AreaBigmapSidebarCommissionName.jpg')
+    service = get_ocr_service()
+    service.recognize(image)
+    service.reset_stats()
+    pt = time.time()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        res = list(executor.map(lambda _: service.recognize(image), range(64)))
+    logger.info(f'{res[0]}; 64 requests from 8 threads cost {round(time.time() - pt, 3)}s')
+    logger.info(str(service.stats()))
+
+    # Batched results are the same as one by one, crops of different widths are in different groups.
+    crops = [image[:, :image.shape[1] * i // 4] for i in range(2, 5)] * 2
+    service.cache.clear()
+    batched = service.recognize_lines(crops)
+    alone = [service.run_batch([crop])[0] for crop in crops]
+    logger.info(f'batched same as alone: {batched == alone}')
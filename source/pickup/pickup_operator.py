@@ -11,11 +11,16 @@ from source.common import timer_module, static_lib
 from source.funclib import generic_lib, movement, combat_lib
 from source.manager import img_manager, asset
 import cv2
+import pyautogui
 from source.interaction.minimap_tracker import tracker
 from source.assets.pickup import *
 from source.map.map import genshin_map
 from source.funclib.cvars import *
 from source.pickup.yolov8_recognizer import find_possible_spoils, move_to_possible_spoils
+from source.ocr.matcher import TextMatcher
+from source.pickup.prompt_list import recognize_prompt_list, PromptPlan
+from source.pickup.blink_detector import BlinkDetector, BLINK_SEARCH_AREA
+from source.api.utils import ACCURATE_MATCHING
 
 
 # USE_YAP = False if sys.gettrace() else True
@@ -28,6 +33,8 @@ if USE_YAP:
 
 SEARCH_MODE_FINDING = 1
 SEARCH_MODE_PICKUP = 0
+# The name box next to the F button holds exactly one item name.
+PICKUP_NAME_LINE_COUNT = 1
 
 
 
@@ -44,6 +51,8 @@ class PickupOperator(BaseThreading):
         self.pickup_blacklist = GIAconfig.Collector_PickupBlacklist
         self.pickup_blacklist += load_json("auto_pickup_default_blacklist.json", folder_path=fr"{ASSETS_PATH}")["blacklist"]
         self.pickup_blacklist = list(set(self.pickup_blacklist))
+        self.pickup_blacklist_matcher = TextMatcher().add_texts(self.pickup_blacklist, mode=ACCURATE_MATCHING)
+        self.blink_detector = BlinkDetector(IconGeneralBlink.image[:, :, 0], threshold=self.BLINK_THRESHOLD)
         self.pickup_item_list = []
         self.flicker_timer = timer_module.Timer(diff_start_time=1)
         self.reset_timer = timer_module.Timer()
@@ -143,7 +152,9 @@ class PickupOperator(BaseThreading):
 
     def run(self):
         while 1:
+            pt = time.perf_counter()
             time.sleep(self.while_sleep)
+            sleep = time.perf_counter() - pt
             # time.sleep(0.1)
             if self.stop_threading_flag:
                 logger.info(t2t("停止自动拾取"))
@@ -152,7 +163,7 @@ class PickupOperator(BaseThreading):
             if self.pause_threading_flag:
                 if self.working_flag:
                     self.working_flag = False
-                time.sleep(1)
+                self.wait_until_continue()
                 continue
 
             if not self.working_flag:
@@ -161,6 +172,7 @@ class PickupOperator(BaseThreading):
             if self.checkup_stop_func():
                 self.pause_threading_flag = True
                 continue
+            pt = time.perf_counter()
             ret = generic_lib.f_recognition()
             if ret:
                 itt.delay(0.1, comment='Waiting for Genshin picking animation')
@@ -204,6 +216,7 @@ class PickupOperator(BaseThreading):
                         self.last_err_code="PICKUP_END_001"
                         logger.info(t2t("已找到物品且无法找到下一个物品，停止拾取"))
                         self.pause_threading()
+            self._record_loop(time.perf_counter() - pt, sleep)
 
 
     def get_err_code(self):
@@ -221,7 +234,7 @@ class PickupOperator(BaseThreading):
             img = extract_white_letters(cap)
         else:
             img = cap
-        res = ocr.get_all_texts(img)
+        res = ocr.get_all_texts(img, line_count=PICKUP_NAME_LINE_COUNT)
         return res
     
     def pickup_recognize(self):
@@ -232,75 +245,78 @@ class PickupOperator(BaseThreading):
             if ret:
                 ret = self.itt.get_img_position(asset.IconGeneralFButton)
                 if ret == False: return 0
-
-                # itt.freeze_key('w', operate='up')
-                # time.sleep(0.1)
-
-                y1 = asset.IconGeneralFButton.cap_posi[1]
-                x1 = asset.IconGeneralFButton.cap_posi[0]
-                cap = self.itt.capture(jpgmode=FOUR_CHANNELS)
-                cap = crop(cap, [x1 + ret[0] + 53, y1 + ret[1] - 20, x1 + ret[0] + 361,  y1 + ret[1] + 54])
-
-                if similar_img(cap[:,:,:3], IconGeneralTalkBubble.image)>0.99:
+                f_position = (asset.IconGeneralFButton.cap_posi[0] + ret[0], asset.IconGeneralFButton.cap_posi[1] + ret[1])
+                pt = time.time()
+                plan = recognize_prompt_list(self.itt.capture(jpgmode=FOUR_CHANNELS), self.pickup_blacklist_matcher,
+                                             f_position=f_position)
+                logger.debug(f"pickup recognize: {plan}, cost {round(time.time() - pt, 2)}")
+                if plan is None:
+                    return False
+                if plan.selected < len(plan.rows) and plan.rows[plan.selected].reason == 'talk bubble':
                     logger.info(f"pickup recognize: talk bubble; skip")
                     self.pickup_fail_cooldown.reset()
                     return False
-                # img_manager.qshow(cap)
-                # img = extract_white_letters(cap)
-                cap = self.itt.png2jpg(cap, channel='ui', alpha_num=160)
-                res = ocr.get_all_texts(cap, per_monitor=True)
-                # logger.info('enter 2')
-                if len(res) != 0:
-                    for text in res:
-                        if text == '':
-                            continue
-                        if text not in self.pickup_blacklist:
-                            self.pickup_fail_timeout.reset()
-                            self.last_search_times = 2
-                            self.itt.key_press('f')
-                            if self.crazy_f:
-                                logger.info(f"crazy f start")
-                                for i in range(25):
-                                    itt.key_press('f')
-                                    time.sleep(0.05)
-                            self.pickup_item_list.append(text)
-                            logger.info(t2t('pickup: ') + str(text))
-
-                            if str(text) in self.target_name:
-                                logger.info(t2t("已找到：") + self.target_name)
-                                self.pickup_succ = True
-                            # logger.info('out 1')
-                            return True
+                return self.execute_prompt_plan(plan)
             return False
         else:
             return False
 
+    def execute_prompt_plan(self, plan: PromptPlan) -> bool:
+        """
+        Pick rows of plan, bottom first. Rows below the picked one move up, so indexes of rows
+        above stay valid.
+
+        Returns:
+            bool: Whether anything was picked.
+        """
+        selected = plan.selected
+        remaining = len(plan.rows)
+        picked = False
+        for row in plan.pick_order():
+            if self.checkup_stop_func():
+                break
+            # scroll(-1) moves the selection down by one row
+            while selected != row.index:
+                pyautogui.scroll(-1 if row.index > selected else 1)
+                selected += 1 if row.index > selected else -1
+                itt.delay("animation")
+            self.pickup_fail_timeout.reset()
+            self.last_search_times = 2
+            self.itt.key_press('f')
+            if self.crazy_f:
+                logger.info(f"crazy f start")
+                for i in range(25):
+                    itt.key_press('f')
+                    time.sleep(0.05)
+            self.pickup_item_list.append(row.text)
+            logger.info(t2t('pickup: ') + str(row.text))
+            if str(row.text) in self.target_name:
+                logger.info(t2t("已找到：") + self.target_name)
+                self.pickup_succ = True
+            picked = True
+            remaining -= 1
+            selected = min(selected, remaining - 1)
+            itt.delay(0.1, comment='Waiting for Genshin picking animation')
+        return picked
+
     def reset_pickup_item_list(self):
         self.pickup_item_list = []
     
     def find_collector(self, show_res=False):
-        imsrc = self.itt.capture(jpgmode=FOUR_CHANNELS).copy()
-        imsrc = self.itt.png2jpg(imsrc, alpha_num=1)
-        # qshow(imsrc)
-        imsrc[950:1080, :, :] = 0
-        imsrc[0:150, :, :] = 0
-        imsrc[:, 0:300, :] = 0
-        imsrc[:, 1600:1920, :] = 0
-        imsrc[350:751, 1079:1300, :] = 0
-        # a = ((imsrc[:, :, 0] >= 253).astype('uint8') + (imsrc[:, :, 1] >= 253).astype('uint8') + (
-        #         imsrc[:, :, 2] >= 253).astype('uint8')) >= 3
-        # output_img = a.astype('uint8') * 255
-        mask = np.logical_not(np.all(imsrc > 200, axis=-1))
-        imsrc[mask] = [0, 0, 0]
-        output_img = imsrc.copy()
-        # print()
+        imsrc = self.itt.capture(jpgmode=FOUR_CHANNELS)
+        pt = time.perf_counter()
+        c_s = self.blink_detector.detect(imsrc)
+        logger.trace(f"find_collector: {len(c_s)} matches, {len(self.blink_detector.last_candidates)} candidates, "
+                     f"cost {round((time.perf_counter() - pt) * 1000, 2)}ms")
         if show_res:
-            cv2.imshow('find_collector', output_img)
-            cv2.imwrite(os.path.join(ROOT_PATH, 'tools', 'pickup', f'{time.time()}.jpg'), output_img)
+            show_img = imsrc[:, :, :3].copy()
+            x1, y1 = BLINK_SEARCH_AREA[:2]
+            for rx1, ry1, rx2, ry2 in self.blink_detector.last_candidates:
+                cv2.rectangle(show_img, (rx1 + x1, ry1 + y1), (rx2 + x1, ry2 + y1), (0, 255, 0), 1)
+            for p in c_s:
+                cv2.drawMarker(show_img, position=(int(p[0]), int(p[1])), color=(0, 0, 255), markerSize=3,markerType=cv2.MARKER_CROSS, thickness=5)
+            cv2.imshow('find_collector', show_img)
             cv2.waitKey(1)
-        # c_s = img_manager.get_rect(output_img, self.itt.capture(jpgmode=NORMAL_CHANNELS), ret_mode=2)
-        c_s = self.match_blink(output_img)
-        # c_s = 0
         return c_s
 
     BLINK_THRESHOLD = 0.82
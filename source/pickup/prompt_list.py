@@ -0,0 +1,150 @@
+"""
+Whole-prompt recognition of the F pickup list.
+
+When several items are in range, the prompt list shows one row per item and the F button is next to the
+selected row. All rows are segmented from one capture by the white text in the name column, recognized
+in one OCR batch, and turned into a plan of which rows to pick.
+
+Examples:
+    plan = recognize_prompt_list(itt.capture(jpgmode=FOUR_CHANNELS), blacklist_matcher)
+    for row in plan.pick_order():
+        ...
+"""
+from source.util import *
+from source.manager import asset
+from source.assets.pickup import IconGeneralTalkBubble
+from source.api.pdocr_complete import ocr
+from source.ocr.matcher import TextMatcher
+
+# Name column relative to F button, same as the single row crop in PickupOperator.
+NAME_COLUMN_X = (53, 361)
+# Single row crop relative to F button top, used for the talk bubble check.
+ROW_CROP_Y = (-20, 54)
+# UI text pixels, BGRA
+PROMPT_TEXT_LOWER = np.array([200, 200, 200, 161])
+PROMPT_TEXT_UPPER = np.array([255, 255, 255, 255])
+# Gaps inside a text line are shorter than this.
+PROMPT_ROW_MIN_GAP = 8
+PROMPT_ROW_MIN_HEIGHT = 10
+# Margin above and below text when cropping a row for recognition.
+PROMPT_ROW_MARGIN = 6
+PROMPT_MIN_SCORE = 0.5
+
+ACTION_PICK = 'pick'
+ACTION_SKIP = 'skip'
+
+
+class PromptRow(t.NamedTuple):
+    index: int
+    """0 for the top row"""
+    y1: int
+    y2: int
+    """Text line in frame"""
+    text: str
+    score: float
+    action: str
+    reason: str = ''
+
+
+class PromptPlan:
+    def __init__(self, rows: t.List[PromptRow], selected: int):
+        """
+        Args:
+            rows: Top to bottom.
+            selected: Index of the row next to F button.
+        """
+        self.rows = rows
+        self.selected = selected
+
+    def pick_order(self) -> t.List[PromptRow]:
+        """
+        Rows to pick, bottom first. Picking a row removes it, bottom first keeps indexes of rows above valid.
+        """
+        return [row for row in reversed(self.rows) if row.action == ACTION_PICK]
+
+    def __repr__(self):
+        return f'PromptPlan(selected={self.selected}, rows={[(row.text, row.action) for row in self.rows]})'
+
+
+def segment_rows(frame: np.ndarray, column: t.List[int]) -> t.List[t.Tuple[int, int]]:
+    """
+    Args:
+        frame: BGRA capture.
+        column: [x1, y1, x2, y2] of the name column.
+
+    Returns:
+        list: (y1, y2) of text lines in frame, top to bottom.
+    """
+    x1, y1, x2, y2 = column
+    mask = cv2.inRange(frame[y1:y2, x1:x2], PROMPT_TEXT_LOWER, PROMPT_TEXT_UPPER)
+    profile = cv2.reduce(mask, 1, cv2.REDUCE_MAX).flatten() > 0
+    rows = []
+    start = None
+    gap = 0
+    for y, has_text in enumerate(profile):
+        if has_text:
+            if start is None:
+                start = y
+            gap = 0
+        elif start is not None:
+            gap += 1
+            if gap >= PROMPT_ROW_MIN_GAP:
+                rows.append((start, y - gap + 1))
+                start = None
+    if start is not None:
+        rows.append((start, len(profile) - gap))
+    return [(a + y1, b + y1) for a, b in rows if b - a >= PROMPT_ROW_MIN_HEIGHT]
+
+
+def recognize_prompt_list(frame: np.ndarray, blacklist_matcher: TextMatcher = None, f_position=None) -> t.Optional[PromptPlan]:
+    """
+    Args:
+        frame: BGRA capture.
+        blacklist_matcher: Rows matching it are skipped.
+        f_position: Top left of F button in frame. If None, find it in frame.
+
+    Returns:
+        PromptPlan, None if there is no F button.
+    """
+    icon = asset.IconGeneralFButton
+    if f_position is None:
+        # Same as itt.capture(posi=icon.cap_posi, jpgmode=2)
+        cap = crop(frame, icon.cap_posi)[:, :, :3].copy()
+        cap[crop(frame, icon.cap_posi)[:, :, 3] < 50] = 0
+        rate, loc = similar_img(cap, icon.image, ret_mode=IMG_POSI)
+        if rate < icon.threshold:
+            return None
+        f_position = (icon.cap_posi[0] + loc[0], icon.cap_posi[1] + loc[1])
+    fx, fy = f_position
+    column = [fx + NAME_COLUMN_X[0], icon.cap_posi[1], fx + NAME_COLUMN_X[1], icon.cap_posi[3]]
+    lines = segment_rows(frame, column)
+    if not lines:
+        return PromptPlan([], 0)
+
+    f_center = fy + icon.image.shape[0] / 2
+    selected = min(range(len(lines)), key=lambda i: abs((lines[i][0] + lines[i][1]) / 2 - f_center))
+    crops = []
+    for y1, y2 in lines:
+        row = crop(frame, [column[0], y1 - PROMPT_ROW_MARGIN, column[2], y2 + PROMPT_ROW_MARGIN])
+        # Same as png2jpg(channel='ui', alpha_num=160)
+        img = row[:, :, :3].copy()
+        img[row[:, :, 3] < 160] = 0
+        crops.append(img)
+    results = ocr.recognize_rows(crops)
+
+    blacklisted = blacklist_matcher.matched_lines([text for text, score in results]) if blacklist_matcher else set()
+    rows = []
+    for i, ((y1, y2), (text, score)) in enumerate(zip(lines, results)):
+        action, reason = ACTION_PICK, ''
+        if text == '' or score < PROMPT_MIN_SCORE:
+            action, reason = ACTION_SKIP, 'unrecognized'
+        elif i in blacklisted:
+            action, reason = ACTION_SKIP, 'blacklist'
+        else:
+            center = (y1 + y2) // 2
+            top = int(center - f_center + fy)
+            row_crop = crop(frame, [column[0], top + ROW_CROP_Y[0], column[2], top + ROW_CROP_Y[1]])
+            if similar_img(row_crop[:, :, :3], IconGeneralTalkBubble.image) > 0.99:
+                action, reason = ACTION_SKIP, 'talk bubble'
+        rows.append(PromptRow(i, y1, y2, text, score, action, reason))
+    return PromptPlan(rows, selected)
@@ -0,0 +1,485 @@
+"""
+Compact binary TLPP (TeyvatMovePath) format and a process-wide loader cache.
+
+A .tlppb file is a metadata header and numpy structured arrays:
+    b'TLPB' | uint32 header length | header json, utf-8 | arrays, each aligned to 8 bytes
+The header holds the TLPP dict with every point list replaced by a reference to an array, the motion table,
+and the offset of each array:
+    position_list: POSITION_DTYPE, x, y, motion code, id, flags.
+    other [[x, y], ...] lists (break_position, adsorptive_position, ...): POINT_DTYPE, x, y, flags.
+Flags record which values were int in json and which keys were missing. Keys other than position, motion
+and id are kept in the header, so `to_dict()` returns the same dict as the json file.
+A list which does not fit the arrays is kept in the header as json.
+
+Examples:
+    path_dict = load_tlpp('GlazeLily20230513214422i0')             # dict, same as load_json(... + '.json')
+    data = load_tlpp_data('GlazeLily20230513214422i0')             # TLPPBinary, arrays are read-only
+    data.position_xy()                                              # (N, 2) float64
+    json_to_binary(os.path.join(ROOT_PATH, 'assets\\TeyvatMovePath', 'GlazeLily20230513214422i0.json'))
+Files are loaded once and reloaded when their mtime or size changes. If both x.json and x.tlppb exist,
+the newer one is used.
+
+Convert a folder, and compare load time against json:
+    python -m source.teyvat_move.tlpp_binary convert assets/TeyvatMovePath
+    python -m source.teyvat_move.tlpp_binary benchmark
+"""
+import struct
+import threading
+
+from source.util import *
+
+TLPPB_SUFFIX = '.tlppb'
+TLPPB_MAGIC = b'TLPB'
+TLPPB_VERSION = 1
+TEYVAT_MOVE_PATH_FOLDER = 'assets\\TeyvatMovePath'
+
+POSITION_DTYPE = np.dtype([('x', '<f8'), ('y', '<f8'), ('motion', 'u1'), ('id', '<i4'), ('flags', 'u1')])
+POINT_DTYPE = np.dtype([('x', '<f8'), ('y', '<f8'), ('flags', 'u1')])
+
+FLAG_X_INT = 1
+FLAG_Y_INT = 2
+FLAG_NO_MOTION = 4
+FLAG_NO_ID = 8
+FLAG_EXTRA = 16
+
+_ARRAY_REF = '__tlppb_array__'
+_HEADER_STRUCT = struct.Struct('<4sI')
+_ALIGN = 8
+_MAX_EXACT_INT = 2 ** 53
+_INT32 = (-2 ** 31, 2 ** 31 - 1)
+
+
+class TLPPFormatError(Exception): pass
+
+
+def _is_number(x):
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+
+def _is_exact(x):
+    """Values which are the same after a float64 round trip."""
+    return isinstance(x, float) or (_is_number(x) and abs(x) < _MAX_EXACT_INT)
+
+
+def _is_point(x):
+    return isinstance(x, list) and len(x) == 2 and _is_exact(x[0]) and _is_exact(x[1])
+
+
+def _point_flags(p):
+    return (FLAG_X_INT if isinstance(p[0], int) else 0) | (FLAG_Y_INT if isinstance(p[1], int) else 0)
+
+
+def _to_number(value, flags, int_flag):
+    return int(value) if flags & int_flag else value
+
+
+class TLPPBinary:
+    def __init__(self, meta: dict, arrays: t.List[np.ndarray], extras: t.List[dict], motions: t.List[str]):
+        """
+        Args:
+            meta: TLPP dict, point lists are replaced by {_ARRAY_REF: index}.
+            arrays: POSITION_DTYPE or POINT_DTYPE arrays.
+            extras: Per array, {row index as str: {key: value}} of keys the array does not hold.
+            motions: Motion table, motion code is the index.
+        """
+        self.meta = meta
+        self.arrays = arrays
+        self.extras = extras
+        self.motions = motions
+        self.names = {}
+        """Key path of each array, 'position_list' or 'additional_info.adsorptive_position'"""
+        self._collect_names(meta, '')
+
+    def _collect_names(self, node, prefix):
+        if isinstance(node, dict):
+            if _ARRAY_REF in node and len(node) == 1:
+                self.names[prefix] = node[_ARRAY_REF]
+                return
+            for k, v in node.items():
+                self._collect_names(v, f'{prefix}.{k}' if prefix else str(k))
+
+    def get_array(self, name) -> t.Optional[np.ndarray]:
+        """
+        Args:
+            name: Key path, such as 'break_position'.
+
+        Returns:
+            Structured array, None if it is empty or kept as json.
+        """
+        index = self.names.get(name)
+        return None if index is None else self.arrays[index]
+
+    @property
+    def positions(self) -> t.Optional[np.ndarray]:
+        return self.get_array('position_list')
+
+    @property
+    def break_positions(self) -> t.Optional[np.ndarray]:
+        return self.get_array('break_position')
+
+    def position_xy(self, name='position_list') -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: (N, 2) float64, TianLi.
+        """
+        arr = self.get_array(name)
+        if arr is None:
+            return np.zeros((0, 2), dtype=np.float64)
+        return np.stack([arr['x'], arr['y']], axis=1)
+
+    def motion_names(self) -> t.List[t.Optional[str]]:
+        arr = self.positions
+        if arr is None:
+            return []
+        return [None if f & FLAG_NO_MOTION else self.motions[m] for m, f in zip(arr['motion'].tolist(), arr['flags'].tolist())]
+
+    @classmethod
+    def from_dict(cls, path_dict: dict) -> 'TLPPBinary':
+        arrays = []
+        extras = []
+        motions = []
+
+        def encode_positions(items):
+            arr = np.zeros(len(items), dtype=POSITION_DTYPE)
+            extra = {}
+            for i, item in enumerate(items):
+                p = item['position']
+                flags = _point_flags(p)
+                others = {k: v for k, v in item.items() if k not in ('position', 'motion', 'id')}
+                motion = item.get('motion', None)
+                if 'motion' not in item:
+                    flags |= FLAG_NO_MOTION
+                elif isinstance(motion, str) and (motion in motions or len(motions) < 256):
+                    if motion not in motions:
+                        motions.append(motion)
+                    arr['motion'][i] = motions.index(motion)
+                else:
+                    flags |= FLAG_NO_MOTION
+                    others['motion'] = motion
+                pid = item.get('id', None)
+                if 'id' not in item:
+                    flags |= FLAG_NO_ID
+                elif isinstance(pid, int) and not isinstance(pid, bool) and _INT32[0] <= pid <= _INT32[1]:
+                    arr['id'][i] = pid
+                else:
+                    flags |= FLAG_NO_ID
+                    others['id'] = pid
+                if others:
+                    flags |= FLAG_EXTRA
+                    extra[str(i)] = others
+                arr['x'][i], arr['y'][i], arr['flags'][i] = p[0], p[1], flags
+            return arr, extra
+
+        def encode_points(items):
+            arr = np.zeros(len(items), dtype=POINT_DTYPE)
+            arr['x'] = [p[0] for p in items]
+            arr['y'] = [p[1] for p in items]
+            arr['flags'] = [_point_flags(p) for p in items]
+            return arr, {}
+
+        def encode(node):
+            if isinstance(node, dict):
+                return OrderedDict((k, encode(v)) for k, v in node.items())
+            if isinstance(node, list) and node:
+                if all(isinstance(i, dict) and _is_point(i.get('position')) for i in node):
+                    arr, extra = encode_positions(node)
+                elif all(_is_point(i) for i in node):
+                    arr, extra = encode_points(node)
+                else:
+                    return [encode(i) for i in node]
+                arrays.append(arr)
+                extras.append(extra)
+                return {_ARRAY_REF: len(arrays) - 1}
+            return node
+
+        if not isinstance(path_dict, dict):
+            raise TLPPFormatError(f'TLPP must be a dict, got {type(path_dict).__name__}')
+        return cls(encode(path_dict), arrays, extras, motions)
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: A new dict each call, same as the json file.
+        """
+        def decode_positions(arr, extra):
+            items = []
+            motions = self.motions
+            for i, (x, y, m, pid, flags) in enumerate(zip(arr['x'].tolist(), arr['y'].tolist(), arr['motion'].tolist(),
+                                                        arr['id'].tolist(), arr['flags'].tolist())):
+                item = {'position': [_to_number(x, flags, FLAG_X_INT), _to_number(y, flags, FLAG_Y_INT)]}
+                if not flags & FLAG_NO_MOTION:
+                    item['motion'] = motions[m]
+                if not flags & FLAG_NO_ID:
+                    item['id'] = pid
+                if flags & FLAG_EXTRA:
+                    item.update(json.loads(json.dumps(extra[str(i)])))
+                items.append(item)
+            return items
+
+        def decode_points(arr):
+            return [[_to_number(x, flags, FLAG_X_INT), _to_number(y, flags, FLAG_Y_INT)]
+                    for x, y, flags in zip(arr['x'].tolist(), arr['y'].tolist(), arr['flags'].tolist())]
+
+        def decode(node):
+            if isinstance(node, dict):
+                if _ARRAY_REF in node and len(node) == 1:
+                    index = node[_ARRAY_REF]
+                    arr = self.arrays[index]
+                    if arr.dtype == POSITION_DTYPE:
+                        return decode_positions(arr, self.extras[index])
+                    return decode_points(arr)
+                return OrderedDict((k, decode(v)) for k, v in node.items())
+            if isinstance(node, list):
+                return [decode(i) for i in node]
+            return node
+
+        return decode(self.meta)
+
+    def to_bytes(self) -> bytes:
+        blobs = []
+        entries = []
+        offset = 0
+        for arr, extra in zip(self.arrays, self.extras):
+            blob = arr.tobytes()
+            entries.append({'kind': 'positions' if arr.dtype == POSITION_DTYPE else 'points',
+                            'offset': offset, 'count': len(arr), 'extras': extra})
+            padding = -len(blob) % _ALIGN
+            blobs.append(blob + b'\x00' * padding)
+            offset += len(blob) + padding
+        header = json.dumps({'version': TLPPB_VERSION, 'motions': self.motions, 'arrays': entries,
+                             'meta': self.meta}, ensure_ascii=False).encode('utf-8')
+        header += b' ' * (-(len(header) + _HEADER_STRUCT.size) % _ALIGN)
+        return _HEADER_STRUCT.pack(TLPPB_MAGIC, len(header)) + header + b''.join(blobs)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'TLPPBinary':
+        """
+        Arrays are views of `data` and read-only.
+        """
+        if len(data) < _HEADER_STRUCT.size:
+            raise TLPPFormatError('File too short')
+        magic, header_len = _HEADER_STRUCT.unpack_from(data)
+        if magic != TLPPB_MAGIC:
+            raise TLPPFormatError(f'Bad magic {magic!r}')
+        base = _HEADER_STRUCT.size + header_len
+        header = json.loads(data[_HEADER_STRUCT.size:base].decode('utf-8'), object_pairs_hook=OrderedDict)
+        if header['version'] != TLPPB_VERSION:
+            raise TLPPFormatError(f"Unsupported version {header['version']}")
+        arrays = []
+        for entry in header['arrays']:
+            dtype = POSITION_DTYPE if entry['kind'] == 'positions' else POINT_DTYPE
+            if base + entry['offset'] + entry['count'] * dtype.itemsize > len(data):
+                raise TLPPFormatError('File truncated')
+            arrays.append(np.frombuffer(data, dtype=dtype, count=entry['count'], offset=base + entry['offset']))
+        return cls(header['meta'], arrays, [entry['extras'] for entry in header['arrays']], header['motions'])
+
+
+def json_to_binary(json_path: str, binary_path: str = None) -> str:
+    """
+    Args:
+        json_path: TLPP json file.
+        binary_path: Defaults to json_path with suffix .tlppb.
+
+    Returns:
+        str: binary_path
+
+    Raises:
+        TLPPFormatError: If the binary does not give the same dict, nothing is written.
+    """
+    if binary_path is None:
+        binary_path = os.path.splitext(json_path)[0] + TLPPB_SUFFIX
+    with open(json_path, 'r', encoding='utf-8') as f:
+        path_dict = json.load(f, object_pairs_hook=OrderedDict)
+    data = TLPPBinary.from_dict(path_dict).to_bytes()
+    if TLPPBinary.from_bytes(data).to_dict() != path_dict:
+        raise TLPPFormatError(f'{json_path} does not round trip')
+    with open(binary_path, 'wb') as f:
+        f.write(data)
+    return binary_path
+
+
+def binary_to_json(binary_path: str, json_path: str = None) -> str:
+    """
+    Args:
+        binary_path: .tlppb file.
+        json_path: Defaults to binary_path with suffix .json.
+
+    Returns:
+        str: json_path
+    """
+    if json_path is None:
+        json_path = os.path.splitext(binary_path)[0] + '.json'
+    with open(binary_path, 'rb') as f:
+        path_dict = TLPPBinary.from_bytes(f.read()).to_dict()
+    save_json(path_dict, default_path=os.path.dirname(json_path), all_path=json_path)
+    return json_path
+
+
+class TLPPCache:
+    def __init__(self):
+        self._cache: t.Dict[str, t.Tuple[t.Tuple[int, int], TLPPBinary]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, file_path: str) -> TLPPBinary:
+        """
+        Args:
+            file_path: .json or .tlppb file.
+
+        Returns:
+            TLPPBinary: Shared by all callers, do not modify.
+        """
+        file_path = os.path.abspath(file_path)
+        st = os.stat(file_path)
+        key = (st.st_mtime_ns, st.st_size)
+        cached = self._cache.get(file_path)
+        if cached is not None and cached[0] == key:
+            self.hits += 1
+            return cached[1]
+        if file_path.endswith(TLPPB_SUFFIX):
+            with open(file_path, 'rb') as f:
+                data = TLPPBinary.from_bytes(f.read())
+        else:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = TLPPBinary.from_dict(json.load(f, object_pairs_hook=OrderedDict))
+        with self._lock:
+            self.misses += 1
+            self._cache[file_path] = (key, data)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+
+TLPP_CACHE = TLPPCache()
+
+
+def find_tlpp_file(path_file_name: str, folder_path: str = TEYVAT_MOVE_PATH_FOLDER) -> str:
+    """
+    Args:
+        path_file_name: Without suffix.
+        folder_path: Relative to ROOT_PATH, or absolute.
+
+    Returns:
+        str: Path of the newer one of .tlppb and .json.
+    """
+    head = os.path.join(ROOT_PATH, folder_path, path_file_name)
+    candidates = []
+    for suffix in (TLPPB_SUFFIX, '.json'):
+        try:
+            candidates.append((os.stat(head + suffix).st_mtime_ns, suffix == TLPPB_SUFFIX, head + suffix))
+        except FileNotFoundError:
+            pass
+    if not candidates:
+        logger.critical(f"尝试访问{head}.json失败")
+        raise FileNotFoundError(head + '.json')
+    return max(candidates)[2]
+
+
+def load_tlpp_data(path_file_name: str, folder_path: str = TEYVAT_MOVE_PATH_FOLDER) -> TLPPBinary:
+    """
+    Returns:
+        TLPPBinary: Cached, do not modify.
+    """
+    return TLPP_CACHE.load(find_tlpp_file(path_file_name, folder_path))
+
+
+def load_tlpp(path_file_name: str, folder_path: str = TEYVAT_MOVE_PATH_FOLDER) -> dict:
+    """
+    Same as `load_json(path_file_name + '.json', folder_path)`, through the cache.
+
+    Returns:
+        dict: A new dict each call, can be modified.
+    """
+    return load_tlpp_data(path_file_name, folder_path).to_dict()
+
+
+def load_tlpp_folder(folder_path: str = TEYVAT_MOVE_PATH_FOLDER) -> t.Dict[str, TLPPBinary]:
+    """
+    Returns:
+        dict: {file name without suffix: TLPPBinary}
+    """
+    folder = os.path.join(ROOT_PATH, folder_path)
+    names = sorted({os.path.splitext(f)[0] for f in os.listdir(folder) if f.endswith(('.json', TLPPB_SUFFIX))})
+    return {name: load_tlpp_data(name, folder) for name in names}
+
+
+def convert_folder(folder_path: str = TEYVAT_MOVE_PATH_FOLDER) -> int:
+    """
+    Write a .tlppb next to every TLPP json in folder.
+
+    Returns:
+        int: Number of files converted.
+    """
+    folder = os.path.join(ROOT_PATH, folder_path)
+    count = 0
+    for f in sorted(os.listdir(folder)):
+        if not f.endswith('.json'):
+            continue
+        try:
+            json_to_binary(os.path.join(folder, f))
+            count += 1
+        except (TLPPFormatError, KeyError, ValueError) as e:
+            logger.warning(f'{f}: {e}')
+    return count
+
+
+if __name__ == '__main__':
+    import argparse
+    import random
+    import tempfile
+
+    parser = argparse.ArgumentParser(description='TLPP binary format.')
+    parser.add_argument('command', choices=['convert', 'benchmark'])
+    parser.add_argument('folder', nargs='?', default=TEYVAT_MOVE_PATH_FOLDER)
+    parser.add_argument('--paths', type=int, default=2000, help='Number of generated paths in benchmark')
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        logger.info(f'{convert_folder(args.folder)} files converted')
+    else:
+        def make_path(index):
+            x, y = random.uniform(-5000, 5000), random.uniform(-5000, 5000)
+            positions = []
+            for i in range(random.randint(50, 300)):
+                x, y = round(x + random.uniform(-3, 3), 3), round(y + random.uniform(-3, 3), 3)
+                positions.append({'position': [x, y], 'motion': random.choice(['WALKING', 'FLYING', 'SWIMMING']), 'id': i + 1})
+            return {'name': f'bench{index}', 'time': '20230513214422', 'start_position': positions[0]['position'],
+                    'end_position': positions[-1]['position'], 'position_list': positions,
+                    'break_position': [p['position'] for p in positions[::20]],
+                    'additional_info': {'pickup_points': list(range(0, len(positions), 20)), 'adsorptive_position': []}}
+
+        random.seed(0)
+        with tempfile.TemporaryDirectory() as folder:
+            for i in range(args.paths):
+                with open(os.path.join(folder, f'bench{i}.json'), 'w', encoding='utf-8') as f:
+                    json.dump(make_path(i), f, sort_keys=True, indent=2)
+            names = [f'bench{i}' for i in range(args.paths)]
+
+            json_size = sum(os.path.getsize(os.path.join(folder, name + '.json')) for name in names)
+            pt = time.perf_counter()
+            for name in names:
+                load_json(name + '.json', folder)
+            json_cost = time.perf_counter() - pt
+            convert_folder(folder)
+            for name in names:
+                os.remove(os.path.join(folder, name + '.json'))
+            TLPP_CACHE.clear()
+            pt = time.perf_counter()
+            for name in names:
+                load_tlpp_data(name, folder)
+            cold_cost = time.perf_counter() - pt
+            pt = time.perf_counter()
+            for name in names:
+                load_tlpp_data(name, folder).position_xy()
+            warm_cost = time.perf_counter() - pt
+            size = sum(os.path.getsize(os.path.join(folder, name + TLPPB_SUFFIX)) for name in names)
+            logger.info(f'{args.paths} paths: json {round(json_cost * 1000, 1)}ms, '
+                        f'binary {round(cold_cost * 1000, 1)}ms, cached {round(warm_cost * 1000, 1)}ms, '
+                        f'size json {round(json_size / 1024 / 1024, 2)}MB, binary {round(size / 1024 / 1024, 2)}MB')
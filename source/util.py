@@ -10,9 +10,9 @@ from typing import Union, List, Tuple
 import typing as t
 
 ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-SOURCE_PATH = ROOT_PATH + '\\source'
-ASSETS_PATH = ROOT_PATH + '\\assets'
-CACHE_PATH = ROOT_PATH + "\\cache"
+SOURCE_PATH = os.path.join(ROOT_PATH, 'source')
+ASSETS_PATH = os.path.join(ROOT_PATH, 'assets')
+CACHE_PATH = os.path.join(ROOT_PATH, 'cache')
 if sys.path[0] != ROOT_PATH:   sys.path.insert(0, ROOT_PATH)
 if sys.path[1] != SOURCE_PATH: sys.path.insert(1, SOURCE_PATH)
 
@@ -276,7 +276,7 @@ AN = auto_name
 
 def verify_path(root):
     if not os.path.exists(root):
-        verify_path(os.path.join(root, "../"))
+        verify_path(os.path.dirname(os.path.normpath(root)))
         os.mkdir(root)
         print(f"dir {root} has been created")
 
@@ -4,6 +4,7 @@ from source.webio.util import *
 from source.webio.webpages.config import ConfigPage
 from source.config.cvars import *
 from source.funclib import collector_lib
+from source.funclib.collection_log_store import collection_log_store
 
 
 
@@ -13,6 +14,8 @@ class CollectorSettingPage(ConfigPage):
         self.collection_names = load_json("ITEM_NAME.json", f"assets\\POI_JSON_API\\{GLOBAL_LANG}")
 
     def _load_config_files(self):
+        # collection log is stored as jsonl, export it so the log viewer below can show it
+        collection_log_store.export_legacy_json()
         self.config_files = []
         for root, dirs, files in os.walk('config\\auto_collector'):
             for f in files:
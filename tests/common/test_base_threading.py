@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import time
+import unittest
+
+from source.common.base_threading import BaseThreading
+
+
+class IdleThreading(BaseThreading):
+    def loop(self):
+        pass
+
+
+class TestBaseThreadingIdle(unittest.TestCase):
+    THREAD_NUM = 50
+    # CPU seconds allowed for all paused threads, per wall second
+    MAX_IDLE_CPU = 0.02
+    MAX_WAKE_LATENCY = 0.1
+
+    def setUp(self):
+        self.threads = [IdleThreading(thread_name=f'IdleThreading{i}') for i in range(self.THREAD_NUM)]
+        for thread_obj in self.threads:
+            thread_obj.setDaemon(True)
+            thread_obj.pause_threading()
+            thread_obj.start()
+        # Let all threads park
+        time.sleep(0.5)
+
+    def tearDown(self):
+        for thread_obj in self.threads:
+            thread_obj.stop_threading()
+        for thread_obj in self.threads:
+            thread_obj.join(timeout=1)
+
+    def test_paused_threads_idle(self):
+        cpu, wall = time.process_time(), time.perf_counter()
+        time.sleep(2)
+        cpu_rate = (time.process_time() - cpu) / (time.perf_counter() - wall)
+        self.assertLess(cpu_rate, self.MAX_IDLE_CPU)
+
+    def test_continue_wakes_up(self):
+        thread_obj = self.threads[0]
+        self.assertFalse(thread_obj.working_flag)
+        pt = time.perf_counter()
+        thread_obj.continue_threading()
+        while not thread_obj.working_flag and time.perf_counter() - pt < 2:
+            time.sleep(0.001)
+        # First loop sleeps while_sleep before it checks the flags
+        self.assertLess(time.perf_counter() - pt, thread_obj.while_sleep + self.MAX_WAKE_LATENCY)
+
+    def test_stop_wakes_up(self):
+        pt = time.perf_counter()
+        for thread_obj in self.threads:
+            thread_obj.stop_threading()
+        for thread_obj in self.threads:
+            thread_obj.join(timeout=1)
+        self.assertFalse(any(thread_obj.is_alive() for thread_obj in self.threads))
+        self.assertLess(time.perf_counter() - pt, self.MAX_WAKE_LATENCY)
+
+
+class TestBaseThreadingLoopRecord(unittest.TestCase):
+
+    def test_period_and_loop_sleep(self):
+        thread_obj = IdleThreading()
+        thread_obj.while_sleep = 0.1
+        thread_obj._record_loop(0.15, 0.1)
+        self.assertEqual(thread_obj._loop_metrics.overruns, 1)
+        # Deliberate sleeps in the loop body count as sleep
+        thread_obj._loop_sleep(0.1)
+        thread_obj._record_loop(0.12, 0.1)
+        self.assertEqual(thread_obj._loop_metrics.overruns, 1)
+        self.assertLess(thread_obj._loop_metrics.max_busy, 0.16)
+        self.assertAlmostEqual(thread_obj._loop_metrics.sleep_time, 0.3, delta=0.05)
+        # No expected interval, never an overrun
+        thread_obj._record_loop(5, 0, period=0)
+        self.assertEqual(thread_obj._loop_metrics.overruns, 1)
+        self.assertEqual(thread_obj._loop_metrics.while_sleep, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import unittest
+
+from source.common.base_threading import BaseThreading
+from source.common.cooperative_scheduler import CooperativeScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class CountThreading(BaseThreading):
+    def __init__(self, name, trace, clock, steps=3):
+        super().__init__(thread_name=name)
+        self.trace = trace
+        self.clock = clock
+        self.steps = steps
+        self.while_sleep = 0.02
+
+    def loop(self):
+        self.trace.append((round(self.clock(), 3), self.name))
+        self.steps -= 1
+        if self.steps <= 0:
+            self.pause_threading()
+
+
+class TestCooperativeScheduler(unittest.TestCase):
+
+    def make_scheduler(self):
+        clock = FakeClock()
+        return CooperativeScheduler(clock=clock, sleep=clock.sleep), clock
+
+    def trace_run(self):
+        scheduler, clock = self.make_scheduler()
+        trace = []
+
+        def worker(name, interval):
+            for _ in range(5):
+                trace.append((round(clock(), 3), name))
+                yield interval
+
+        for name, interval in [('a', 0.03), ('b', 0.02), ('c', 0.03)]:
+            scheduler.add(worker(name, interval), name=name)
+        scheduler.run()
+        return trace
+
+    def test_deterministic_order(self):
+        trace = self.trace_run()
+        self.assertEqual(trace, self.trace_run())
+        # Same due time runs in order added
+        self.assertEqual(trace[:4], [(0., 'a'), (0., 'b'), (0., 'c'), (0.02, 'b')])
+        self.assertEqual(len(trace), 15)
+
+    def test_threading_objects_interleave(self):
+        scheduler, clock = self.make_scheduler()
+        trace = []
+        loops = [CountThreading(name, trace, clock) for name in ['x', 'y']]
+        for loop in loops:
+            scheduler.add(loop)
+        self.assertTrue(scheduler.run(until=scheduler.is_idle, timeout=10))
+        self.assertEqual([name for _, name in trace], ['x', 'y'] * 3)
+        self.assertTrue(all(loop.pause_threading_flag for loop in loops))
+        self.assertFalse(any(loop.is_alive() for loop in loops))
+
+    def test_error_stops_owner(self):
+        scheduler, clock = self.make_scheduler()
+        errors = []
+        scheduler.on_error = lambda task, e: errors.append(e)
+
+        class BrokenThreading(BaseThreading):
+            def loop(self):
+                raise ValueError('broken')
+
+        broken = BrokenThreading(thread_name='broken')
+        scheduler.add(broken)
+        scheduler.run(timeout=1)
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(broken.stop_threading_flag)
+
+
+if __name__ == "__main__":
+    unittest.main()
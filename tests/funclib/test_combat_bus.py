@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import time
+import unittest
+
+import numpy as np
+
+from source.funclib.combat_bus import *
+
+
+class TestCombatFrameState(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+
+    def perceiver(self, **values):
+        def perceive(frame):
+            self.calls.append(tuple(values))
+            return values
+        return perceive
+
+    def make_state(self, frame_time=None, **kwargs):
+        bar = self.perceiver(blood_bar=True, arrow=False)
+        return CombatFrameState(np.zeros((1, 1, 4), dtype=np.uint8), time.time() if frame_time is None else frame_time,
+                                perceivers={EVENT_BLOOD_BAR: bar, EVENT_ARROW: bar,
+                                            EVENT_LOW_HEALTH: self.perceiver(low_health=False)}, **kwargs)
+
+    def test_perceive_on_access(self):
+        state = self.make_state()
+        self.assertEqual(self.calls, [])
+        self.assertFalse(state.arrow)
+        self.assertTrue(state.blood_bar)
+        self.assertEqual(self.calls, [('blood_bar', 'arrow')])
+        self.assertFalse(state.is_perceived(EVENT_LOW_HEALTH))
+        # Not perceivable, default
+        self.assertIsNone(state.q_ready)
+
+    def test_given_values(self):
+        state = self.make_state(blood_bar=False, arrow=True)
+        self.assertFalse(state.blood_bar)
+        self.assertTrue(state.arrow)
+        self.assertEqual(self.calls, [])
+
+    def test_publish_perceives_subscribed_only(self):
+        bus = CombatStateBus()
+        fired = []
+        bus.subscribe(EVENT_BLOOD_BAR, lambda old, new, state: fired.append((old, new)))
+        bus.publish(self.make_state(frame_time=1, blood_bar=False))
+        state = self.make_state(frame_time=2)
+        bus.publish(state)
+        self.assertEqual(fired, [(False, True)])
+        self.assertFalse(state.is_perceived(EVENT_LOW_HEALTH))
+        self.assertIs(bus.latest, state)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import unittest
+
+import numpy as np
+
+from source.funclib.combat_detector import *
+
+
+class TestColorKeyDetector(unittest.TestCase):
+
+    def make_frame(self):
+        frame = np.zeros((1080, 1920, 4), dtype=np.uint8)
+        frame[..., 3] = 255
+        # Two enemy bars and one mineral bar
+        frame[100:104, 200:260] = (90, 90, 255, 255)
+        frame[300:304, 500:540] = (90, 90, 255, 255)
+        frame[600:604, 800:850] = (98, 217, 255, 255)
+        # Near the enemy colour, matches no signature
+        frame[700:704, 900:950] = (90, 90, 250, 255)
+        return frame
+
+    def test_all_signatures_from_one_call(self):
+        detector = CombatStateDetector()
+        bars = detector.get_blood_bars(self.make_frame())
+        self.assertEqual(set(bars), {ENEMY_BAR, MINERAL_BAR})
+        enemy, mineral = bars[ENEMY_BAR], bars[MINERAL_BAR]
+        self.assertEqual(enemy.count, 4 * 60 + 4 * 40)
+        self.assertEqual(enemy.bbox, [200, 100, 540, 304])
+        self.assertEqual(enemy.rects, [[200, 100, 260, 104], [500, 300, 540, 304]])
+        self.assertEqual(mineral.count, 4 * 50)
+        self.assertEqual(mineral.rects, [[800, 600, 850, 604]])
+        self.assertEqual(int(detector.blood_bars.mask(MINERAL_BAR).sum() // 255), mineral.count)
+
+    def test_outside_area_and_empty(self):
+        detector = CombatStateDetector()
+        frame = np.zeros((1080, 1920, 4), dtype=np.uint8)
+        frame[1000:1004, 200:260] = (90, 90, 255, 255)
+        self.assertFalse(detector.is_blood_bar_exist(frame))
+        bars = detector.get_blood_bars(frame)
+        self.assertEqual(bars[ENEMY_BAR], ColorKeyResult(ENEMY_BAR, 0, None, []))
+        self.assertTrue(detector.is_blood_bar_exist(self.make_frame()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import os
+import tempfile
+import unittest
+
+from source.integration_json.reader import JsonIntegrationApi
+from source.integration_json.utils import PositionJson
+
+
+class TestIntegrationIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.folder.name, 'index.pkl')
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def make_row(self, name, position, coll_name='甜甜花'):
+        return {'name': name, 'position': position, 'collection_name': coll_name,
+                'collection_type': 'plant', 'path': f'植物\\{coll_name}\\{name}.json', 'location': 'Teyvat'}
+
+    def round_trip(self, data):
+        JsonIntegrationApi.save_index(data, self.index_path)
+        return JsonIntegrationApi.load_index(self.index_path)
+
+    def test_round_trip_position_json(self):
+        data = {
+            '甜甜花': [self.make_row('1', [1.5, -2.25, 3.0]), self.make_row('2', [4.0, 5.125, 6.0])],
+            '传送点': [self.make_row('3', [7.0, 8.0, 9.0], coll_name='传送点')],
+        }
+        loaded = self.round_trip(data)
+        self.assertEqual(loaded, data)
+        for rows in loaded.values():
+            for row in rows:
+                PositionJson(**row)
+
+    def test_round_trip_mixed_position_length(self):
+        data = {'甜甜花': [self.make_row('1', [1.5, -2.25]), self.make_row('2', [4.0, 5.125, 6.0])]}
+        loaded = self.round_trip(data)
+        self.assertEqual(loaded, data)
+        self.assertEqual(PositionJson(**loaded['甜甜花'][1]).position, [4.0, 5.125, 6.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import threading
+import time
+import unittest
+
+from source.mission.simulator import VirtualClock, SimulatedCharacter, RecordingExecutor, SimAction
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.
+
+    def time(self):
+        return self.now
+
+    def elapsed(self):
+        return self.now
+
+
+class TestSimulatedCharacter(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.character = SimulatedCharacter(self.clock, [100, 200], move_speed=5)
+        self.executor = RecordingExecutor(self.clock, self.character)
+
+    def assertPosition(self, position):
+        for a, b in zip(self.character.get_position(), position):
+            self.assertAlmostEqual(a, b)
+
+    def test_walk_north(self):
+        self.executor.key_down('w')
+        self.clock.now = 2
+        self.executor.key_up('w')
+        self.clock.now = 5
+        self.assertPosition([100, 190])
+        self.assertAlmostEqual(self.character.distance, 10)
+
+    def test_turn_and_walk(self):
+        # 90 degrees to the left faces west
+        self.executor.move_to(-90 * 10, 0, relative=True)
+        self.assertAlmostEqual(self.character.get_rotation(), 90)
+        self.executor.key_down('w')
+        self.clock.now = 1
+        self.assertPosition([95, 200])
+        # w + d, normalised to one step
+        self.executor.key_down('d')
+        self.clock.now = 2
+        self.character.get_position()
+        self.assertAlmostEqual(self.character.distance, 10)
+
+    def test_teleport_releases_keys(self):
+        self.executor.key_down('w')
+        self.character.teleport([0, 0])
+        self.clock.now = 3
+        self.assertPosition([0, 0])
+
+    def test_record_actions(self):
+        self.executor.key_press('e')
+        self.clock.now = 1.5
+        self.executor.move_to(10, 20)
+        self.executor.left_click()
+        self.assertEqual(self.executor.actions, [
+            SimAction(0, 'key_press', ('e',)),
+            SimAction(1.5, 'move_to', (10, 20, False)),
+            SimAction(1.5, 'left_click', ()),
+        ])
+        # Absolute mouse movement does not turn
+        self.assertEqual(self.character.get_rotation(), 0)
+
+
+class TestVirtualClock(unittest.TestCase):
+
+    def test_sleep_skips_ahead(self):
+        clock = VirtualClock(speed=100)
+        pt = time.perf_counter()
+        clock.sleep(2)
+        self.assertLess(time.perf_counter() - pt, 0.5)
+        self.assertGreaterEqual(clock.elapsed(), 2)
+
+    def test_work_is_not_scaled(self):
+        clock = VirtualClock(speed=100)
+        # Join the simulation
+        clock.sleep(0.01)
+        start = clock.elapsed()
+        pt = time.perf_counter()
+        while time.perf_counter() - pt < 0.05:
+            pass
+        self.assertLess(clock.elapsed() - start, 0.5)
+
+    def test_working_thread_holds_pace(self):
+        clock = VirtualClock(speed=100)
+        stop = threading.Event()
+        joined = threading.Event()
+
+        def work():
+            clock.sleep(0.01)
+            joined.set()
+            while not stop.is_set():
+                pass
+
+        thread = threading.Thread(target=work, daemon=True)
+        thread.start()
+        joined.wait(1)
+        pt = time.perf_counter()
+        clock.sleep(0.05)
+        # Real pace while the other thread works
+        self.assertGreaterEqual(time.perf_counter() - pt, 0.04)
+        stop.set()
+        thread.join(1)
+
+    def test_wait_for_condition(self):
+        clock = VirtualClock(speed=100)
+        condition = threading.Condition()
+        flag = []
+
+        def notify():
+            with condition:
+                flag.append(1)
+                condition.notify_all()
+
+        threading.Timer(0.05, notify).start()
+        with condition:
+            self.assertTrue(clock.wait_for(lambda: flag, timeout=None, condition=condition))
+        with condition:
+            self.assertFalse(clock.wait_for(lambda: False, timeout=1, condition=condition))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import unittest
+
+import numpy as np
+
+from source.ocr.batching import pponnxcr_group_key, run_grouped
+
+
+class FakeRecognizer:
+    rec_image_shape = [3, 48, 320]
+
+
+class TestRunGrouped(unittest.TestCase):
+
+    def test_one_inference_per_width(self):
+        rows = [np.zeros((24, width, 3), dtype=np.uint8) for width in (100, 200, 100, 201, 200)]
+        recognizer = FakeRecognizer()
+        batches = []
+
+        def run_batch(batch):
+            batches.append([row.shape[1] for row in batch])
+            return [row.shape[1] for row in batch]
+
+        results = run_grouped(rows, lambda row: pponnxcr_group_key(recognizer, row), run_batch)
+        self.assertEqual(results, [100, 200, 100, 201, 200])
+        # No crop padded to a wider one of the same batch
+        self.assertEqual(batches, [[100, 100], [200, 200], [201]])
+
+    def test_group_key(self):
+        recognizer = FakeRecognizer()
+        self.assertEqual(pponnxcr_group_key(recognizer, np.zeros((24, 100, 3))), 200)
+        self.assertEqual(pponnxcr_group_key(recognizer, np.zeros((48, 200, 3))), 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import unittest
+
+from source.api.utils import CONTAIN_MATCHING
+from source.ocr.matcher import TextMatcher
+
+
+class TestTextMatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.matcher = TextMatcher(lang='zh_CN')
+        self.matcher.add('Emergency', '临危受命', mode=CONTAIN_MATCHING)
+        self.matcher.add('IcyIssues', '冷冰冰的大麻烦', mode=CONTAIN_MATCHING)
+
+    def test_exact(self):
+        hit = self.matcher.match_first(['委托：临危受命'], max_distance=1)
+        self.assertEqual((hit.key, hit.distance), ('Emergency', 0))
+
+    def test_fuzzy_at_max_distance(self):
+        hit = self.matcher.match_first(['临危受', '其他'], max_distance=1)
+        self.assertEqual((hit.key, hit.distance), ('Emergency', 1))
+
+    def test_fuzzy_over_max_distance(self):
+        # '危受' is 2 edits from '临危受命'
+        self.assertEqual(self.matcher.match(['危受'], max_distance=1), [])
+        self.assertIsNone(self.matcher.match_first(['危受'], max_distance=1))
+
+    def test_no_fuzzy(self):
+        self.assertEqual(self.matcher.match(['临危受'], max_distance=0), [])
+
+
+if __name__ == "__main__":
+    unittest.main()